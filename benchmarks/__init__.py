@@ -0,0 +1 @@
+"""Benchmarks for ``short-it``, they are not a part of the package."""
@@ -0,0 +1,241 @@
+"""HTTP-level load test against a local ``short-it`` server.
+
+Usage::
+
+    python -m benchmarks.load --size 10000 --clients 64 --duration 10
+
+Starts ``short-it`` (the same ``start()`` as in production) on a free local port
+with a synthetic config, drives it with concurrent keep-alive clients and reports
+RPS and p50/p95/p99 latency per route.
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+
+from benchmarks import synthetic
+
+ROUTES = ("simple", "project", "not_found", "one_link_error", "multiple_links_error")
+EXPECTED_STATUS = {
+    "simple": 307,
+    "project": 307,
+    "not_found": 404,
+    "one_link_error": 200,
+    "multiple_links_error": 200,
+}
+DEFAULT_MIX = "simple=4,project=4,not_found=1,one_link_error=1,multiple_links_error=1"
+
+
+@dataclasses.dataclass
+class RouteStats:
+    """Collected latencies for one route."""
+
+    latencies: list[float] = dataclasses.field(default_factory=list)
+    unexpected_statuses: int = 0
+
+    def summary(self, duration: float) -> dict[str, float]:
+        """RPS and latency percentiles (in milliseconds)."""
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "rps": len(latencies) / duration,
+            "p50_ms": _percentile(latencies, 0.50) * 1000,
+            "p95_ms": _percentile(latencies, 0.95) * 1000,
+            "p99_ms": _percentile(latencies, 0.99) * 1000,
+            "unexpected_statuses": self.unexpected_statuses,
+        }
+
+
+def make_paths(generated: synthetic.SyntheticConfig) -> dict[str, list[str]]:
+    """Request paths for every route."""
+    return {
+        "simple": [f"/{name}" for name in generated.simple_links],
+        "project": [f"/{project_name}/{alias}" for project_name, alias in generated.project_links],
+        "not_found": [f"/missing-{i}" for i in range(1000)] + [f"/missing-{i}/gh" for i in range(1000)],
+        "one_link_error": [f"/{name}/gh" for name in generated.simple_links],
+        "multiple_links_error": sorted({f"/{project_name}" for project_name, _ in generated.project_links}),
+    }
+
+
+async def client(
+    port: int,
+    paths: dict[str, list[str]],
+    mix: list[str],
+    deadline: float,
+    stats: dict[str, RouteStats],
+    seed: int,
+) -> None:
+    """One keep-alive client, which sends requests one by one until the deadline."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            route = rng.choice(mix)
+            path = rng.choice(paths[route])
+
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            status = await _read_response(reader)
+            stats[route].latencies.append(time.perf_counter() - start)
+
+            if status != EXPECTED_STATUS[route]:
+                stats[route].unexpected_statuses += 1
+    finally:
+        writer.close()
+
+
+async def drive(
+    port: int, paths: dict[str, list[str]], mix: list[str], clients: int, duration: float
+) -> dict[str, RouteStats]:
+    """Run all clients concurrently."""
+    stats = {route: RouteStats() for route in ROUTES}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(port, paths, mix, deadline, stats, seed) for seed in range(clients)))
+    return stats
+
+
+@contextlib.contextmanager
+def server(
+    data_dir: pathlib.Path, port: int, extra_env: dict[str, str] | None = None
+) -> t.Iterator[subprocess.Popen[bytes]]:
+    """Start ``short-it`` in a subprocess and wait until it accepts connections."""
+    env = {
+        **os.environ,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "SHORT_IT_DATA_DIR": str(data_dir),
+        **(extra_env or {}),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-c", "import short_it.cli; short_it.cli.main()"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port, process)
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run(
+    size: int,
+    clients: int,
+    duration: float,
+    mix: str = DEFAULT_MIX,
+    extra_env: dict[str, str] | None = None,
+    workers: int = 1,
+) -> dict[str, dict[str, float]]:
+    """Generate config, start the server, load it and return per-route report."""
+    generated = synthetic.generate(size)
+    generated.raw["server"] = {"workers": workers}
+    paths = make_paths(generated)
+    weighted_routes = _parse_mix(mix)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        generated.write(pathlib.Path(data_dir) / "config.yml")
+        port = _free_port()
+        with server(pathlib.Path(data_dir), port, extra_env):
+            asyncio.run(drive(port, paths, weighted_routes, min(clients, 4), 0.5))  # warm up
+            stats = asyncio.run(drive(port, paths, weighted_routes, clients, duration))
+
+    report = {route: route_stats.summary(duration) for route, route_stats in stats.items() if route_stats.latencies}
+    report["total"] = RouteStats(
+        latencies=[latency for route_stats in stats.values() for latency in route_stats.latencies],
+        unexpected_statuses=sum(route_stats.unexpected_statuses for route_stats in stats.values()),
+    ).summary(duration)
+    return report
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Read one HTTP/1.1 response, and return its status."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    content_length = 0
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value)
+    if content_length:
+        await reader.readexactly(content_length)
+    return int(status_line.split(" ", 2)[1])
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _parse_mix(mix: str) -> list[str]:
+    """Parse ``route=weight,...`` into a list, where every route is repeated ``weight`` times."""
+    weighted: list[str] = []
+    for part in mix.split(","):
+        route, _, weight = part.partition("=")
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route {route!r}, choose from {', '.join(ROUTES)}")
+        weighted.extend([route] * int(weight or 1))
+    return weighted
+
+
+def _free_port() -> int:
+    """Find a free local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return t.cast(int, sock.getsockname()[1])
+
+
+def _wait_for_port(port: int, process: subprocess.Popen[bytes], timeout: float = 300) -> None:
+    """Wait until the server accepts connections (startup with a big config can take a while)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+        except OSError:
+            time.sleep(0.05)
+        else:
+            return
+    raise TimeoutError(f"Server didn't start in {timeout} seconds")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the load test and print the report."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000, help="amount of links in the synthetic config")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes (0 is one per CPU core)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weights of routes (default: {DEFAULT_MIX})")
+    parser.add_argument("--output", type=pathlib.Path, help="save report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.clients, args.duration, args.mix, workers=args.workers)
+
+    print(f"{'route':<22} {'requests':>9} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bad':>5}")
+    for route, summary in report.items():
+        print(
+            f"{route:<22} {summary['requests']:>9.0f} {summary['rps']:>9.0f} {summary['p50_ms']:>8.2f}"
+            f" {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} {summary['unexpected_statuses']:>5.0f}"
+        )
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
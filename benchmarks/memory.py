@@ -0,0 +1,131 @@
+"""Memory report: bytes per alias of the lookup table in every representation.
+
+Usage::
+
+    python -m benchmarks.memory --aliases 1000000
+
+The table is built from a synthetic config (without OmegaConf, see
+:meth:`~benchmarks.synthetic.SyntheticConfig.to_config`), and loaded back from the
+snapshot, as servers hold it after a restart. Python objects are measured with
+:func:`sys.getsizeof`, and every shared object (like an interned string) is
+counted once. ``sqlite`` and ``mmap`` stores are measured by sizes of their files,
+which are in the page cache and shared by all workers.
+"""
+import argparse
+import gc
+import json
+import pathlib
+import sys
+import tempfile
+import types
+import typing as t
+
+import short_it.config as config_module
+import short_it.parse_config as parse_config
+import short_it.snapshot as snapshot
+import short_it.stores as stores
+from benchmarks import synthetic
+
+_NOT_MEASURED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+
+def run(aliases: int, workdir: pathlib.Path) -> dict[str, int]:
+    """Build the table from the synthetic config in every representation.
+
+    Returns:
+        Size of every representation in bytes, and the amount of aliases.
+    """
+    generated = synthetic.generate(aliases)
+    config = generated.to_config()
+    table = parse_config._parse_links(config)
+    settings = config_module.Config.to_settings(config)
+
+    results = {"aliases": generated.aliases_count}
+    results["memory, unshared strings"] = deep_size(_restart(_unshared(table), settings, workdir))
+    results["memory"] = deep_size(_restart(table, settings, workdir))
+    results["memory, responses"] = deep_size(parse_config.ParseConfigToMachineData._build_responses(table))
+
+    for backend, build in (("sqlite", stores.build_sqlite), ("mmap", stores.build_mmap)):
+        path = workdir / f"links.{backend}"
+        build(path, table, None)
+        results[backend] = path.stat().st_size
+    return results
+
+
+def deep_size(obj: object) -> int:
+    """Size of the object and everything it references, in bytes, every object is counted once.
+
+    Classes, modules and functions are not counted, they are shared with the whole program.
+    """
+    seen: set[int] = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _NOT_MEASURED):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        stack.extend(gc.get_referents(current))
+        if isinstance(current, dict):  # string keys are not referents, they can't make reference cycles
+            stack.extend(current)
+    return size
+
+
+def report(results: t.Mapping[str, int]) -> str:
+    """Render sizes and bytes per alias."""
+    aliases = results["aliases"]
+    lines = [f"{aliases} aliases", f"{'representation':<24} {'MiB':>10} {'bytes/alias':>12}"]
+    for name, size in results.items():
+        if name != "aliases":
+            lines.append(f"{name:<24} {size / 2**20:>10.1f} {size / aliases:>12.1f}")
+    return "\n".join(lines)
+
+
+def _restart(table: snapshot.LinksTable, settings: snapshot.Settings, workdir: pathlib.Path) -> snapshot.LinksTable:
+    """Save the table into the snapshot, and load it back."""
+    path = workdir / "config.snapshot"
+    snapshot.save(path, snapshot.Snapshot(bytes(32), settings, table))
+    loaded = snapshot.load(path, bytes(32))
+    assert loaded is not None
+    return loaded.links
+
+
+def _unshared(table: snapshot.LinksTable) -> snapshot.LinksTable:
+    """The table, where link types are not shared between projects, to show what interning saves.
+
+    A destination is still shared by aliases of one link, as ``dict.fromkeys`` does it.
+    """
+    result: snapshot.LinksTable = {}
+    for name, links in table.items():
+        if isinstance(links, str):
+            result[name] = _copy(links)
+            continue
+        destinations: dict[str, str] = {}
+        result[name] = {_copy(link_type): destinations.setdefault(url, _copy(url)) for link_type, url in links.items()}
+    return result
+
+
+def _copy(value: str) -> str:
+    """A new string object with the same value."""
+    return value.encode().decode()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Build the table, and print the report."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory", description=__doc__.splitlines()[0])
+    parser.add_argument("--aliases", type=int, default=1_000_000, help="amount of aliases (default: 1000000)")
+    parser.add_argument("--output", type=pathlib.Path, help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.aliases, pathlib.Path(workdir))
+
+    print(report(results))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
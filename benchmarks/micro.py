@@ -0,0 +1,200 @@
+"""Microbenchmarks for config parsing and URL resolution.
+
+Usage::
+
+    python -m benchmarks.micro --sizes 10,1000,10000 --output bench.json
+    python -m benchmarks.micro --sizes 10,1000,10000 --baseline bench.json
+
+With ``--baseline``, results are compared against the stored ones, and the
+command fails if any metric got slower (or bigger) than ``--threshold``.
+"""
+import argparse
+import functools
+import gc
+import json
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing as t
+
+import short_it.config as config_module
+import short_it.exc
+import short_it.parse_config as parse_config
+import short_it.snapshot as snapshot
+import short_it.stores as stores
+from benchmarks import synthetic
+
+T = t.TypeVar("T")
+Results: t.TypeAlias = dict[str, dict[str, float]]
+#                           ^^^       ^^^  ^^^
+#                          size    metric  value (lower is better)
+
+LOOKUPS_PER_CASE = 10_000
+
+
+def run(sizes: list[int], workdir: pathlib.Path, repeat: int = 3) -> Results:
+    """Run all benchmarks for every size of the synthetic config."""
+    return {str(size): bench_size(size, workdir, repeat) for size in sizes}
+
+
+def bench_size(size: int, workdir: pathlib.Path, repeat: int = 3) -> dict[str, float]:
+    """Run all benchmarks for one size of the synthetic config.
+
+    Args:
+        size: Amount of links in the synthetic config.
+        workdir: Where to write generated config and snapshot.
+        repeat: Every metric is the best of this many runs.
+    """
+    generated = synthetic.generate(size)
+    config_path = workdir / f"config-{size}.yml"
+    generated.write(config_path)
+
+    results: dict[str, float] = {"aliases": generated.aliases_count}
+
+    results["config_load_s"], (config, config_hash) = _time_best(
+        lambda: config_module.Config.load_with_hash(config_path, save=True), repeat
+    )
+
+    table = parse_config.ParseConfigToMachineData.__new__(parse_config.ParseConfigToMachineData)
+    table._config = config
+    results["parse_s"], table._data = _time_best(lambda: table._parse_config(config), repeat)
+    results["build_responses_s"], table._responses = _time_best(lambda: table._build_responses(table._data), repeat)
+    results["parse_peak_mib"] = _peak_memory(lambda: table._parse_config(config)) / 2**20
+
+    snapshot_path = workdir / f"config-{size}.snapshot"
+    snapshot.save(
+        snapshot_path,
+        snapshot.Snapshot(
+            t.cast(bytes, config_hash),
+            config_module.Config.to_settings(config),
+            t.cast(snapshot.LinksTable, table._data),
+        ),
+    )
+    results["snapshot_load_s"], _ = _time_best(lambda: snapshot.load(snapshot_path, config_hash), repeat)
+
+    rng = random.Random(size)
+    hits = rng.choices(
+        [(name, None) for name in generated.simple_links] + list(generated.project_links), k=LOOKUPS_PER_CASE
+    )
+    misses = [(f"missing-{i}", None) for i in range(LOOKUPS_PER_CASE)]
+    one_link_errors = [(name, "gh") for name in rng.choices(generated.simple_links, k=LOOKUPS_PER_CASE)]
+    multiple_links_errors = [
+        (project_name, None) for project_name, _ in rng.choices(generated.project_links, k=LOOKUPS_PER_CASE)
+    ]
+
+    results["get_url_hit_ns"] = _lookup_ns(table.get_url, hits, repeat)
+    results["get_url_miss_ns"] = _lookup_ns(table.get_url, misses, repeat)
+    results["get_url_one_link_error_ns"] = _lookup_ns(table.get_url, one_link_errors, repeat)
+    results["get_url_multiple_links_error_ns"] = _lookup_ns(table.get_url, multiple_links_errors, repeat)
+    results["get_response_hit_ns"] = _lookup_ns(table.get_response, [(_path(*args),) for args in hits], repeat)
+    results["get_response_miss_ns"] = _lookup_ns(table.get_response, [(_path(*args),) for args in misses], repeat)
+
+    index_path = workdir / f"config-{size}.index"
+    results["build_mmap_s"], _ = _time_best(lambda: stores.build_mmap(index_path, table._data, config_hash), repeat)
+    mmap_store = stores.MmapLinkStore(index_path)
+    results["get_url_hit_mmap_ns"] = _lookup_ns(functools.partial(parse_config._lookup, mmap_store), hits, repeat)
+    results["get_url_miss_mmap_ns"] = _lookup_ns(functools.partial(parse_config._lookup, mmap_store), misses, repeat)
+
+    return results
+
+
+def compare(current: Results, baseline: Results, threshold: float) -> list[str]:
+    """Compare results with the baseline.
+
+    Returns:
+        Human-readable descriptions of regressions (metrics, which are bigger than
+        baseline by more than ``threshold``, e.g. ``0.1`` is 10%).
+    """
+    regressions: list[str] = []
+    for size, metrics in current.items():
+        for metric, value in metrics.items():
+            old_value = baseline.get(size, {}).get(metric)
+            if old_value is None or metric == "aliases" or old_value == 0:
+                continue
+
+            change = value / old_value - 1
+            if change > threshold:
+                regressions.append(f"{metric} (size {size}): {old_value:.6g} -> {value:.6g} (+{change:.1%})")
+    return regressions
+
+
+def _time_best(func: t.Callable[[], T], repeat: int) -> tuple[float, T]:
+    """Time a single (long) call, in seconds. Best of ``repeat`` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_memory(func: t.Callable[[], object]) -> int:
+    """Peak memory (in bytes), allocated during the call."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _lookup_ns(  # type: ignore[misc] # Explicit "Any" is not allowed
+    func: t.Callable[..., object], calls: t.Sequence[tuple[str | None, ...]], repeat: int
+) -> float:
+    """Best of ``repeat`` runs, in nanoseconds per call. Expected errors are swallowed."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for args in calls:
+            try:
+                func(*args)
+            except short_it.exc.ShortItException:
+                pass
+        best = min(best, (time.perf_counter_ns() - start) / len(calls))
+    return best
+
+
+def _path(project_name: str | None, link_type: str | None) -> str:
+    """Request path for the lookup."""
+    return f"/{project_name}" if link_type is None else f"/{project_name}/{link_type}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run benchmarks, print and save results, and compare them with the baseline."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000", help="comma-separated amounts of links")
+    parser.add_argument("--repeat", type=int, default=3, help="every metric is the best of this many runs")
+    parser.add_argument("--output", type=pathlib.Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=pathlib.Path, help="compare with results, saved by --output")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed regression, 0.1 is 10%% (default)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run([int(size) for size in args.sizes.split(",")], pathlib.Path(workdir), args.repeat)
+
+    for size, metrics in results.items():
+        print(f"size {size}:")
+        for metric, value in metrics.items():
+            print(f"  {metric:<36} {value:.6g}")
+
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps({"meta": {"python": sys.version, "platform": platform.platform()}, "results": results}, indent=2)
+        )
+
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Generator of synthetic ``config.yml`` for benchmarks."""
+import dataclasses
+import pathlib
+import random
+import typing as t
+
+import yaml
+
+import short_it.config as config_module
+
+# link types, which get aliases from `LinkSettings.resolve_builtin_aliases`
+BUILTIN_LINK_TYPES = ("github", "rtd", "docs")
+
+
+@dataclasses.dataclass
+class SyntheticConfig:
+    """Generated config, and some facts about it, which are useful for lookups."""
+
+    raw: dict[str, object]
+    simple_links: list[str]
+    project_links: list[tuple[str, str]]
+    #                     ^^^  ^^^
+    #                 project  alias (including builtin ones)
+
+    @property
+    def aliases_count(self) -> int:
+        """Amount of all URLs, which can be resolved (simple links plus every alias of project links)."""
+        return len(self.simple_links) + len(self.project_links)
+
+    def to_config(self) -> config_module.Config:
+        """Config with the same links, without OmegaConf (it takes minutes on millions of links).
+
+        Like a config from the snapshot, sections are plain dataclasses, see
+        :meth:`~short_it.config.Config.from_settings`. Builtin aliases are resolved.
+        """
+        config = config_module.Config.from_settings({})
+        config.simple = dict(t.cast(dict[str, str], self.raw["simple"]))
+        config.projects = {}
+        for project_name, links in t.cast(dict[str, dict[str, dict[str, object]]], self.raw["projects"]).items():
+            config.projects[project_name] = {}
+            for link_type, settings in links.items():
+                link_settings = config_module.LinkSettings(
+                    to=t.cast(str, settings["to"]),
+                    aliases=t.cast(list[str] | None, settings.get("aliases")),
+                    additional_aliases=t.cast(list[str] | None, settings.get("additional_aliases")),
+                )
+                link_settings.resolve_builtin_aliases(link_type)
+                config.projects[project_name][link_type] = link_settings
+        return config
+
+    def write(self, path: pathlib.Path) -> None:
+        """Write config as YAML."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as file:
+            yaml.safe_dump(self.raw, file, sort_keys=False)
+
+
+def generate(size: int, seed: int = 0) -> SyntheticConfig:
+    """Generate a config with roughly ``size`` resolvable URLs.
+
+    A quarter of URLs are simple links, the rest are project links. Every project has
+    one link with a builtin link type (so it gets builtin aliases), one with explicit
+    ``aliases``, and one with ``additional_aliases``.
+    """
+    rng = random.Random(seed)
+    simple: dict[str, str] = {}
+    projects: dict[str, dict[str, dict[str, object]]] = {}
+    simple_links: list[str] = []
+    project_links: list[tuple[str, str]] = []
+
+    for i in range(max(size // 4, 1)):
+        name = f"simple-{i}"
+        simple[name] = f"https://example.com/{_slug(rng)}/{i}"
+        simple_links.append(name)
+
+    builtin_aliases: dict[str, list[str]] = {}
+    for link_type in BUILTIN_LINK_TYPES:
+        link_settings = config_module.LinkSettings()
+        link_settings.resolve_builtin_aliases(link_type)
+        builtin_aliases[link_type] = list(dict.fromkeys([link_type, *(link_settings.aliases or [])]))
+
+    i = 0
+    while len(project_links) < size - len(simple_links):
+        project_name = f"project-{i}"
+        builtin = BUILTIN_LINK_TYPES[i % len(BUILTIN_LINK_TYPES)]
+        aliases, additional = [f"alias-{j}" for j in range(2)], [f"extra-{j}" for j in range(2)]
+        projects[project_name] = {
+            builtin: {"to": f"https://github.com/{_slug(rng)}/{project_name}"},
+            "readme": {"to": f"https://github.com/{_slug(rng)}/{project_name}#readme", "aliases": aliases},
+            "site": {"to": f"https://{project_name}.example.com/", "additional_aliases": additional},
+        }
+
+        project_links.extend((project_name, alias) for alias in builtin_aliases[builtin])
+        project_links.extend((project_name, alias) for alias in ["readme", *aliases])
+        project_links.extend((project_name, alias) for alias in ["site", *additional])
+        i += 1
+
+    return SyntheticConfig(
+        raw={"projects": projects, "simple": simple},
+        simple_links=simple_links,
+        project_links=project_links,
+    )
+
+
+def _slug(rng: random.Random) -> str:
+    """Random lowercase slug, to make destinations unique-ish."""
+    return "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=8))
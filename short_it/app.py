@@ -1,73 +1,322 @@
 """Module for the app object, and all handlers."""
+import contextlib
+import dataclasses
+import hmac
+import itertools
+import json
 import os
+import time
+import typing as t
 
 import fastapi.responses
-import uvicorn
 
+import short_it.config as config_module
 import short_it.exc
+import short_it.fast_path as fast_path
+import short_it.hot_links as hot_links
+import short_it.metrics as metrics
 import short_it.parse_config as parse_config
+import short_it.responses as responses
+import short_it.server as server
+import short_it.startup as startup
+import short_it.stats as stats
+import short_it.watcher as watcher_module
 from short_it import utils
 
-utils.start_sentry()
-app = fastapi.FastAPI()
-
-NOT_FOUND_HTML = (
-    """\
-<!DOCTYPE html>
-<html>
-   <head>
-      <meta_http-equiv = "refresh"_content="10; url=https://perchun.it" />
-   </head>
-   <body>
-      404:_Not_Found._Redirecting_to_<a_href="https://perchun.it">https://perchun.it</a>_in_10_seconds.
-   </body>
-</html>
-""".replace(
-        "\n", ""
-    )
-    .replace(" ", "")
-    .replace("_", " ")
-)
+
+@contextlib.asynccontextmanager
+async def lifespan(_: fastapi.FastAPI) -> t.AsyncIterator[None]:
+    """Build the lookup table before serving, and run background tasks while serving.
+
+    Sentry is started here, and not at import time, so it is started in every worker.
+    """
+    config = prepare()[0]
+    with startup.phase("sentry"):
+        utils.start_sentry()
+    click_counter = stats.ClickCounter()
+    click_counter.start()
+    hot_links_tracker = hot_links.HotLinks()
+    hot_links_tracker.start()
+
+    watcher = None
+    if config.reload.enabled:
+        watcher = watcher_module.ConfigWatcher(
+            config_module.CONFIG_PATH, config.reload.interval, config_module.SHARDS_DIR
+        )
+        watcher.start()
+
+    yield
+
+    if watcher is not None:
+        watcher.stop()
+    hot_links_tracker.stop()
+    click_counter.stop()
+
+
+app = fastapi.FastAPI(lifespan=lifespan)
+
+
+def prepare() -> tuple[config_module.Config, parse_config.ParseConfigToMachineData]:
+    """Load the config and build the lookup table, if it wasn't done yet."""
+    with startup.phase("config"):
+        config = config_module.Config()
+    with startup.phase("table"):
+        table = parse_config.ParseConfigToMachineData()
+    return config, table
 
 
 def find_and_redirect_to_the_link(
-    project_name: str, link_type: str | None
+    project_name: str, link_type: str | None, query_string: bytes = b""
 ) -> fastapi.responses.RedirectResponse | fastapi.responses.PlainTextResponse:
-    """The logic in this module."""
+    """The logic in this module.
+
+    If the simple link is requested with link type, or there is no such link,
+    templated links are tried (see :mod:`short_it.routing`), with ``query_string``.
+    """
+    start = time.perf_counter()
+    path = f"/{project_name}" if link_type is None else f"/{project_name}/{link_type}"
     project_name = project_name.lower()
     if link_type is not None:
         link_type = link_type.lower()
 
     try:
         result = parse_config.ParseConfigToMachineData().get_url(project_name, link_type)
+    except parse_config.OneLinkAndLinkTypeSpecifiedError as exception:
+        routed = redirect_to_route(path, query_string, start)
+        if routed is not None:
+            return routed
+        metrics.observe("one_link_error", time.perf_counter() - start)
+        return fastapi.responses.PlainTextResponse(exception.message)
     except short_it.exc.ShortItException as exception:
+        metrics.observe("multiple_links_error", time.perf_counter() - start)
         return fastapi.responses.PlainTextResponse(exception.message)
     else:
         if result is None:
+            routed = redirect_to_route(path, query_string, start)
+            if routed is not None:
+                return routed
+            metrics.observe("not_found", time.perf_counter() - start)
             raise fastapi.HTTPException(status_code=404)
 
-        return fastapi.responses.RedirectResponse(url=result)
+        path = path.lower()
+        stats.ClickCounter().hit(path)
+        hot_links.HotLinks().hit(path)
+        status, max_age = parse_config.ParseConfigToMachineData().get_redirect_options(project_name, link_type)
+        metrics.observe("redirect", time.perf_counter() - start)
+        return fastapi.responses.RedirectResponse(
+            url=result,
+            status_code=status,
+            headers=None if max_age is None else {"cache-control": responses.cache_control(max_age)},
+        )
+
+
+def redirect_to_route(path: str, query_string: bytes, start: float) -> fastapi.responses.RedirectResponse | None:
+    """Redirect by the templated link, if some matches the path, clicks are counted for its pattern."""
+    match = parse_config.ParseConfigToMachineData().match_route(path, query_string)
+    if match is None:
+        return None
+
+    stats.ClickCounter().hit(match.route.pattern)
+    hot_links.HotLinks().hit(match.route.pattern)
+    status, max_age = match.route.redirect
+    metrics.observe("redirect", time.perf_counter() - start)
+    return fastapi.responses.RedirectResponse(
+        url=match.url,
+        status_code=status,
+        headers=None if max_age is None else {"cache-control": responses.cache_control(max_age)},
+    )
+
+
+@app.get("/-/stats")
+def route_stats(limit: int | None = None) -> list[dict[str, str | int]]:
+    """Click counts of all links, the most clicked first.
+
+    Counts are written by every worker every ``stats.flush_interval`` seconds,
+    so the latest clicks may be not counted yet.
+    """
+    counts = stats.read_counts(stats.stats_path(config_module.Config()), limit)
+    return [{"path": path, "count": count} for path, count in counts]
+
+
+@app.get("/-/hot")
+def route_hot_links(limit: int = 10) -> dict[str, list[dict[str, str | int]]]:
+    """The most requested links and 404 paths in the last ``hot_links.window`` seconds (in this worker)."""
+    return hot_links.HotLinks().top(limit)
+
+
+@app.get("/-/metrics", response_class=fastapi.responses.PlainTextResponse)
+def route_metrics() -> fastapi.responses.PlainTextResponse:
+    """Metrics in Prometheus text format (of this worker, every worker has its own)."""
+    return fastapi.responses.PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/-/links", response_model=None)
+def route_find_links(
+    to: str | None = None,
+    prefix: str | None = None,
+    host: str | None = None,
+    duplicates: bool = False,
+    limit: int | None = None,
+) -> list[dict[str, str | list[str]]] | fastapi.responses.JSONResponse:
+    """Links, which redirect to the destination, or to destinations with the prefix or host, see :mod:`short_it.reverse_index`.
+
+    Exactly one of ``to``, ``prefix``, ``host`` and ``duplicates`` must be set.
+    """
+    try:
+        found = parse_config.ParseConfigToMachineData().find_links(to, prefix, host, duplicates, limit)
+    except ValueError as exception:
+        return fastapi.responses.JSONResponse({"detail": str(exception)}, status_code=422)
+    return [{"to": destination, "paths": paths} for destination, paths in found.items()]
+
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+_NDJSON_CHUNK = 1000  # lines per write
+
 
+@app.post("/-/resolve", response_model=None)
+def route_resolve(
+    request: fastapi.Request, slugs: list[str] = fastapi.Body()
+) -> fastapi.responses.JSONResponse | fastapi.responses.StreamingResponse:
+    """Resolve a JSON list of ``project[/link_type]`` slugs at once, without redirects or counting clicks.
 
-@app.get("/{project_name}/{link_type}", response_model=None)
+    Every result is either ``{"slug", "to"}`` or ``{"slug", "error", "detail"}``, in
+    the same order as slugs. If the client accepts NDJSON, results are streamed one
+    per line, instead of ``{"results": [...]}``.
+    """
+    resolutions = parse_config.ParseConfigToMachineData().resolve_many(slugs)
+    if NDJSON_CONTENT_TYPE in request.headers.get("accept", ""):
+        return fastapi.responses.StreamingResponse(ndjson_lines(resolutions), media_type=NDJSON_CONTENT_TYPE)
+    return fastapi.responses.JSONResponse({"results": [resolution.to_json() for resolution in resolutions]})
+
+
+def ndjson_lines(resolutions: t.Iterable[parse_config.Resolution]) -> t.Iterator[bytes]:
+    """Encode results as NDJSON, in chunks of lines, as a write per line is slow."""
+    iterator = iter(resolutions)
+    while chunk := list(itertools.islice(iterator, _NDJSON_CHUNK)):
+        yield "".join(json.dumps(resolution.to_json()) + "\n" for resolution in chunk).encode()
+
+
+@dataclasses.dataclass
+class SimpleLinkBody:
+    """Simple link, see :class:`~short_it.config.SimpleLinkSettings`."""
+
+    to: str
+    status: int | None = None
+    max_age: int | None = None
+
+
+@dataclasses.dataclass
+class ProjectLinkBody:
+    """Project link, see :class:`~short_it.config.LinkSettings`."""
+
+    to: str
+    aliases: list[str] | None = None
+    additional_aliases: list[str] | None = None
+    status: int | None = None
+    max_age: int | None = None
+
+
+def check_admin_token(authorization: str | None = fastapi.Header(None)) -> None:
+    """Allow only requests with the admin token, the admin API doesn't exist if it is not set."""
+    token = config_module.Config().admin.token
+    if token is None:
+        raise fastapi.HTTPException(status_code=404)
+    if authorization is None or not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise fastapi.HTTPException(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+
+def change_links(change: t.Callable[[], list[str]]) -> fastapi.responses.JSONResponse:
+    """Apply the change to the table, and respond with changed paths or the error."""
+    try:
+        paths = change()
+    except parse_config.LinkNotFoundError as exception:
+        # not `HTTPException`, it would be rendered as the 404 page
+        return fastapi.responses.JSONResponse({"detail": exception.message}, status_code=404)
+    except (parse_config.LinkConflictError, parse_config.ReadOnlyStoreError) as exception:
+        return fastapi.responses.JSONResponse({"detail": exception.message}, status_code=409)
+    except ValueError as exception:
+        return fastapi.responses.JSONResponse({"detail": str(exception)}, status_code=422)
+    return fastapi.responses.JSONResponse({"paths": paths})
+
+
+@app.put("/-/admin/links/{name}", dependencies=[fastapi.Depends(check_admin_token)])
+def route_admin_set_simple_link(name: str, body: SimpleLinkBody) -> fastapi.responses.JSONResponse:
+    """Create or replace the simple link."""
+    table = parse_config.ParseConfigToMachineData()
+    return change_links(lambda: table.set_simple_link(name, body.to, body.status, body.max_age))
+
+
+@app.put("/-/admin/links/{project_name}/{link_type}", dependencies=[fastapi.Depends(check_admin_token)])
+def route_admin_set_project_link(
+    project_name: str, link_type: str, body: ProjectLinkBody
+) -> fastapi.responses.JSONResponse:
+    """Create or replace the project link with its aliases, other links of the project are kept."""
+    table = parse_config.ParseConfigToMachineData()
+    settings = config_module.LinkSettings(**dataclasses.asdict(body))
+    return change_links(lambda: table.set_project_link(project_name, link_type, settings))
+
+
+@app.delete("/-/admin/links/{name}", dependencies=[fastapi.Depends(check_admin_token)])
+def route_admin_delete_link(name: str) -> fastapi.responses.JSONResponse:
+    """Delete the simple link, or the whole project."""
+    table = parse_config.ParseConfigToMachineData()
+    return change_links(lambda: table.delete_link(name))
+
+
+@app.delete("/-/admin/links/{project_name}/{link_type}", dependencies=[fastapi.Depends(check_admin_token)])
+def route_admin_delete_project_link(
+    project_name: str, link_type: str, with_aliases: bool = False
+) -> fastapi.responses.JSONResponse:
+    """Delete the link type (or alias) of the project, and other aliases of its destination if ``with_aliases``."""
+    table = parse_config.ParseConfigToMachineData()
+    return change_links(lambda: table.delete_link(project_name, link_type, with_aliases))
+
+
+@app.api_route("/{project_name}/{link_type}", methods=["GET", "HEAD"], response_model=None)  # like the fast path
 def route_project_link(
-    project_name: str, link_type: str
+    project_name: str, link_type: str, request: fastapi.Request
 ) -> fastapi.responses.RedirectResponse | fastapi.responses.PlainTextResponse:
     """Route for the project link."""
-    return find_and_redirect_to_the_link(project_name, link_type)
+    return find_and_redirect_to_the_link(project_name, link_type, request.scope["query_string"])
 
 
-@app.get("/{link_type}", response_model=None)
-def route_simple_link(link_type: str) -> fastapi.responses.RedirectResponse | fastapi.responses.PlainTextResponse:
+@app.api_route("/{link_type}", methods=["GET", "HEAD"], response_model=None)  # like the fast path
+def route_simple_link(
+    link_type: str, request: fastapi.Request
+) -> fastapi.responses.RedirectResponse | fastapi.responses.PlainTextResponse:
     """Route for the simple link."""
-    return find_and_redirect_to_the_link(link_type, None)
+    return find_and_redirect_to_the_link(link_type, None, request.scope["query_string"])
 
 
 @app.exception_handler(404)
-def handle_404(*_, **__) -> fastapi.responses.HTMLResponse:
-    """Redirect to my site on ``Not found`` error."""
-    return fastapi.responses.HTMLResponse(NOT_FOUND_HTML, status_code=404)
+def handle_404(
+    request: fastapi.Request, *_, **__
+) -> fastapi.responses.HTMLResponse | fastapi.responses.RedirectResponse:
+    """Redirect to my site on ``Not found`` error, and suggest the closest links.
+
+    Paths, deeper than project links, never reach our routes, so templated links are tried here.
+    """
+    if request.method in ("GET", "HEAD"):
+        routed = redirect_to_route(request.url.path, request.scope["query_string"], time.perf_counter())
+        if routed is not None:
+            return routed
+
+    hot_links.HotLinks().miss(request.url.path.lower())
+    suggestions: list[str] = []
+    segments = request.url.path[1:].lower().split("/")
+    if len(segments) <= 2 and "" not in segments:
+        suggestions = parse_config.ParseConfigToMachineData().suggest(
+            segments[0], segments[1] if len(segments) == 2 else None
+        )
+
+    return fastapi.responses.HTMLResponse(responses.not_found_html(suggestions), status_code=404)
+
+
+# enabled by `server.fast_path`, which is read only when the first request (or lifespan event) comes
+app.add_middleware(fast_path.FastRedirectMiddleware)
 
 
 def start() -> None:
-    uvicorn.run("app", host=os.environ["HOST"], port=os.environ["PORT"])
+    """Start the server on ``HOST`` and ``PORT`` from environment variables."""
+    prepare()
+    server.run(app, host=os.environ["HOST"], port=int(os.environ["PORT"]))
@@ -0,0 +1,164 @@
+"""Command line interface, entrypoint of ``short-it`` command."""
+import argparse
+import pathlib
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Parse arguments and run the chosen command (``serve`` by default)."""
+    parser = argparse.ArgumentParser(prog="short-it", description="My personal link shorter.")
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="time the import and every startup phase, and exit"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("serve", help="start the server (default)")
+    subparsers.add_parser("compile", help="compile data/config.yml into the snapshot, to speed up the next start")
+    stats_parser = subparsers.add_parser("stats", help="show click counts of links")
+    stats_parser.add_argument("--limit", type=int, help="show only this many most clicked links")
+    stats_parser.add_argument("--json", action="store_true", help="print as JSON")
+    export_parser = subparsers.add_parser("export", help="export links for nginx, Caddy or a static site")
+    export_parser.add_argument("format", choices=["nginx", "caddy", "static"])
+    export_parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="file (directory for static site) to write, stdout by default"
+    )
+
+    check_parser = subparsers.add_parser("check-links", help="check that destinations of all links are alive")
+    check_parser.add_argument("-o", "--output", type=pathlib.Path, help="write the JSON report with all results")
+    check_parser.add_argument("--concurrency", type=int, default=100, help="concurrent requests (default: 100)")
+    check_parser.add_argument("--per-host", type=int, default=4, help="concurrent requests per host (default: 4)")
+    check_parser.add_argument("--timeout", type=float, default=10.0, help="seconds per attempt (default: 10)")
+    check_parser.add_argument("--retries", type=int, default=2, help="retries of failed requests (default: 2)")
+
+    find_parser = subparsers.add_parser("find-links", help="find links by their destinations")
+    query = find_parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--to", help="links to exactly this destination")
+    query.add_argument("--prefix", help="links to destinations, which start with this, e.g. a moved repository")
+    query.add_argument("--host", help="links to destinations on this host or its subdomains, e.g. a dead domain")
+    query.add_argument(
+        "--duplicates", action="store_true", help="destinations, which links of more than one project redirect to"
+    )
+    find_parser.add_argument("--limit", type=int, help="show only this many destinations")
+    find_parser.add_argument("--json", action="store_true", help="print as JSON")
+
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    match args.command:
+        case "compile":
+            compile_snapshot()
+        case "stats":
+            show_stats(args.limit, args.json)
+        case "export":
+            if args.format == "static" and args.output is None:
+                parser.error("static site needs --output directory")
+            export_links(args.format, args.output)
+        case "check-links":
+            if not check_links(args.output, args.concurrency, args.per_host, args.timeout, args.retries):
+                raise SystemExit(1)
+        case "find-links":
+            find_links(args.to, args.prefix, args.host, args.duplicates, args.limit, args.json)
+        case _:
+            import short_it.app
+
+            short_it.app.start()
+
+
+def profile_startup() -> None:
+    """Do everything the server does before it starts listening, and print how long every phase took.
+
+    Run it with ``PYTHONPROFILEIMPORTTIME=1`` environment variable to see, which imports are slow.
+    """
+    import short_it.startup as startup
+
+    with startup.phase("import"):
+        import short_it.app
+
+    short_it.app.prepare()
+    with startup.phase("sentry"):
+        short_it.utils.start_sentry()
+    print(startup.report())
+
+
+def compile_snapshot() -> None:
+    """Compile ``data/config.yml`` into the snapshot."""
+    import short_it.config as config_module
+    import short_it.parse_config as parse_config
+
+    table = parse_config.ParseConfigToMachineData(use_snapshot=False)
+    print(f"Compiled {len(table)} projects and simple links into {config_module.SNAPSHOT_PATH}")
+
+
+def show_stats(limit: int | None, as_json: bool) -> None:
+    """Print click counts, flushed by all workers."""
+    import json
+
+    import short_it.config as config_module
+    import short_it.stats as stats
+
+    counts = stats.read_counts(stats.stats_path(config_module.Config()), limit)
+    if as_json:
+        print(json.dumps([{"path": path, "count": count} for path, count in counts], indent=2))
+        return
+
+    for path, count in counts:
+        print(f"{count:>10} {path}")
+
+
+def export_links(export_format: str, output: pathlib.Path | None) -> None:
+    """Export links, see :mod:`short_it.export`."""
+    import short_it.export as export
+    import short_it.parse_config as parse_config
+
+    table = parse_config.ParseConfigToMachineData()
+    if export_format == "static":
+        assert output is not None
+        written = export.static_site(table, output)
+        print(f"Written {written} pages and the 404 page into {output}")
+        return
+
+    rendered = export.nginx(table) if export_format == "nginx" else export.caddy(table)
+    if output is None:
+        print(rendered, end="")
+    else:
+        output.write_text(rendered, encoding="utf-8")
+
+
+def check_links(output: pathlib.Path | None, concurrency: int, per_host: int, timeout: float, retries: int) -> bool:
+    """Check destinations of all links, see :mod:`short_it.link_checker`, and print dead ones.
+
+    Returns:
+        :obj:`True` if all destinations are alive.
+    """
+    import dataclasses
+    import json
+
+    import short_it.link_checker as link_checker
+    import short_it.parse_config as parse_config
+
+    checker = link_checker.LinkChecker(concurrency, per_host, timeout, retries)
+    results = link_checker.check(parse_config.ParseConfigToMachineData().destinations(), checker)
+    print(link_checker.report(results))
+    if output is not None:
+        report = [dataclasses.asdict(result) | {"alive": result.alive} for result in results]
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return all(result.alive for result in results)
+
+
+def find_links(
+    to: str | None, prefix: str | None, host: str | None, duplicates: bool, limit: int | None, as_json: bool
+) -> None:
+    """Print links by their destinations, see :mod:`short_it.reverse_index`."""
+    import json
+
+    import short_it.parse_config as parse_config
+
+    found = parse_config.ParseConfigToMachineData().find_links(to, prefix, host, duplicates, limit)
+    if as_json:
+        print(json.dumps([{"to": destination, "paths": paths} for destination, paths in found.items()], indent=2))
+        return
+
+    for destination, paths in found.items():
+        print(destination)
+        for path in paths:
+            print(f"    {path}")
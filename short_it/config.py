@@ -1,23 +1,183 @@
 """File for the main config."""
 import dataclasses
+import io
+import os
 import pathlib
 import typing as t
 
-import omegaconf
 import typing_extensions as te
 
-from short_it import utils
+from short_it import shards, snapshot, utils
 
 BASE_DIR = pathlib.Path(__file__).parent.parent
+DATA_DIR = pathlib.Path(os.environ.get("SHORT_IT_DATA_DIR", BASE_DIR / "data"))
+CONFIG_PATH = DATA_DIR / "config.yml"
+SNAPSHOT_PATH = DATA_DIR / "config.snapshot"
+SHARDS_DIR = DATA_DIR / "config.d"
+_LINKS_FIELDS = frozenset({"projects", "simple"})
+REDIRECT_STATUSES = frozenset({301, 302, 307, 308})
+_parsed: "tuple[Config, bytes | None] | None" = None  # see `take_parsed`
 
 
 @dataclasses.dataclass
 class SentryConfigSection:
-    """Sentry config section."""
+    """Sentry config section.
+
+    ``route_sample_rates`` override ``traces_sample_rate`` for exact paths. If
+    more than ``max_traces_per_second`` traces would be sampled, all rates are
+    lowered proportionally (``null`` to disable). ``profiles_sample_rate`` is the
+    share of sampled traces, which are also profiled. Errors are always sent.
+    """
 
     enabled: bool = False
     dsn: str = "..."
     traces_sample_rate: float = 1.0
+    route_sample_rates: dict[str, float] = dataclasses.field(default_factory=lambda: {"/-/metrics": 0.0})
+    max_traces_per_second: float | None = 10.0
+    profiles_sample_rate: float = 1.0
+
+
+@dataclasses.dataclass
+class ReloadConfigSection:
+    """Hot-reload config section."""
+
+    enabled: bool = True
+    interval: float = 1.0
+
+
+@dataclasses.dataclass
+class ServerConfigSection:
+    """Server config section.
+
+    ``workers`` is the amount of worker processes (``0`` is one per CPU core),
+    ``keep_alive`` is in seconds, and ``limit_concurrency`` is the maximum amount
+    of concurrent connections per worker, after which ``503`` is returned.
+    """
+
+    fast_path: bool = True
+    workers: int = 1
+    backlog: int = 2048
+    keep_alive: int = 5
+    limit_concurrency: int | None = None
+
+
+@dataclasses.dataclass
+class StoreConfigSection:
+    """Link store config section.
+
+    ``backend`` is either ``memory`` (links are parsed from YAML into a dict),
+    ``sqlite`` (links are imported from YAML into a read-only SQLite database at
+    ``sqlite_path``), or ``mmap`` (links are compiled into a memory-mapped index
+    at ``mmap_path``). Paths are relative to the data directory.
+    """
+
+    backend: str = "memory"
+    sqlite_path: str = "links.sqlite3"
+    mmap_path: str = "links.index"
+
+
+@dataclasses.dataclass
+class SuggestionsConfigSection:
+    """Config section for "did you mean" suggestions on the 404 page.
+
+    Up to ``limit`` links are suggested, which are at most ``max_distance``
+    typos (insertions, deletions or substitutions) away from the requested one.
+    """
+
+    enabled: bool = True
+    limit: int = 3
+    max_distance: int = 2
+
+
+@dataclasses.dataclass
+class StatsConfigSection:
+    """Click counters config section.
+
+    Counts are written to an SQLite database at ``path`` (relative to the data
+    directory) every ``flush_interval`` seconds.
+    """
+
+    enabled: bool = True
+    flush_interval: float = 5.0
+    path: str = "stats.sqlite3"
+
+
+@dataclasses.dataclass
+class HotLinksConfigSection:
+    """Config section for tracking the most requested links in a sliding window.
+
+    The window of ``window`` seconds is split into ``buckets``, and every bucket
+    tracks at most ``capacity`` links and as many 404 paths.
+    """
+
+    enabled: bool = True
+    window: float = 300.0
+    buckets: int = 5
+    capacity: int = 100
+
+
+@dataclasses.dataclass
+class RedirectConfigSection:
+    """Default redirect settings for all links, every link can override them.
+
+    ``status`` is one of :data:`REDIRECT_STATUSES`. If ``max_age`` (in seconds) is
+    set, redirects have ``Cache-Control: public, max-age=...`` header, so browsers
+    and CDNs can cache them.
+    """
+
+    status: int = 307
+    max_age: int | None = None
+
+
+@dataclasses.dataclass
+class AdminConfigSection:
+    """Admin API config section.
+
+    The API at ``/-/admin/`` is enabled only if ``token`` is set, and every
+    request must have ``Authorization: Bearer <token>`` header.
+    """
+
+    token: str | None = None
+
+
+@dataclasses.dataclass
+class JournalConfigSection:
+    """Config section for the journal of links, changed at runtime (see ``admin``).
+
+    Changes are appended to ``path`` (relative to the data directory), and
+    replayed on top of links from the config at every start. The journal is
+    compacted in the background, when it grows past ``compact_after`` bytes.
+    """
+
+    enabled: bool = True
+    path: str = "links.journal"
+    compact_after: int = 1 << 20
+
+
+@dataclasses.dataclass
+class ShardsConfigSection:
+    """Config section for links, split into files in the ``config.d`` directory (see :mod:`short_it.shards`).
+
+    Changed files are parsed in up to ``workers`` processes (``0`` is one per CPU core).
+    """
+
+    workers: int = 0
+
+
+@dataclasses.dataclass
+class SimpleLinkSettings:
+    """Settings for a simple link, if it is not just a destination string."""
+
+    to: str = "..."
+    status: int | None = None
+    max_age: int | None = None
+
+
+if t.TYPE_CHECKING:
+    SimpleLink = str | SimpleLinkSettings
+    Route = str | t.Mapping[str, object]  # settings of templated links are a plain dict in the snapshot
+else:  # OmegaConf can't type a union of a string and a dataclass, these are checked by `_convert_simple_links`
+    SimpleLink = Route = t.Any
 
 
 @dataclasses.dataclass
@@ -27,6 +187,8 @@ class LinkSettings:
     to: str = "..."
     aliases: list[str] | None = None
     additional_aliases: list[str] | None = None
+    status: int | None = None
+    max_age: int | None = None
 
     def resolve_builtin_aliases(self, link_type: str) -> None:
         """Add pre-defined aliases, if user set some often used link type."""
@@ -46,34 +208,221 @@ class LinkSettings:
 
 @dataclasses.dataclass
 class Config(metaclass=utils.Singleton):
-    """The main config that holds everything in itself."""
+    """The main config that holds everything in itself.
+
+    ``routes`` are templated and prefix-forwarding links (see :mod:`short_it.routing`),
+    a pattern and either a destination or :class:`SimpleLinkSettings`. They are
+    few, so they are stored in the snapshot with settings.
+    """
 
     projects: dict[str, dict[str, LinkSettings]] = dataclasses.field(default_factory=dict)
-    simple: dict[str, str] = dataclasses.field(default_factory=dict)
+    simple: dict[str, SimpleLink] = dataclasses.field(default_factory=dict)
+    routes: dict[str, Route] = dataclasses.field(default_factory=dict)
     sentry: SentryConfigSection = dataclasses.field(default_factory=SentryConfigSection)
+    reload: ReloadConfigSection = dataclasses.field(default_factory=ReloadConfigSection)
+    server: ServerConfigSection = dataclasses.field(default_factory=ServerConfigSection)
+    store: StoreConfigSection = dataclasses.field(default_factory=StoreConfigSection)
+    suggestions: SuggestionsConfigSection = dataclasses.field(default_factory=SuggestionsConfigSection)
+    stats: StatsConfigSection = dataclasses.field(default_factory=StatsConfigSection)
+    hot_links: HotLinksConfigSection = dataclasses.field(default_factory=HotLinksConfigSection)
+    redirect: RedirectConfigSection = dataclasses.field(default_factory=RedirectConfigSection)
+    admin: AdminConfigSection = dataclasses.field(default_factory=AdminConfigSection)
+    journal: JournalConfigSection = dataclasses.field(default_factory=JournalConfigSection)
+    shards: ShardsConfigSection = dataclasses.field(default_factory=ShardsConfigSection)
 
     @classmethod
     def _setup(cls) -> te.Self:
         """Set up the config.
 
         It is just load config from file, also it is rewrite config with merged data.
+        If there is an up-to-date snapshot (see :mod:`short_it.snapshot`), settings
+        are loaded from it instead and links are left missing, they are served from
+        the snapshot by :class:`~short_it.parse_config.ParseConfigToMachineData`.
 
         Returns:
             :py:class:`.Config` instance.
         """
-        config_path = BASE_DIR / "data" / "config.yml"
-        config_path.parent.mkdir(exist_ok=True)
+        settings = snapshot.load_settings(SNAPSHOT_PATH, current_hash())
+        if settings is not None:
+            try:
+                return cls.from_settings(settings)
+            except TypeError:  # sections were changed since the snapshot was saved
+                pass
+
+        global _parsed
+        cfg, config_hash = cls.load_with_hash(CONFIG_PATH, save=True)
+        _parsed = (cfg, config_hash)
+        return cfg
+
+    @classmethod
+    def from_settings(cls, settings: snapshot.Settings) -> te.Self:
+        """Create config from settings, stored in the snapshot.
+
+        Settings were validated when the snapshot was compiled, so plain dataclasses
+        are created, without importing OmegaConf. Links (``projects`` and ``simple``)
+        are not a part of settings, so they are missing and raise :exc:`AttributeError`
+        on access.
+
+        Raises:
+            TypeError: If settings don't match the sections.
+        """
+        cfg = object.__new__(cls)  # bypass the singleton
+        for field in dataclasses.fields(cls):
+            if field.name not in _LINKS_FIELDS:
+                section_class = t.cast(type, field.type)
+                setattr(cfg, field.name, section_class(**settings.get(field.name, {})))
+        return cfg
+
+    def to_settings(self) -> snapshot.Settings:
+        """Dump all sections except links, to store them in the snapshot."""
+        if dataclasses.is_dataclass(t.cast(object, self)):  # loaded from the snapshot, see `from_settings`
+            return {
+                field.name: (
+                    getattr(self, field.name)  # `routes` is a plain dict, not a section
+                    if field.name == "routes"
+                    else dataclasses.asdict(getattr(self, field.name))
+                )
+                for field in dataclasses.fields(self)
+                if field.name not in _LINKS_FIELDS
+            }
+
+        import omegaconf
+
+        container = t.cast(
+            snapshot.Settings, omegaconf.OmegaConf.to_container(t.cast(omegaconf.DictConfig, self), resolve=True)
+        )
+        return {key: value for key, value in container.items() if key not in _LINKS_FIELDS}
+
+    @classmethod
+    def load(cls, config_path: pathlib.Path, save: bool = False) -> te.Self:
+        """Load config from the file, without touching the singleton instance.
+
+        Args:
+            config_path: Path to the ``config.yml`` file.
+            save: Rewrite the file with merged data (including defaults).
+
+        Returns:
+            :py:class:`.Config` instance.
+        """
+        return cls.load_with_hash(config_path, save)[0]
+
+    @classmethod
+    def load_with_hash(cls, config_path: pathlib.Path, save: bool = False) -> tuple[te.Self, bytes | None]:
+        """Same as :meth:`.load`, but also return hash of the file content.
+
+        The hash is calculated from exactly the bytes which were parsed (or saved,
+        if ``save`` is :obj:`True`), so it can't go out of sync with the config
+        if the file is edited concurrently.
+
+        Returns:
+            :py:class:`.Config` instance, and the hash (:obj:`None` if file doesn't exist).
+        """
+        import omegaconf  # slow to import, and not needed if config is loaded from the snapshot
+
         cfg = omegaconf.OmegaConf.structured(cls)
+        config_hash = None
 
-        if config_path.exists():
-            loaded_config = omegaconf.OmegaConf.load(config_path)
+        try:
+            raw = config_path.read_bytes()
+        except FileNotFoundError:
+            pass
+        else:
+            config_hash = snapshot.hash_bytes(raw)
+            loaded_config = omegaconf.OmegaConf.load(io.BytesIO(raw))
             cfg = omegaconf.OmegaConf.merge(cfg, loaded_config)
 
-        with open(config_path, "w") as config_file:
-            omegaconf.OmegaConf.save(cfg, config_file)
+        _validate_links(cfg)
+        _convert_simple_links(t.cast(dict[str, SimpleLink], cfg.routes))  # templated links have the same settings
+        validate_status(cfg.redirect.status)
+
+        if save:
+            raw = omegaconf.OmegaConf.to_yaml(cfg).encode()
+            config_hash = snapshot.hash_bytes(raw)
+            config_path.parent.mkdir(exist_ok=True)
+            config_path.write_bytes(raw)
+
+        _resolve_builtin_aliases(cfg)
+        return t.cast(te.Self, cfg), config_hash
+
+
+@dataclasses.dataclass
+class ShardConfig:
+    """Links from one file of the ``config.d`` directory, see :mod:`short_it.shards`."""
+
+    projects: dict[str, dict[str, LinkSettings]] = dataclasses.field(default_factory=dict)
+    simple: dict[str, SimpleLink] = dataclasses.field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, raw: bytes) -> te.Self:
+        """Parse and validate content of the file.
+
+        Raises:
+            omegaconf.errors.OmegaConfBaseException: If there are unknown keys, or values have wrong types.
+            ValueError: If a redirect status is not supported.
+        """
+        import omegaconf
+
+        cfg = t.cast(
+            te.Self,
+            omegaconf.OmegaConf.merge(
+                omegaconf.OmegaConf.structured(cls), omegaconf.OmegaConf.load(io.BytesIO(raw)) or {}
+            ),
+        )
+        _validate_links(cfg)
+        _resolve_builtin_aliases(cfg)
+        return cfg
+
+
+def take_parsed(cfg: Config) -> tuple[Config, bytes | None] | None:
+    """The config and hash of ``config.yml``, if ``cfg`` was parsed from the file by :meth:`Config._setup`.
+
+    So the table is built from it, and the file is not parsed twice on the start.
+    It is returned only once, later reloads parse the file again.
+    """
+    global _parsed
+    parsed, _parsed = _parsed, None
+    if parsed is None or parsed[0] is not cfg:
+        return None
+    return parsed
+
+
+def current_hash() -> bytes | None:
+    """Hash of ``config.yml`` and all shards, which the snapshot and stores are keyed by."""
+    return shards.combined_hash(snapshot.hash_file(CONFIG_PATH), shards.hash_files(SHARDS_DIR))
+
+
+def _validate_links(cfg: Config | ShardConfig) -> None:
+    """Convert settings of simple links, and validate redirect statuses of all links, in the loaded config."""
+    _convert_simple_links(cfg.simple)
+    for project in cfg.projects.values():
+        for link_settings in project.values():
+            validate_status(getattr(link_settings, "status", None))
+
+
+def _convert_simple_links(links: dict[str, SimpleLink]) -> None:
+    """Convert mappings to :class:`SimpleLinkSettings`, which OmegaConf can't type, and validate their statuses.
+
+    Simple links are either a destination string or :class:`SimpleLinkSettings`.
+    """
+    import omegaconf
+
+    for name, simple_link in links.items():
+        if not isinstance(simple_link, str):
+            links[name] = simple_link = t.cast(
+                SimpleLinkSettings,
+                omegaconf.OmegaConf.merge(omegaconf.OmegaConf.structured(SimpleLinkSettings), simple_link),
+            )
+            validate_status(simple_link.status)
+
+
+def _resolve_builtin_aliases(cfg: Config | ShardConfig) -> None:
+    """Add builtin aliases to all project links in the loaded config, see :meth:`LinkSettings.resolve_builtin_aliases`."""
+    for project in cfg.projects.values():
+        for link_type, link_settings in project.items():
+            LinkSettings.resolve_builtin_aliases(link_settings, link_type)
 
-        for project in cfg.projects.values():
-            for link_type, link_settings in project.items():
-                LinkSettings.resolve_builtin_aliases(link_settings, link_type)
 
-        return t.cast(te.Self, cfg)
+def validate_status(status: int | None) -> None:
+    """Raise :exc:`ValueError`, if the status is not a redirect status, which we support."""
+    if status is not None and status not in REDIRECT_STATUSES:
+        raise ValueError(f"Unsupported redirect status {status}, choose from {sorted(REDIRECT_STATUSES)}")
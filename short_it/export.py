@@ -0,0 +1,201 @@
+"""Export the link table for nginx, Caddy or a static site, so plain redirects don't hit Python at all.
+
+Every exported path gets exactly the response, which the server would send for it
+(see :meth:`~short_it.parse_config.ParseConfigToMachineData.get_response`). Only
+responses, which can be told from the path alone, are exported: redirects, and the
+error for a project without link type. Everything else (the error for a simple
+link with link type, the 404 page with suggestions, service endpoints, paths
+with characters, which are hard to escape, and for Caddy paths in other case) is
+left to the server, so nginx and Caddy must pass unmatched requests to it. nginx
+matches ``map`` keys ignoring case, like the server does. A static site has no
+server behind it, so there such paths get the plain 404 page.
+"""
+import dataclasses
+import html
+import pathlib
+import re
+import typing as t
+
+import short_it.parse_config as parse_config
+import short_it.responses as responses
+
+# paths with only these characters look the same in raw requests, in config files and on disk
+_SAFE_PATH = re.compile(r"(?:/[a-z0-9_~-][a-z0-9._~-]*){1,2}")
+_STATUSES = (301, 302, 307, 308)
+NOT_FOUND_PAGE = "404.html"
+
+NGINX_HEADER = """\
+# Generated by `short-it export nginx`, do not edit.
+#
+# Include this file in the `http` block, and route requests in the `server` block with:
+#
+#     location / {
+#         default_type "text/plain; charset=utf-8";
+#         add_header Cache-Control $short_it_cache_control;
+#         if ($short_it_status = 301) { return 301 $short_it_location; }
+#         if ($short_it_status = 302) { return 302 $short_it_location; }
+#         if ($short_it_status = 307) { return 307 $short_it_location; }
+#         if ($short_it_status = 308) { return 308 $short_it_location; }
+#         if ($short_it_status = 200) { return 200 "%(multiple_links_error)s"; }
+#         proxy_pass http://127.0.0.1:8000;  # short-it, for everything else
+#     }
+"""
+
+CADDY_HEADER = """\
+# Generated by `short-it export caddy`, do not edit.
+#
+# Import this file in the site block, before passing everything else to short-it:
+#
+#     example.com {
+#         import short-it.caddy
+#         reverse_proxy 127.0.0.1:8000
+#     }
+"""
+
+REDIRECT_PAGE = """\
+<!DOCTYPE html>
+<html>
+   <head>
+      <meta charset="utf-8" />
+      <meta http-equiv="refresh" content="0; url={url}" />
+      <link rel="canonical" href="{url}" />
+   </head>
+   <body>
+      Redirecting to <a href="{url}">{url}</a>.
+   </body>
+</html>
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class Redirect:
+    """Exported redirect."""
+
+    path: str
+    status: int
+    location: str
+    cache_control: str | None
+
+
+def export(table: parse_config.ParseConfigToMachineData) -> t.Iterator[Redirect | str]:
+    """Responses of all exportable paths.
+
+    Yields:
+        :class:`Redirect`, or the path of a project, which responds with the multiple links error.
+    """
+    for path in table.paths():
+        if not _SAFE_PATH.fullmatch(path):
+            continue
+
+        response = table.get_response(path)
+        if response is None:
+            continue
+        if response is parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE:
+            yield path
+            continue
+        if not response.is_redirect:
+            continue
+
+        headers = dict(response.headers)
+        cache_control = headers.get(b"cache-control")
+        yield Redirect(
+            path=path,
+            status=response.status,
+            location=headers[b"location"].decode("latin-1"),
+            cache_control=None if cache_control is None else cache_control.decode("latin-1"),
+        )
+
+
+def nginx(table: parse_config.ParseConfigToMachineData) -> str:
+    """Render maps for nginx, see :data:`NGINX_HEADER` for how to use them."""
+    statuses, locations, cache_controls = [], [], []
+    for entry in export(table):
+        if isinstance(entry, str):
+            statuses.append(f"    {entry} 200;")
+            continue
+        if "$" in entry.location:  # nginx would treat it as a variable, and there is no way to escape it
+            continue
+
+        statuses.append(f"    {entry.path} {entry.status};")
+        locations.append(f'    {entry.path} "{entry.location}";')
+        if entry.cache_control is not None:
+            cache_controls.append(f'    {entry.path} "{entry.cache_control}";')
+
+    lines = [
+        NGINX_HEADER % {"multiple_links_error": parse_config.MultipleLinksNoLinkTypeError().message},
+        "# path without query string, not decoded, so encoded paths are passed to short-it",
+        "# (keys of maps below are matched ignoring case, like short-it does)",
+        "map $request_uri $short_it_path {",
+        '    "~^(?<short_it_raw_path>[^?]*)" $short_it_raw_path;',
+        "}",
+        _nginx_map("$short_it_status", statuses),
+        _nginx_map("$short_it_location", locations),
+        _nginx_map("$short_it_cache_control", cache_controls),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _nginx_map(variable: str, lines: list[str]) -> str:
+    """Render one nginx ``map`` from the request path."""
+    return "\n".join([f"map $short_it_path {variable} {{", '    default "";', *lines, "}"])
+
+
+def caddy(table: parse_config.ParseConfigToMachineData) -> str:
+    """Render directives for a Caddyfile (see :data:`CADDY_HEADER` for how to use them)."""
+    lines = [
+        CADDY_HEADER,
+        "map {path} {short_it_status} {short_it_location} {short_it_cache_control} {",
+        '    default "" "" ""',
+    ]
+    for entry in export(table):
+        if isinstance(entry, str):
+            lines.append(f'    {entry} 200 "" ""')
+        else:
+            lines.append(f'    {entry.path} {entry.status} "{entry.location}" "{entry.cache_control or ""}"')
+    lines.append("}")
+
+    lines += [
+        "",
+        '@short_it_cached not vars {short_it_cache_control} ""',
+        "header @short_it_cached Cache-Control {short_it_cache_control}",
+    ]
+    for status in _STATUSES:
+        lines += [
+            f"@short_it_{status} vars {{short_it_status}} {status}",
+            f"redir @short_it_{status} {{short_it_location}} {status}",
+        ]
+    message = parse_config.MultipleLinksNoLinkTypeError().message
+    lines += [
+        "@short_it_multiple_links vars {short_it_status} 200",
+        f'respond @short_it_multiple_links "{message}" 200',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def static_site(table: parse_config.ParseConfigToMachineData, output: pathlib.Path) -> int:
+    """Write a static site with ``meta`` refresh pages, and the 404 page.
+
+    Static hosts can't redirect with a status, or match paths case-insensitively,
+    so every link is a page, which redirects with ``<meta http-equiv="refresh">``
+    (served at the lowercase path only).
+
+    Returns:
+        Amount of written pages, the 404 page excluded.
+    """
+    written = 0
+    for entry in export(table):
+        path = entry if isinstance(entry, str) else entry.path
+        if path == f"/{NOT_FOUND_PAGE}":
+            continue
+
+        page = output / path[1:] / "index.html"
+        page.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(entry, str):
+            page.write_text(parse_config.MultipleLinksNoLinkTypeError().message, encoding="utf-8")
+        else:
+            page.write_text(REDIRECT_PAGE.format(url=html.escape(entry.location)), encoding="utf-8")
+        written += 1
+
+    output.mkdir(parents=True, exist_ok=True)
+    (output / NOT_FOUND_PAGE).write_text(responses.NOT_FOUND_HTML, encoding="utf-8")
+    return written
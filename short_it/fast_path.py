@@ -0,0 +1,63 @@
+"""Lean ASGI middleware, which serves redirects without going through FastAPI.
+
+Every redirect is a single dict lookup, so FastAPI routing, parameter validation
+and a hop to the threadpool (handlers are plain ``def``) are most of the cost.
+This middleware handles ``/{project_name}`` and ``/{project_name}/{link_type}``
+paths (and templated links, see :mod:`short_it.routing`) itself, and passes
+everything else (other methods, deeper paths, trailing slashes, etc.) to the
+wrapped app. Responses are pre-built at parse time (see
+:mod:`short_it.responses`), and are byte-for-byte the same as the handlers in
+:mod:`short_it.app` produce.
+"""
+import time
+import typing as t
+
+import short_it.config as config_module
+import short_it.hot_links as hot_links
+import short_it.metrics as metrics
+import short_it.parse_config as parse_config
+import short_it.stats as stats
+
+Scope: t.TypeAlias = t.MutableMapping[str, t.Any]  # type: ignore[misc] # ASGI is untyped by design
+Message: t.TypeAlias = t.MutableMapping[str, t.Any]  # type: ignore[misc] # ASGI is untyped by design
+Receive: t.TypeAlias = t.Callable[[], t.Awaitable[Message]]
+Send: t.TypeAlias = t.Callable[[Message], t.Awaitable[None]]
+ASGIApp: t.TypeAlias = t.Callable[[Scope, Receive, Send], t.Awaitable[None]]
+
+_METHODS = frozenset({"GET", "HEAD"})
+
+
+class FastRedirectMiddleware:
+    """Serve redirects directly, before the request reaches FastAPI."""
+
+    def __init__(self, app: ASGIApp, enabled: bool | None = None) -> None:
+        """Wrap the app.
+
+        Args:
+            app: App, which handles all other requests.
+            enabled: If :obj:`False`, pass all requests to the app. By default,
+                ``server.fast_path`` from the config. Starlette creates middlewares
+                on the first ASGI event, so the config is not loaded at import time.
+        """
+        self.app = app
+        self.enabled = config_module.Config().server.fast_path if enabled is None else enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle the request, or pass it to the wrapped app."""
+        if not self.enabled or scope["type"] != "http" or scope["method"] not in _METHODS or scope.get("root_path"):
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        response = parse_config.ParseConfigToMachineData().get_response(scope["path"], scope.get("query_string", b""))
+        if response is None:
+            return await self.app(scope, receive, send)
+        if response.is_redirect:
+            path = response.route or scope["path"].lower()
+            stats.ClickCounter().hit(path)
+            hot_links.HotLinks().hit(path)
+        elif response.status == 404:
+            hot_links.HotLinks().miss(scope["path"].lower())
+
+        await send({"type": "http.response.start", "status": response.status, "headers": response.headers})
+        await send({"type": "http.response.body", "body": response.body})
+        metrics.observe(metrics.outcome_of(response), time.perf_counter() - start)
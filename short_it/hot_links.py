@@ -0,0 +1,184 @@
+"""What's hot right now: the most requested links (and 404 paths) in a sliding time window.
+
+Exact counts (see :mod:`short_it.stats`) grow with the amount of distinct paths,
+and scanners can request unlimited amount of junk paths. So here every time
+bucket of the window is a :class:`SpaceSaving` sketch with fixed capacity, and
+memory stays the same no matter how many distinct paths hit us.
+
+Like in :mod:`short_it.stats`, the hot path only appends to a queue, and sketches
+are updated by a background thread (and before every read). Every worker keeps
+its own sketches.
+"""
+import collections
+import heapq
+import logging
+import threading
+import time
+
+import short_it.config as config_module
+import short_it.utils as utils
+
+logger = logging.getLogger(__name__)
+
+# junk paths can be arbitrary long, so only the beginning of them is tracked
+MAX_PATH_LENGTH = 200
+# if the background thread can't keep up, the oldest requests are dropped instead of growing the queue
+MAX_PENDING = 100_000
+
+
+class SpaceSaving:
+    """Top-K heavy hitters in fixed memory, with "Space-Saving" algorithm by Metwally et al.
+
+    At most ``capacity`` keys are tracked. A new key replaces the one with the
+    smallest count, and inherits its count as a possible overestimation (error).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._counts: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        self._heap: list[tuple[int, str]] = []  # may have outdated entries, they are skipped
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Count the key ``count`` times."""
+        if key in self._counts:
+            self._counts[key] += count
+        elif len(self._counts) < self._capacity:
+            self._counts[key] = count
+            self._errors[key] = 0
+        else:
+            min_count, min_key = self._pop_min()
+            del self._counts[min_key], self._errors[min_key]
+            self._counts[key] = min_count + count
+            self._errors[key] = min_count
+
+        heapq.heappush(self._heap, (self._counts[key], key))
+        if len(self._heap) > 4 * self._capacity:
+            self._heap = [(key_count, key) for key, key_count in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def items(self) -> list[tuple[str, int, int]]:
+        """Tracked keys, their counts and maximum overestimations of counts."""
+        return [(key, key_count, self._errors[key]) for key, key_count in self._counts.items()]
+
+    def _pop_min(self) -> tuple[int, str]:
+        """Remove the actual entry with the smallest count from the heap."""
+        while True:
+            key_count, key = heapq.heappop(self._heap)
+            if self._counts.get(key) == key_count:
+                return key_count, key
+
+
+class _Bucket:
+    """Sketches for one time bucket of the window."""
+
+    def __init__(self, start: float, capacity: int) -> None:
+        self.start = start
+        self.hits = SpaceSaving(capacity)
+        self.misses = SpaceSaving(capacity)
+
+
+class HotLinks(metaclass=utils.Singleton):
+    """The most requested links and 404 paths in the last ``hot_links.window`` seconds."""
+
+    def __init__(self) -> None:
+        config = config_module.Config().hot_links
+        self._enabled = config.enabled
+        self._window = config.window
+        self._bucket_duration = config.window / config.buckets
+        self._capacity = config.capacity
+
+        self._pending: collections.deque[tuple[bool, str]] = collections.deque(maxlen=MAX_PENDING)
+        #                                     ^^^^  ^^^
+        #                                   is hit  path
+        self._buckets: collections.deque[_Bucket] = collections.deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def hit(self, path: str) -> None:
+        """Track a redirect, called on the hot path."""
+        if self._enabled:
+            self._pending.append((True, path[:MAX_PATH_LENGTH]))
+
+    def miss(self, path: str) -> None:
+        """Track a 404, called on the hot path."""
+        if self._enabled:
+            self._pending.append((False, path[:MAX_PATH_LENGTH]))
+
+    def start(self) -> None:
+        """Start updating sketches in the background thread."""
+        if not self._enabled:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="short-it-hot-links", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def update(self, now: float | None = None) -> None:
+        """Move queued requests into the current bucket, and drop buckets which are out of the window."""
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            hits: collections.Counter[str] = collections.Counter()
+            misses: collections.Counter[str] = collections.Counter()
+            while True:
+                try:
+                    is_hit, path = self._pending.popleft()
+                except IndexError:
+                    break
+                (hits if is_hit else misses)[path] += 1
+
+            if not self._buckets or now - self._buckets[-1].start >= self._bucket_duration:
+                self._buckets.append(_Bucket(now, self._capacity))
+            while now - self._buckets[0].start >= self._window:
+                self._buckets.popleft()
+
+            bucket = self._buckets[-1]
+            for path, count in hits.items():
+                bucket.hits.add(path, count)
+            for path, count in misses.items():
+                bucket.misses.add(path, count)
+
+    def top(self, limit: int = 10) -> dict[str, list[dict[str, str | int]]]:
+        """The most requested links and 404 paths in the window.
+
+        ``count`` may be overestimated by at most ``error`` (see :class:`SpaceSaving`).
+
+        Returns:
+            ``hits`` and ``misses``, the most requested first.
+        """
+        self.update()
+        with self._lock:
+            return {
+                "hits": _merge([bucket.hits for bucket in self._buckets], limit),
+                "misses": _merge([bucket.misses for bucket in self._buckets], limit),
+            }
+
+    def _run(self) -> None:
+        """Main loop of the background thread."""
+        while not self._stop_event.wait(1):
+            try:
+                self.update()
+            except Exception:
+                logger.exception("Failed to update hot links")
+
+
+def _merge(sketches: list[SpaceSaving], limit: int) -> list[dict[str, str | int]]:
+    """Sum counts of the same keys in all sketches, and return the top."""
+    counts: collections.Counter[str] = collections.Counter()
+    errors: collections.Counter[str] = collections.Counter()
+    for sketch in sketches:
+        for key, key_count, error in sketch.items():
+            counts[key] += key_count
+            errors[key] += error
+
+    return [{"path": key, "count": key_count, "error": errors[key]} for key, key_count in counts.most_common(limit)]
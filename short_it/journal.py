@@ -0,0 +1,371 @@
+"""Append-only journal of links, which were changed at runtime (see the admin API in :mod:`short_it.app`).
+
+Every change is one record with the new state of the whole project (or simple
+link), which it touched. So the journal is replayed on top of the table from the
+config at every start (and reload), and only the last record of every project
+matters, older ones are dropped by compaction.
+
+The file starts with :data:`MAGIC`, and every record is its length and CRC32
+(both are 4 bytes, little endian), and then the JSON payload. A crash can leave
+only the last record torn, it is detected by the length or CRC and cut off when
+the journal is opened. Records are written with a single ``write`` call, and
+fsync-ed in batches: while one writer waits for ``fsync``, others append their
+records, and the next ``fsync`` makes all of them durable at once.
+
+Compaction writes the latest records into a new file, which atomically replaces
+the journal. It runs in the background, once the journal grows past the
+threshold, and writers are blocked only while the records, appended during
+compaction, are copied over.
+
+Several processes (e.g. two servers with one data directory) can write one
+journal. Appends hold a shared ``flock`` of the lock file next to it, and
+compaction holds an exclusive one while it re-reads records, appended by
+everyone, and replaces the file. Writers reopen the journal, once it was
+replaced by another process.
+"""
+import contextlib
+import dataclasses
+import fcntl
+import glob
+import json
+import logging
+import os
+import pathlib
+import struct
+import tempfile
+import threading
+import typing as t
+import zlib
+
+import short_it.responses as responses
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"short-it journal 1\n"
+_HEADER = struct.Struct("<II")
+#                         ^^
+#         payload length  CRC32 of the payload
+
+
+@dataclasses.dataclass(frozen=True)
+class Record:
+    """New state of one project (or simple link).
+
+    ``links`` is :obj:`None`, if it was deleted. ``redirects`` are options of
+    its paths, which differ from the default ones (see :mod:`short_it.responses`).
+    """
+
+    name: str
+    links: str | dict[str, str] | None
+    redirects: dict[str, responses.RedirectOptions] = dataclasses.field(default_factory=dict)
+
+    def encode(self) -> bytes:
+        """Payload of the record."""
+        return json.dumps([self.name, self.links, self.redirects], separators=(",", ":")).encode()
+
+    @classmethod
+    def decode(cls, payload: bytes) -> "Record":
+        """Record from the payload."""
+        name, links, redirects = json.loads(payload)
+        return cls(name, links, {path: (status, max_age) for path, (status, max_age) in redirects.items()})
+
+
+def apply(
+    records: t.Iterable[Record],
+    data: t.MutableMapping[str, str | t.Mapping[str, str]],
+    redirects: t.MutableMapping[str, responses.RedirectOptions],
+) -> None:
+    """Replace projects in the table (and their redirect options) with ones from records, in place."""
+    for record in records:
+        old_links = data.get(record.name)
+        redirects.pop(f"/{record.name}", None)
+        if old_links is not None and not isinstance(old_links, str):
+            for alias in old_links:
+                redirects.pop(f"/{record.name}/{alias}", None)
+
+        if record.links is None:
+            data.pop(record.name, None)
+        else:
+            data[record.name] = record.links
+        redirects.update(record.redirects)
+
+
+class Journal:
+    """Append-only journal file, see the module docstring."""
+
+    def __init__(self, path: pathlib.Path, compact_after: int = 1 << 20) -> None:
+        """Open the journal (it is created, if it doesn't exist), and cut off the torn record, if any.
+
+        Args:
+            path: Path to the journal file.
+            compact_after: Compact the journal in the background, when it grows past this amount of bytes,
+                and is at least twice as big as its compacted version.
+
+        Raises:
+            ValueError: If the file is not a journal.
+        """
+        self.path = path
+        self._lock_path = path.with_name(path.name + ".lock")
+        self._compact_after = compact_after
+        self._lock = threading.Lock()  # for appends, and the file descriptor
+        self._sync_condition = threading.Condition()
+        self._latest: dict[str, bytes] = {}
+        #                  ^^^  ^^^
+        #    project or simple link  payload of its last record
+        self._written = self._synced = 0  # sequence numbers of records
+        self._syncing = False
+        self._compaction: threading.Thread | None = None
+        self._compaction_lock = threading.Lock()
+        self._live_size = len(MAGIC)  # size of the compacted journal
+
+        with self._locked(fcntl.LOCK_EX):
+            self._size = self._recover()
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+
+    def _recover(self) -> int:
+        """Read all records, cut off the torn one, and create the file if needed.
+
+        Must be called with the exclusive lock, so nobody appends meanwhile.
+
+        Returns:
+            Size of the file.
+        """
+        for tmp_path in self.path.parent.glob(glob.escape(self.path.name) + ".*.tmp"):  # left by crashed compaction
+            tmp_path.unlink(missing_ok=True)
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            _write_file(self.path, MAGIC)
+            return len(MAGIC)
+
+        if not raw.startswith(MAGIC):
+            raise ValueError(f"{self.path} is not a short-it journal")
+
+        latest, offset = _read(raw, len(MAGIC))
+        self._reset(latest)
+        if offset != len(raw):
+            logger.warning("Cutting off %d bytes of torn record at the end of %s", len(raw) - offset, self.path)
+            os.truncate(self.path, offset)
+            _fsync_path(self.path)
+        return offset
+
+    def records(self) -> list[Record]:
+        """The last record of every project, replaying them is the same as replaying the whole journal.
+
+        The file is read again, so records, appended by other processes, are included.
+        """
+        with self._lock, self._locked(fcntl.LOCK_SH):
+            self._reopen_if_replaced()
+            latest, _ = _read(self.path.read_bytes(), len(MAGIC))
+            self._reset(latest)
+            payloads = list(self._latest.values())
+        return [Record.decode(payload) for payload in payloads]
+
+    def append(self, record: Record) -> int:
+        """Write the record (not durable yet, see :meth:`sync`).
+
+        Returns:
+            Sequence number of the record, to pass to :meth:`sync`.
+        """
+        payload = record.encode()
+        frame = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock, self._locked(fcntl.LOCK_SH):
+            self._reopen_if_replaced()
+            _write_all(self._fd, frame)
+            self._size = os.fstat(self._fd).st_size  # other processes append too
+            self._remember(record.name, payload)
+            self._written += 1
+            sequence = self._written
+            should_compact = self._size > max(self._compact_after, 2 * self._live_size)
+
+        if should_compact:
+            self._start_compaction()
+        return sequence
+
+    def sync(self, sequence: int) -> None:
+        """Wait until the record (and all records before it) is on the disk.
+
+        One writer does ``fsync``, and all others wait for it, so concurrent
+        writers share one ``fsync``.
+        """
+        with self._sync_condition:
+            while self._synced < sequence:
+                if self._syncing:
+                    self._sync_condition.wait()
+                    continue
+
+                self._syncing = True
+                target, fd = self._written, self._fd
+                self._sync_condition.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._sync_condition.acquire()
+                    self._syncing = False
+                    self._sync_condition.notify_all()
+                self._synced = max(self._synced, target)
+
+    def compact(self) -> None:
+        """Replace the journal with a new one, which has only the last record of every project."""
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        """See :meth:`compact`, must be called with ``_compaction_lock``.
+
+        Records are read from the file, without any lock, and written into the
+        new one. Then, with the exclusive lock, records appended meanwhile (by
+        any process) are copied over, and the new file replaces the journal.
+        """
+        with open(self.path, "rb") as file:  # kept open, so its inode number is not reused
+            latest, offset = _read(file.read(), len(MAGIC))
+            tmp_fd, tmp_name = tempfile.mkstemp(".tmp", self.path.name + ".", self.path.parent)
+            tmp_path = pathlib.Path(tmp_name)
+            try:
+                os.fchmod(tmp_fd, 0o644)
+                fcntl.fcntl(tmp_fd, fcntl.F_SETFL, os.O_APPEND)  # it becomes the journal, others append too
+                _write_all(tmp_fd, MAGIC + b"".join(_HEADER.pack(len(p), zlib.crc32(p)) + p for p in latest.values()))
+                os.fsync(tmp_fd)
+
+                with self._lock, self._locked(fcntl.LOCK_EX):
+                    if os.stat(self.path).st_ino != os.fstat(file.fileno()).st_ino:  # compacted by another process
+                        tmp_path.unlink()
+                        return
+
+                    file.seek(offset)
+                    tail = file.read()
+                    appended, end = _read(tail, 0)
+                    _write_all(tmp_fd, tail[:end])
+                    os.fsync(tmp_fd)
+                    latest.update(appended)
+
+                    os.replace(tmp_path, self.path)
+                    _fsync_path(self.path.parent)
+                    self._switch(tmp_fd)
+                    tmp_fd = -1
+                    self._reset(latest)
+            finally:
+                if tmp_fd != -1:
+                    os.close(tmp_fd)
+        logger.info("Compacted %s to %d records", self.path, len(latest))
+
+    def close(self) -> None:
+        """Wait for compaction, and close the file."""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+        with self._lock:
+            os.close(self._fd)
+
+    @contextlib.contextmanager
+    def _locked(self, operation: int) -> t.Iterator[None]:
+        """Hold ``flock`` of the lock file (``fcntl.LOCK_SH`` or ``fcntl.LOCK_EX``), see the module docstring.
+
+        Every call opens the file again, so the lock excludes threads of this process too.
+        """
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _reopen_if_replaced(self) -> None:
+        """Reopen the journal, if another process compacted it. Must be called with ``_lock`` and a file lock."""
+        if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+            return
+        self._switch(os.open(self.path, os.O_WRONLY | os.O_APPEND))
+        latest, _ = _read(self.path.read_bytes(), len(MAGIC))
+        self._reset(latest)
+
+    def _switch(self, fd: int) -> None:
+        """Write into the new file from now on, must be called with ``_lock``.
+
+        The new file is fsync-ed, and has all records of the old one, so all
+        written records are durable.
+        """
+        with self._sync_condition:
+            while self._syncing:  # don't close the file, which is being fsync-ed
+                self._sync_condition.wait()
+            os.close(self._fd)
+            self._fd = fd
+            self._size = os.fstat(fd).st_size
+            self._synced = self._written
+            self._sync_condition.notify_all()
+
+    def _reset(self, latest: dict[str, bytes]) -> None:
+        """Replace the last records of all projects with ones, read from the file."""
+        self._latest = {}
+        self._live_size = len(MAGIC)
+        for name, payload in latest.items():
+            self._remember(name, payload)
+
+    def _remember(self, name: str, payload: bytes) -> None:
+        """Remember the last record of the project."""
+        old_payload = self._latest.get(name)
+        if old_payload is not None:
+            self._live_size -= _HEADER.size + len(old_payload)
+        self._latest[name] = payload
+        self._live_size += _HEADER.size + len(payload)
+
+    def _start_compaction(self) -> None:
+        """Compact the journal in the background thread, if it is not compacted already."""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self._compact_logged, name="short-it-journal-compaction")
+            self._compaction.start()
+
+    def _compact_logged(self) -> None:
+        """Compact, and log the error instead of raising it (the old journal is still valid)."""
+        try:
+            self.compact()
+        except Exception:
+            logger.exception("Failed to compact %s", self.path)
+
+
+def _read(raw: bytes, offset: int) -> tuple[dict[str, bytes], int]:
+    """The last payload of every project in valid records, and the offset of the end of the last one."""
+    latest: dict[str, bytes] = {}
+    for payload, end in _frames(raw, offset):
+        latest[Record.decode(payload).name] = payload
+        offset = end
+    return latest, offset
+
+
+def _frames(raw: bytes, offset: int) -> t.Iterator[tuple[bytes, int]]:
+    """Payloads of valid records, and offsets of their ends. Stops at the first torn or corrupted record."""
+    while offset + _HEADER.size <= len(raw):
+        length, crc = _HEADER.unpack_from(raw, offset)
+        start, end = offset + _HEADER.size, offset + _HEADER.size + length
+        if end > len(raw) or zlib.crc32(raw[start:end]) != crc:
+            return
+        yield raw[start:end], end
+        offset = end
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Write all bytes, ``os.write`` can write only a part of them."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _write_file(path: pathlib.Path, data: bytes) -> None:
+    """Create the file with the content, durably."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    _fsync_path(path.parent)
+
+
+def _fsync_path(path: pathlib.Path) -> None:
+    """Fsync the file or directory by its path (for directories, it makes renames and new files durable)."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,329 @@
+"""Check, that destinations of all links are alive, see ``short-it check-links``.
+
+Every unique destination is requested once with ``HEAD`` (or ``GET``, if the
+server doesn't allow ``HEAD``), following redirects. Requests are sent by a small
+HTTP/1.1 client on asyncio streams, which keeps connections alive in a pool per
+host, so thousands of links to one host reuse a few connections. Requests to
+every host are capped separately from the global cap, so one big host is not
+hammered, and doesn't block others. Timeouts, connection errors, ``429`` and
+``5xx`` responses are retried with exponential backoff.
+"""
+import asyncio
+import dataclasses
+import itertools
+import ssl
+import time
+import typing as t
+import urllib.parse
+
+USER_AGENT = "short-it-link-checker (+https://github.com/PerchunPak/short-it)"
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_URL_SAFE = "/%:@!$&'()*+,;=-._~?"
+
+
+class CheckError(Exception):
+    """Raised when the destination can't be checked, and it makes no sense to retry."""
+
+
+@dataclasses.dataclass(frozen=True)
+class CheckResult:
+    """Result of checking one destination.
+
+    ``status`` is the status of the last response (after redirects), or :obj:`None`
+    if there was no response, then ``error`` describes why.
+    """
+
+    url: str
+    paths: tuple[str, ...] = ()
+    status: int | None = None
+    error: str | None = None
+    attempts: int = 1
+    seconds: float = 0.0
+
+    @property
+    def alive(self) -> bool:
+        """Whether the destination responds without an error."""
+        return self.status is not None and self.status < 400
+
+
+@dataclasses.dataclass(frozen=True)
+class _Response:
+    """Status line and headers of the response (names are in lowercase)."""
+
+    status: int
+    headers: dict[str, str]
+    keep_alive: bool
+
+
+class _HostPool:
+    """Keep-alive connections to one host, and the cap of concurrent requests to it."""
+
+    def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext | None, limit: int) -> None:
+        self._host, self._port, self._ssl_context = host, port, ssl_context
+        self.slot = asyncio.Semaphore(limit)  # taken by `LinkChecker` around every request, see `_follow`
+        self._limit = limit
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.opened = 0  # amount of opened connections
+
+    async def request(self, method: str, target: str, host_header: str) -> _Response:
+        """Send the request on an idle connection, or a new one. Must be called with :attr:`slot`.
+
+        The server may close an idle connection at any moment, so if the request
+        fails on it, it is sent again (requests are idempotent).
+        """
+        while self._idle:
+            reader, writer = self._idle.pop()
+            try:
+                return await self._exchange(reader, writer, method, target, host_header)
+            except (OSError, asyncio.IncompleteReadError):
+                continue
+
+        reader, writer = await asyncio.open_connection(
+            self._host,
+            self._port,
+            ssl=self._ssl_context,
+            server_hostname=self._host if self._ssl_context is not None else None,
+        )
+        self.opened += 1
+        return await self._exchange(reader, writer, method, target, host_header)
+
+    async def _exchange(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, target: str, host_header: str
+    ) -> _Response:
+        """Send the request and read the response head, keep the connection if possible."""
+        try:
+            writer.write(
+                f"{method} {target} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {USER_AGENT}\r\n"
+                "Accept: */*\r\n\r\n".encode()
+            )
+            await writer.drain()
+            response = _parse_head(await reader.readuntil(b"\r\n\r\n"))
+            while 100 <= response.status < 200:  # informational, the real response follows
+                response = _parse_head(await reader.readuntil(b"\r\n\r\n"))
+        except BaseException:
+            writer.close()
+            raise
+
+        # responses to `HEAD` have no body, reading (possibly huge) bodies of `GET` is not worth it
+        if method == "HEAD" and response.keep_alive and len(self._idle) < self._limit:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return response
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        for _, writer in self._idle:
+            writer.close()
+        for _, writer in self._idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        self._idle.clear()
+
+
+class LinkChecker:
+    """Check many destinations concurrently, see the module docstring."""
+
+    def __init__(
+        self,
+        concurrency: int = 100,
+        per_host: int = 4,
+        timeout: float = 10.0,
+        retries: int = 2,
+        retry_delay: float = 0.5,
+        max_redirects: int = 5,
+    ) -> None:
+        """Set limits.
+
+        Args:
+            concurrency: Maximum amount of concurrent requests.
+            per_host: Maximum amount of concurrent requests (and kept-alive connections) per host.
+            timeout: Timeout of every attempt in seconds, including redirects, but not waiting for a busy host.
+            retries: How many times to retry after a timeout, connection error, ``429`` or ``5xx``.
+            retry_delay: Delay before the first retry in seconds, it is doubled for every next one.
+            max_redirects: Maximum amount of redirects to follow.
+        """
+        self._concurrency = concurrency
+        self._per_host = per_host
+        self._timeout = timeout
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._max_redirects = max_redirects
+        self._ssl_context = ssl.create_default_context()
+        self.pools: dict[tuple[str, str, int], _HostPool] = {}
+
+    async def check_all(self, destinations: t.Mapping[str, t.Sequence[str]]) -> list[CheckResult]:
+        """Check all destinations, and close connections after that.
+
+        Args:
+            destinations: Destination URLs, and paths of links, which redirect to them.
+
+        Returns:
+            Results in the same order as destinations.
+        """
+        # alternate hosts, so workers are not all waiting for the same busy host
+        by_host: dict[str, list[str]] = {}
+        for url in destinations:
+            by_host.setdefault(_netloc(url), []).append(url)
+        queue = iter([url for urls in itertools.zip_longest(*by_host.values()) for url in urls if url is not None])
+        results: dict[str, CheckResult] = {}
+
+        async def worker() -> None:
+            for url in queue:  # shared, so every URL is taken by one worker
+                results[url] = await self.check(url, tuple(destinations[url]))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self._concurrency, len(destinations)))))
+        finally:
+            await self.close()
+        return [results[url] for url in destinations]
+
+    async def check(self, url: str, paths: tuple[str, ...] = ()) -> CheckResult:
+        """Check one destination, with retries."""
+        start = time.perf_counter()
+        attempt = 1
+        while True:
+            status, error = None, None
+            try:
+                status = await self._follow(url)
+            except CheckError as exception:
+                return CheckResult(url, paths, error=str(exception), attempts=attempt, seconds=_since(start))
+            except asyncio.LimitOverrunError:
+                return CheckResult(
+                    url, paths, error="response head is too big", attempts=attempt, seconds=_since(start)
+                )
+            except ssl.SSLCertVerificationError as exception:  # won't be fixed by retrying
+                error = f"invalid certificate: {exception.verify_message}"
+                return CheckResult(url, paths, error=error, attempts=attempt, seconds=_since(start))
+            except TimeoutError:
+                error = f"timed out after {self._timeout:g}s"
+            except asyncio.IncompleteReadError:
+                error = "connection closed before the response"
+            except OSError as exception:
+                error = f"{type(exception).__name__}: {exception}"
+
+            if (error is None and status not in _RETRY_STATUSES) or attempt > self._retries:
+                return CheckResult(url, paths, status, error, attempt, _since(start))
+            await asyncio.sleep(self._retry_delay * 2 ** (attempt - 1))
+            attempt += 1
+
+    async def close(self) -> None:
+        """Close all kept-alive connections."""
+        for pool in self.pools.values():
+            await pool.close()
+
+    async def _follow(self, url: str) -> int:
+        """Request the URL, and follow redirects.
+
+        The timeout covers only the time of requests, not waiting for a free slot
+        of a busy host, so links queued behind it are not reported as dead.
+
+        Returns:
+            Status of the last response.
+
+        Raises:
+            TimeoutError: If requests (with all redirects) took longer than the timeout.
+        """
+        remaining = self._timeout
+        for _ in range(self._max_redirects + 1):
+            scheme, host, port, target, host_header = _split(url)
+            pool = self.pools.get((scheme, host, port))
+            if pool is None:
+                ssl_context = self._ssl_context if scheme == "https" else None
+                pool = self.pools[scheme, host, port] = _HostPool(host, port, ssl_context, self._per_host)
+
+            async with pool.slot:
+                start = time.perf_counter()
+                async with asyncio.timeout(remaining):
+                    response = await pool.request("HEAD", target, host_header)
+                    if response.status in (405, 501):  # `HEAD` is not allowed
+                        response = await pool.request("GET", target, host_header)
+                remaining -= _since(start)
+
+            location = response.headers.get("location")
+            if response.status not in _REDIRECT_STATUSES or location is None:
+                return response.status
+            url = urllib.parse.urljoin(url, location)
+        raise CheckError(f"more than {self._max_redirects} redirects")
+
+
+def check(destinations: t.Mapping[str, t.Sequence[str]], checker: LinkChecker | None = None) -> list[CheckResult]:
+    """Check all destinations in a new event loop, see :meth:`LinkChecker.check_all`."""
+    return asyncio.run((checker or LinkChecker()).check_all(destinations))
+
+
+def report(results: t.Sequence[CheckResult]) -> str:
+    """Render dead destinations with their links, and the summary."""
+    lines = []
+    for result in results:
+        if not result.alive:
+            reason = f"HTTP {result.status}" if result.status is not None else result.error
+            lines.append(f"{result.url} ({reason}, {result.attempts} attempts)")
+            lines.extend(f"    {path}" for path in result.paths)
+    dead = sum(not result.alive for result in results)
+    lines.append(f"{len(results)} destinations checked, {len(results) - dead} alive, {dead} dead")
+    return "\n".join(lines)
+
+
+def _split(url: str) -> tuple[str, str, int, str, str]:
+    """Scheme, host, port, request target and ``Host`` header of the URL.
+
+    Raises:
+        CheckError: If it is not an HTTP(S) URL.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname
+        if parts.scheme not in ("http", "https") or not host:
+            raise CheckError(f"not an HTTP URL: {url!r}")
+        default_port = 443 if parts.scheme == "https" else 80
+        port = parts.port or default_port
+        host = host.encode("idna").decode("ascii")
+    except (ValueError, UnicodeError) as exception:
+        raise CheckError(f"invalid URL {url!r}: {exception}") from None
+
+    target = urllib.parse.quote(parts.path or "/", safe=_URL_SAFE)
+    if parts.query:
+        target += "?" + urllib.parse.quote(parts.query, safe=_URL_SAFE)
+    host_header = f"[{host}]" if ":" in host else host
+    if port != default_port:
+        host_header += f":{port}"
+    return parts.scheme, host, port, target, host_header
+
+
+def _parse_head(head: bytes) -> _Response:
+    """Parse the status line and headers.
+
+    Raises:
+        CheckError: If it is not an HTTP response.
+    """
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    version, _, rest = status_line.partition(" ")
+    status = rest[:3]
+    if not version.startswith("HTTP/1.") or not status.isdigit():
+        raise CheckError(f"invalid HTTP response: {status_line[:100]!r}")
+
+    headers = {}
+    for line in header_lines:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    connection = headers.get("connection", "").lower()
+    keep_alive = "keep-alive" in connection if version == "HTTP/1.0" else "close" not in connection
+    return _Response(int(status), headers, keep_alive)
+
+
+def _netloc(url: str) -> str:
+    """Host and port of the URL, empty for invalid URLs (they fail when checked)."""
+    try:
+        return urllib.parse.urlsplit(url).netloc
+    except ValueError:
+        return ""
+
+
+def _since(start: float) -> float:
+    """Seconds since the start."""
+    return time.perf_counter() - start
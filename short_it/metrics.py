@@ -0,0 +1,112 @@
+"""Prometheus metrics, served at ``/-/metrics`` in the text exposition format.
+
+Metrics are cheap enough to be always on: every request is observed with one
+:func:`bisect.bisect_left` and two additions. Every thread writes to its own
+shard of a histogram, so there are no locks and no lost updates, and shards
+are summed up only when metrics are scraped. Every worker process has its own
+metrics.
+"""
+import bisect
+import threading
+
+import short_it.parse_config as parse_config
+import short_it.responses as responses
+import short_it.snapshot as snapshot
+
+# in seconds, redirects usually take microseconds, so buckets start low
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+OUTCOMES = ("redirect", "not_found", "one_link_error", "multiple_links_error")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Histogram with fixed buckets, which can be observed from many threads without locks."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self._buckets = buckets
+        self._local = threading.local()
+        self._shards: list[list[float]] = []
+        #                   ^^^ count in every bucket (the last is +Inf), and the sum
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Count one request, which took ``seconds``."""
+        shard: list[float] | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._new_shard()
+        shard[bisect.bisect_left(self._buckets, seconds)] += 1
+        shard[-1] += seconds
+
+    def collect(self) -> tuple[list[tuple[str, int]], int, float]:
+        """Sum up all shards.
+
+        Returns:
+            Cumulative counts for every bucket (as ``le`` label and count), total count and sum.
+        """
+        with self._lock:
+            shards = list(self._shards)
+        totals = [sum(column) for column in zip(*shards)] if shards else [0.0] * (len(self._buckets) + 2)
+
+        cumulative: list[tuple[str, int]] = []
+        count = 0
+        for le, bucket_count in zip([*map(repr, self._buckets), "+Inf"], totals[:-1]):
+            count += int(bucket_count)
+            cumulative.append((le, count))
+        return cumulative, count, totals[-1]
+
+    def _new_shard(self) -> list[float]:
+        """Create the shard for the current thread."""
+        shard = [0.0] * (len(self._buckets) + 2)
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+
+REQUEST_DURATION = {outcome: Histogram() for outcome in OUTCOMES}
+
+
+def observe(outcome: str, seconds: float) -> None:
+    """Count one request with its outcome (see :data:`OUTCOMES`)."""
+    REQUEST_DURATION[outcome].observe(seconds)
+
+
+def outcome_of(response: responses.PrebuiltResponse) -> str:
+    """Outcome of the pre-built response."""
+    if response.is_redirect:
+        return "redirect"
+    if response.status == 404:
+        return "not_found"
+    if response is parse_config.ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE:
+        return "one_link_error"
+    return "multiple_links_error"
+
+
+def render() -> str:
+    """Render all metrics in Prometheus text format."""
+    lines = [
+        "# HELP short_it_request_duration_seconds Time to resolve a link and send the response, by outcome.",
+        "# TYPE short_it_request_duration_seconds histogram",
+    ]
+    for outcome, histogram in REQUEST_DURATION.items():
+        cumulative, count, total = histogram.collect()
+        for le, bucket_count in cumulative:
+            lines.append(f'short_it_request_duration_seconds_bucket{{outcome="{outcome}",le="{le}"}} {bucket_count}')
+        lines.append(f'short_it_request_duration_seconds_sum{{outcome="{outcome}"}} {total!r}')
+        lines.append(f'short_it_request_duration_seconds_count{{outcome="{outcome}"}} {count}')
+
+    table = parse_config.ParseConfigToMachineData()
+    config_hash = "" if table.config_hash is None else table.config_hash.hex()
+    lines += [
+        "# HELP short_it_config_load_seconds Time to load the current table (on start or the last reload).",
+        "# TYPE short_it_config_load_seconds gauge",
+        f"short_it_config_load_seconds {table.load_seconds!r}",
+        "# HELP short_it_table_size Amount of projects and simple links.",
+        "# TYPE short_it_table_size gauge",
+        f"short_it_table_size {len(table)}",
+        "# HELP short_it_snapshot_info Snapshot format, hash of the config, and where the table was loaded from.",
+        "# TYPE short_it_snapshot_info gauge",
+        f'short_it_snapshot_info{{format_version="{snapshot.FORMAT_VERSION}",config_hash="{config_hash}",'
+        f'source="{table.source}"}} 1',
+    ]
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,22 @@
 """Parse config (human friendly data) to machine data."""
+import dataclasses
+import functools
+import pathlib
+import sys
+import threading
+import time
 import typing as t
 
-import omegaconf.errors
-
 import short_it.config as config_module
 import short_it.exc
+import short_it.journal as journal
+import short_it.responses as responses
+import short_it.reverse_index as reverse_index
+import short_it.routing as routing
+import short_it.shards as shards
+import short_it.snapshot as snapshot
+import short_it.stores as stores
+import short_it.suggestions as suggestions
 import short_it.utils as utils
 
 
@@ -22,6 +34,48 @@ class MultipleLinksNoLinkTypeError(short_it.exc.ShortItException):
         super().__init__("Project has multiple links, but you didn't specify link type")
 
 
+class LinkConflictError(short_it.exc.ShortItException):
+    """Raised when a simple link is changed like a project, or vice versa."""
+
+
+class LinkNotFoundError(short_it.exc.ShortItException):
+    """Raised when a link, which should be changed, doesn't exist."""
+
+
+class ReadOnlyStoreError(short_it.exc.ShortItException):
+    """Raised when links are changed at runtime, but the store is not in memory."""
+
+    def __init__(self) -> None:
+        super().__init__("Links can be changed at runtime only with the 'memory' store backend")
+
+
+@dataclasses.dataclass(frozen=True)
+class Resolution:
+    """Result of resolving one slug, see :meth:`ParseConfigToMachineData.resolve_many`.
+
+    Either ``to`` is the destination, or ``error`` is the code of the error
+    (``not_found``, ``invalid_slug``, ``one_link_and_link_type_specified`` or
+    ``multiple_links_no_link_type``), and ``detail`` is its message.
+    """
+
+    slug: str
+    to: str | None = None
+    error: str | None = None
+    detail: str | None = None
+
+    def to_json(self) -> dict[str, str]:
+        """Fields, which are set."""
+        if self.to is not None:
+            return {"slug": self.slug, "to": self.to}
+        return {"slug": self.slug, "error": t.cast(str, self.error), "detail": t.cast(str, self.detail)}
+
+
+ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE = responses.plain_text(OneLinkAndLinkTypeSpecifiedError().message)
+MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE = responses.plain_text(MultipleLinksNoLinkTypeError().message)
+_NOT_FOUND_MESSAGE = "There is no such link"
+_INVALID_SLUG_MESSAGE = "Slug must be 'project' or 'project/link_type'"
+
+
 class ParseConfigToMachineData(metaclass=utils.Singleton):
     """Parse config (human friendly data) to machine data.
 
@@ -30,12 +84,158 @@ class ParseConfigToMachineData(metaclass=utils.Singleton):
     is ok.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, use_snapshot: bool = True) -> None:
+        """Load the table from the snapshot (or persistent store), or build it from the config.
+
+        Args:
+            use_snapshot: If :obj:`False`, always parse YAML and compile a fresh snapshot (and store).
+        """
         self._config = config_module.Config()
-        self._data: dict[str, dict[str, str] | str] = self._parse_config()
-        #                ^^^       ^^^  ^^^
-        #              project    link  destination
-        #               name      type
+        self._write_lock = threading.Lock()  # only writers take it, readers never wait
+        self._journal = _open_journal(self._config)
+        self._data: stores.LinkStore
+        #                ^^^ project name -> link type -> destination, see `short_it.stores`
+
+        start = time.perf_counter()
+        self.source, self.config_hash = self._load(use_snapshot)
+        self.load_seconds = time.perf_counter() - start
+
+    def _load(self, use_snapshot: bool) -> tuple[str, bytes | None]:
+        """Load the table, see :meth:`__init__`.
+
+        Returns:
+            Where the table was loaded from (``snapshot``, ``store`` or ``config``), and hash of the config.
+        """
+        self._config_file_hash = snapshot.hash_file(config_module.CONFIG_PATH)
+        config_hash = config_module.current_hash()
+        cached = snapshot.load(config_module.SNAPSHOT_PATH, config_hash) if use_snapshot else None
+        if cached is not None:
+            self._shards = {
+                name: shards.Shard(name, content_hash, links) for name, (content_hash, links) in cached.shards.items()
+            }
+            if self._config.store.backend == "memory":
+                self._base = (cached.links, cached.redirects) if self._shards else None
+                (
+                    self._data,
+                    self._redirects,
+                    self._suggestions,
+                    self._responses,
+                    self._router,
+                    self._reverse,
+                ) = self._build_table(self._config, cached.links, cached.redirects)
+                return "snapshot", config_hash
+
+            store = _open_store(self._config, config_hash)
+            if store is not None:
+                self._base = None
+                (
+                    self._data,
+                    self._redirects,
+                    self._suggestions,
+                    self._responses,
+                    self._router,
+                    self._reverse,
+                ) = self._build_table(self._config, store, cached.redirects)
+                return "store", config_hash
+
+        # slow path, parse YAML with OmegaConf (unless `Config` has just done it) and compile a new snapshot
+        parsed = config_module.take_parsed(self._config)
+        if parsed is None:
+            parsed = config_module.Config.load_with_hash(config_module.CONFIG_PATH, save=True)
+        self._config, self._config_file_hash = parsed
+        utils.Singleton._instances[config_module.Config] = self._config
+        self._shards, self._base = {}, None
+        config_hash, data, redirects, self._shards = self._load_links(self._config, self._config_file_hash)
+        self._save_snapshot(config_hash, data, redirects, self._shards)
+        self._base = (data, redirects) if self._shards and isinstance(data, dict) else None
+        (
+            self._data,
+            self._redirects,
+            self._suggestions,
+            self._responses,
+            self._router,
+            self._reverse,
+        ) = self._build_table(self._config, data, redirects)
+        return "config", config_hash
+
+    def _load_links(
+        self, config: config_module.Config, config_file_hash: bytes | None
+    ) -> tuple[bytes | None, stores.LinkStore, snapshot.RedirectsTable, dict[str, shards.Shard]]:
+        """Parse links from the config and all shards, and put them into the store.
+
+        Shards, which were not changed since the last load, are not parsed again,
+        their links are taken from the current table (if default redirect options
+        are the same, as they are filtered by them).
+
+        Returns:
+            Hash of the config with all shards, the table, redirect options, and shards.
+        """
+        default = _default_redirect(config)
+        reusable = self._base is not None and default == _default_redirect(self._config)
+        changes = shards.load(
+            config_module.SHARDS_DIR,
+            self._shards if reusable else {},
+            functools.partial(_parse_shard, default_redirect=default),
+            config.shards.workers,
+        )
+        parsed = dict(changes.parsed)
+        if len(parsed) != len(changes.shards):
+            assert self._base is not None
+            by_name = _group_redirects(self._base[1])
+            for name, shard in changes.shards.items():
+                if name not in parsed:
+                    parsed[name] = _extract(self._base, shard.links, by_name)
+
+        config_links = self._parse_config(config), self._parse_redirects(config)
+        shards.check_conflicts(config_links[0], {}, (), parsed)
+        data, redirects = shards.merge(config_links, parsed.values())
+        config_hash = shards.combined_hash(
+            config_file_hash, {name: shard.content_hash for name, shard in changes.shards.items()}
+        )
+        return config_hash, self._make_store(config, data, config_hash), redirects, changes.shards
+
+    def _build_table(
+        self, config: config_module.Config, data: stores.LinkStore, redirects: snapshot.RedirectsTable
+    ) -> tuple[
+        stores.LinkStore,
+        snapshot.RedirectsTable,
+        suggestions.SuggestionIndex | None,
+        responses.ResponseTable | responses.LazyResponseTable,
+        routing.Router | None,
+        reverse_index.ReverseIndex,
+    ]:
+        """Replay the journal on top of links from the config, and build suggestions and responses for them.
+
+        Returns:
+            The table, redirect options, suggestions, responses, templated links
+            (:obj:`None` if there are none) and the reverse index (built on the first
+            query, see :meth:`find_links`). The table and options are copies, if the
+            journal changed them, or links from shards are kept separately (see
+            :meth:`_reload_shards`).
+
+        Raises:
+            ValueError: If a templated link is invalid.
+        """
+        router = routing.Router(config.routes, _default_redirect(config)) if config.routes else None
+        if isinstance(data, dict):
+            records = self._journal.records() if self._journal is not None else []
+            if records or self._base is not None:
+                data, redirects = dict(data), dict(redirects)  # snapshot stores only links from the config
+                journal.apply(records, data, redirects)
+
+        suggestion_index = self._build_suggestions(data, config)
+        return (
+            data,
+            redirects,
+            suggestion_index,
+            self._build_responses(data, suggestion_index, redirects, _default_redirect(config), router),
+            router,
+            reverse_index.ReverseIndex(data),
+        )
+
+    def __len__(self) -> int:
+        """Amount of projects and simple links in the table."""
+        return len(self._data)
 
     def get_url(self, project_name: str, link_type: str | None) -> str | None:
         """Get the redirected URL.
@@ -43,55 +243,711 @@ class ParseConfigToMachineData(metaclass=utils.Singleton):
         Returns:
             :class:`str`: if URL is found, :class:`None` if 404.
         """
-        if project_name not in self._data.keys():
-            return None
+        # bind once, table can be swapped by `reload` at any moment
+        return _lookup(self._data, project_name, link_type)
+
+    def get_redirect_options(self, project_name: str, link_type: str | None) -> responses.RedirectOptions:
+        """Get status and max age of the redirect for the link, found by :meth:`get_url`."""
+        path = f"/{project_name}" if link_type is None else f"/{project_name}/{link_type}"
+        return self._redirects.get(path, _default_redirect(self._config))
+
+    def paths(self) -> t.Iterator[str]:
+        """All paths, which resolve to a link or an error message (in lowercase, as requests are matched)."""
+        data = self._data
+        for project_name, project_links in data.items():
+            if not responses.is_routable(project_name):
+                continue
+
+            yield f"/{project_name}"
+            if not isinstance(project_links, str):
+                for link_type in project_links:
+                    if responses.is_routable(link_type):
+                        yield f"/{project_name}/{link_type}"
+
+    def destinations(self) -> dict[str, list[str]]:
+        """Every unique destination, and paths of links (with all aliases), which redirect to it."""
+        return reverse_index.group(self._data)
+
+    def find_links(
+        self,
+        to: str | None = None,
+        prefix: str | None = None,
+        host: str | None = None,
+        duplicates: bool = False,
+        limit: int | None = None,
+    ) -> dict[str, list[str]]:
+        """Find links by their destinations, see :meth:`short_it.reverse_index.ReverseIndex.query`.
+
+        The reverse index is built on the first call, runtime changes wait for it.
+
+        Raises:
+            ValueError: If not exactly one of ``to``, ``prefix``, ``host`` and ``duplicates`` is set.
+        """
+        index = self._reverse  # bind once, see `get_url`
+        with self._write_lock:  # the table must not change, while it is indexed
+            index.build()
+        return index.query(to, prefix, host, duplicates, limit)
+
+    def get_response(self, path: str, query_string: bytes = b"") -> responses.PrebuiltResponse | None:
+        """Get the pre-built response for the request path.
+
+        Args:
+            path: The request path.
+            query_string: The raw query string, forwarded by templated links with ``*``.
+
+        Returns:
+            :class:`~short_it.responses.PrebuiltResponse` (redirect, error message or 404 page),
+            or :obj:`None` if the path doesn't match any of our routes.
+        """
+        return self._responses.resolve(path, query_string)
+
+    def match_route(self, path: str, query_string: bytes = b"") -> routing.Match | None:
+        """Find the templated link for the request path, see :mod:`short_it.routing`.
+
+        Templated links are tried only for paths, which don't match a link exactly.
+        """
+        router = self._router
+        return router.match(path, query_string) if router is not None else None
+
+    def suggest(self, project_name: str, link_type: str | None) -> list[str]:
+        """Find the closest links for the 404 page, see :mod:`short_it.suggestions`.
+
+        Returns:
+            Paths of suggested links, empty if suggestions are disabled.
+        """
+        suggestion_index = self._suggestions
+        if suggestion_index is None:
+            return []
+        return suggestion_index.suggest(project_name, link_type)
+
+    def build_suggestions(self) -> None:
+        """Build the index for suggestions now, if it is not built yet, e.g. so forked workers share it."""
+        suggestion_index = self._suggestions
+        if suggestion_index is not None:
+            suggestion_index.build()
+
+    def resolve_many(self, slugs: t.Iterable[str]) -> t.Iterator[Resolution]:
+        """Resolve many ``project[/link_type]`` slugs at once, e.g. for docs builders and link checkers.
+
+        Slugs are matched like request paths (in lowercase, the leading slash is
+        optional). All of them are resolved against the same table, even if it is
+        reloaded in the middle. Results are yielded lazily and in the same order,
+        so huge batches can be streamed.
+        """
+        data = self._data  # bind once, see `get_url`
+        for slug in slugs:
+            segments = slug.lower().removeprefix("/").split("/")
+            if len(segments) > 2 or "" in segments:
+                yield Resolution(slug, error="invalid_slug", detail=_INVALID_SLUG_MESSAGE)
+                continue
+
+            try:
+                destination = _lookup(data, segments[0], segments[1] if len(segments) == 2 else None)
+            except OneLinkAndLinkTypeSpecifiedError as exception:
+                yield Resolution(slug, error="one_link_and_link_type_specified", detail=exception.message)
+            except MultipleLinksNoLinkTypeError as exception:
+                yield Resolution(slug, error="multiple_links_no_link_type", detail=exception.message)
+            else:
+                if destination is None:
+                    yield Resolution(slug, error="not_found", detail=_NOT_FOUND_MESSAGE)
+                else:
+                    yield Resolution(slug, destination)
+
+    def reload(self) -> None:
+        """Re-read config from the disk and swap the lookup table.
+
+        The new table is fully built before it is published, so requests see either
+        the old table or the new one, never a half-built one. If the new config is
+        invalid, the exception is propagated and the old table stays live. Links,
+        changed at runtime, are replayed from the journal on top of the new table.
+
+        If only shards were changed (see :mod:`short_it.shards`), only they are
+        parsed and merged into the live table, see :meth:`_reload_shards`.
+        """
+        start = time.perf_counter()
+        config_file_hash = snapshot.hash_file(config_module.CONFIG_PATH)
+        if self._base is not None and config_file_hash == self._config_file_hash:
+            config_hash = self._reload_shards()
+        else:
+            new_config, config_file_hash = config_module.Config.load_with_hash(config_module.CONFIG_PATH)
+            config_hash, data, redirects, new_shards = self._load_links(new_config, config_file_hash)
+
+            with self._write_lock:  # the journal must not change until the new table is published
+                self._base = (data, redirects) if new_shards and isinstance(data, dict) else None
+                (
+                    self._data,
+                    self._redirects,
+                    self._suggestions,
+                    self._responses,
+                    self._router,
+                    self._reverse,
+                ) = self._build_table(new_config, data, redirects)
+                self._config, self._config_file_hash, self._shards = new_config, config_file_hash, new_shards
+            utils.Singleton._instances[config_module.Config] = new_config
+            self._save_snapshot(config_hash, data, redirects, new_shards)
+        self.source, self.config_hash, self.load_seconds = "config", config_hash, time.perf_counter() - start
+
+    def _reload_shards(self) -> bytes | None:
+        """Parse only new and changed shards, and merge them into the live table.
+
+        Every changed project (or simple link) is replaced separately with
+        :meth:`_replace`, so requests see each of them either old or new, and
+        the rest of the table is not rebuilt. Links, which were changed at runtime,
+        are kept as they are in the journal. If there are conflicts, nothing is changed.
+
+        Returns:
+            Hash of the config with all shards.
+        """
+        assert self._base is not None
+        base_links, base_redirects = self._base
+        default = _default_redirect(self._config)
+        changes = shards.load(
+            config_module.SHARDS_DIR,
+            self._shards,
+            functools.partial(_parse_shard, default_redirect=default),
+            self._config.shards.workers,
+        )
+        config_hash = shards.combined_hash(
+            self._config_file_hash, {name: shard.content_hash for name, shard in changes.shards.items()}
+        )
+        changed = changes.changed
+        if not changed:  # only touched
+            self._shards = changes.shards
+            return config_hash
+        shards.check_conflicts(base_links, shards.owners(self._shards.values()), changed, changes.parsed)
+
+        records = {
+            name: journal.Record(name, None)
+            for file_name in changed & set(self._shards)
+            for name in self._shards[file_name].links
+        }
+        for links, redirects in changes.parsed.values():
+            by_name = _group_redirects(redirects)
+            records.update((name, journal.Record(name, links[name], by_name.get(name, {}))) for name in links)
+
+        with self._write_lock:
+            overridden = {record.name for record in self._journal.records()} if self._journal is not None else set()
+            journal.apply(records.values(), t.cast(dict[str, str | t.Mapping[str, str]], base_links), base_redirects)
+            for record in records.values():
+                if record.name in overridden:
+                    continue
+                if record.links is None:
+                    if record.name in self._data:
+                        self._replace(record.name, None, {}, journaled=False)
+                    continue
+                paths = (
+                    [f"/{record.name}"]
+                    if isinstance(record.links, str)
+                    else [f"/{record.name}/{alias}" for alias in record.links]
+                )
+                self._replace(
+                    record.name,
+                    record.links,
+                    {path: record.redirects.get(path, default) for path in paths},
+                    journaled=False,
+                )
+            self._shards = changes.shards
+        self._save_snapshot(config_hash, base_links, base_redirects, self._shards)
+        return config_hash
+
+    def set_simple_link(
+        self, name: str, destination: str, status: int | None = None, max_age: int | None = None
+    ) -> list[str]:
+        """Create or replace the simple link at runtime.
+
+        Only entries of this link are updated, see :meth:`_replace`.
+
+        Raises:
+            LinkConflictError: If there is a project with this name.
+            ValueError: If the name can't be requested, or the status is not supported.
+
+        Returns:
+            Changed paths.
+        """
+        _validate_name(name)
+        config_module.validate_status(status)
+        settings = config_module.SimpleLinkSettings(to=destination, status=status, max_age=max_age)
+        with self._write_lock:
+            data = self._writable_data()
+            if isinstance(data.get(name), dict):
+                raise LinkConflictError(f"{name!r} is a project, not a simple link")
 
-        project_links = self._data[project_name]
-        if isinstance(project_links, str):
+            sequence = self._replace(
+                name, destination, {f"/{name}": _redirect_options(settings, _default_redirect(self._config))}
+            )
+        self._sync_journal(sequence)
+        return [f"/{name}"]
+
+    def set_project_link(self, project_name: str, link_type: str, settings: config_module.LinkSettings) -> list[str]:
+        """Create or replace the project link (with all its aliases) at runtime.
+
+        Other links of the project are kept. Aliases are resolved in the same way,
+        as for links from the config, so builtin ones are added if ``aliases`` are
+        not set.
+
+        Raises:
+            LinkConflictError: If there is a simple link with this name.
+            ValueError: If a name can't be requested, or the status is not supported.
+
+        Returns:
+            Changed paths.
+        """
+        settings.resolve_builtin_aliases(link_type)
+        aliases = list(dict.fromkeys(_aliases(link_type, settings)))
+        for name in [project_name, *aliases]:
+            _validate_name(name)
+        config_module.validate_status(settings.status)
+        with self._write_lock:
+            data = self._writable_data()
+            old_links = data.get(project_name, {})
+            if isinstance(old_links, str):
+                raise LinkConflictError(f"{project_name!r} is a simple link, not a project")
+
+            paths = [f"/{project_name}/{alias}" for alias in aliases]
+            options = _redirect_options(settings, _default_redirect(self._config))
+            sequence = self._replace(
+                project_name,
+                {**old_links, **dict.fromkeys(aliases, settings.to)},
+                dict.fromkeys(paths, options),
+            )
+        self._sync_journal(sequence)
+        return paths
+
+    def delete_link(self, project_name: str, link_type: str | None = None, with_aliases: bool = False) -> list[str]:
+        """Delete the simple link, the whole project, or one link type (or alias) of the project at runtime.
+
+        Args:
+            project_name: Name of the project or simple link.
+            link_type: If set, delete only this link type, the project is deleted with its last link.
+            with_aliases: Also delete all link types of the project, which point to the same destination.
+
+        Raises:
+            LinkNotFoundError: If there is no such link.
+
+        Returns:
+            Removed paths.
+        """
+        with self._write_lock:
+            data = self._writable_data()
+            old_links = data.get(project_name)
+            if old_links is None or (
+                link_type is not None and (isinstance(old_links, str) or link_type not in old_links)
+            ):
+                raise LinkNotFoundError(f"There is no link {project_name!r} {link_type or ''}".rstrip())
+
+            removed = {link_type}
             if link_type is None:
-                return project_links
+                sequence = self._replace(project_name, None, {})
             else:
-                raise OneLinkAndLinkTypeSpecifiedError()
-        if link_type is None and isinstance(project_links, dict):
-            raise MultipleLinksNoLinkTypeError()
-        if link_type not in project_links.keys():
+                assert isinstance(old_links, dict)
+                if with_aliases:
+                    removed.update(alias for alias, url in old_links.items() if url == old_links[link_type])
+                new_links = {alias: url for alias, url in old_links.items() if alias not in removed}
+                sequence = self._replace(project_name, new_links or None, {})
+        self._sync_journal(sequence)
+
+        if link_type is None:
+            aliases = old_links if isinstance(old_links, dict) else {}
+            return [f"/{project_name}", *(f"/{project_name}/{alias}" for alias in aliases)]
+        return [f"/{project_name}/{alias}" for alias in old_links if alias in removed]
+
+    def _writable_data(self) -> dict[str, dict[str, str] | str]:
+        """The table, if it can be changed at runtime."""
+        if not isinstance(self._data, dict):
+            raise ReadOnlyStoreError()
+        return self._data
+
+    def _replace(
+        self,
+        project_name: str,
+        new_links: dict[str, str] | str | None,
+        redirect_options: snapshot.RedirectsTable,
+        journaled: bool = True,
+    ) -> int | None:
+        """Replace one project (or simple link) in all tables, other entries are not touched.
+
+        Project dicts are never changed after they are published, a changed copy
+        replaces them instead (copy-on-write), and every table is updated with
+        single dict operations, which are atomic. So readers never wait, and
+        always see a whole project, either the old or the new one. The change is
+        written to the journal before that. Must be called with ``_write_lock``.
+
+        Args:
+            project_name: Name of the project or simple link.
+            new_links: New links of the project, :obj:`None` to delete it.
+            redirect_options: Redirect options of the new paths, which are set explicitly.
+                Options of other paths of the project, which are kept, are kept too.
+            journaled: Write the change to the journal, :obj:`False` for changes from the config.
+
+        Returns:
+            Sequence number of the journal record (see :meth:`_sync_journal`), :obj:`None` if it is not written.
+        """
+        data = self._writable_data()
+        old_links = data.get(project_name)
+        default = _default_redirect(self._config)
+
+        new_redirects = {path: options for path, options in redirect_options.items() if options != default}
+        old_paths = [f"/{project_name}"]
+        if isinstance(old_links, dict):
+            old_paths += [f"/{project_name}/{alias}" for alias in old_links]
+        for path in old_paths:
+            if path not in redirect_options and path in self._redirects and _is_kept(path, project_name, new_links):
+                new_redirects[path] = self._redirects[path]
+
+        sequence = None
+        if journaled and self._journal is None and self._config.journal.enabled:
+            self._journal = _open_journal(self._config, create=True)
+        if journaled and self._journal is not None:
+            sequence = self._journal.append(journal.Record(project_name, new_links, new_redirects))
+
+        for path, options in new_redirects.items():
+            self._redirects[path] = options
+        if new_links is None:
+            data.pop(project_name, None)
+        else:
+            data[project_name] = new_links
+        t.cast(responses.ResponseTable, self._responses).replace(
+            project_name, old_links, new_links, new_redirects, default
+        )
+        self._reverse.replace(project_name, old_links, new_links)
+        for path in old_paths:
+            if path not in new_redirects:
+                self._redirects.pop(path, None)
+
+        if old_links is None and self._suggestions is not None:
+            self._suggestions.add(project_name)
+        return sequence
+
+    def _sync_journal(self, sequence: int | None) -> None:
+        """Wait until the change is durable. Called without ``_write_lock``, so concurrent changes share ``fsync``."""
+        if sequence is not None:
+            assert self._journal is not None
+            self._journal.sync(sequence)
+
+    @staticmethod
+    def _make_store(
+        config: config_module.Config, data: dict[str, dict[str, str] | str], config_hash: bytes | None
+    ) -> stores.LinkStore:
+        """Put parsed table into the store, chosen in the config."""
+        match config.store.backend:
+            case "memory":
+                return data
+            case "sqlite":
+                path = _store_path(config)
+                stores.build_sqlite(path, data, config_hash)
+                return stores.SQLiteLinkStore(path)
+            case "mmap":
+                path = _store_path(config)
+                stores.build_mmap(path, data, config_hash)
+                return stores.MmapLinkStore(path)
+            case unknown:
+                raise ValueError(f"Unknown store backend {unknown!r}, choose from 'memory', 'sqlite' and 'mmap'")
+
+    @staticmethod
+    def _build_suggestions(data: stores.LinkStore, config: config_module.Config) -> suggestions.SuggestionIndex | None:
+        """Build the index for "did you mean" suggestions, if they are enabled.
+
+        For stores, which are not in memory, the index is built in the background
+        after the first 404, or by :meth:`build_suggestions`.
+        """
+        if not config.suggestions.enabled:
             return None
 
-        return project_links[link_type]
+        suggestion_index = suggestions.SuggestionIndex(
+            data, limit=config.suggestions.limit, max_distance=config.suggestions.max_distance
+        )
+        if isinstance(data, dict):
+            suggestion_index.build()
+        return suggestion_index
+
+    @staticmethod
+    def _build_responses(
+        data: stores.LinkStore,
+        suggestion_index: suggestions.SuggestionIndex | None = None,
+        redirect_options: snapshot.RedirectsTable | None = None,
+        default_redirect: responses.RedirectOptions = responses.DEFAULT_REDIRECT,
+        router: routing.Router | None = None,
+    ) -> responses.ResponseTable | responses.LazyResponseTable:
+        """Pre-build responses for every alias, see :mod:`short_it.responses`.
+
+        Responses for stores, which are not in memory, are built lazily on request,
+        otherwise we would load the whole store into memory. The 404 page is built
+        on request, if there are suggestions for it, and so are redirects of
+        templated links.
+        """
+        not_found: t.Callable[[str, str | None], responses.PrebuiltResponse] = responses.not_found_without_suggestions
+        if suggestion_index is not None:
+            not_found = functools.partial(_not_found_response, suggestion_index)
+        if redirect_options is None:
+            redirect_options = {}
+
+        if not isinstance(data, dict):
+            return responses.LazyResponseTable(
+                functools.partial(
+                    _lookup_response, data, redirect_options=redirect_options, default_redirect=default_redirect
+                ),
+                not_found,
+                router.response if router is not None else None,
+            )
+
+        return responses.ResponseTable(
+            data,
+            one_link_error=ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE,
+            multiple_links_error=MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE,
+            not_found=not_found,
+            redirect_options=redirect_options,
+            default_redirect=default_redirect,
+            router=router.response if router is not None else None,
+        )
 
-    def _parse_config(self) -> dict[str, dict[str, str] | str]:
+    def _save_snapshot(
+        self,
+        config_hash: bytes | None,
+        data: stores.LinkStore,
+        redirects: snapshot.RedirectsTable,
+        shard_files: t.Mapping[str, shards.Shard],
+    ) -> None:
+        """Save links from the config to the snapshot, so the next start can skip OmegaConf.
+
+        Links are stored only for the ``memory`` backend, other stores are persistent themselves.
+
+        Args:
+            config_hash: Hash of the config content, which links were parsed from.
+            data: Links from the config, without changes from the journal.
+            redirects: Redirect options of these links.
+            shard_files: Shards, which links were merged from.
+        """
+        if config_hash is None:
+            return
+
+        snapshot.save(
+            config_module.SNAPSHOT_PATH,
+            snapshot.Snapshot(
+                config_hash=config_hash,
+                settings=config_module.Config.to_settings(self._config),
+                links=data if isinstance(data, dict) else {},
+                redirects=redirects,
+                shards={name: (shard.content_hash, shard.links) for name, shard in shard_files.items()},
+            ),
+        )
+
+    def _parse_config(self, config: config_module.Config | None = None) -> dict[str, dict[str, str] | str]:
         """Parse config into the :class:`dict` with multiple keys to one value.
 
         This code is soooo bad, but IDK how to do it better.
+
+        Args:
+            config: Config to parse, by default the one this instance was created with.
         """
-        result: dict[str, dict[str, str] | str] = {}
-        result.update(self._config.simple)
-        for project_name, project_links in self._config.projects.items():
-            result[project_name] = {}
+        return _parse_links(self._config if config is None else config)
+
+    @staticmethod
+    def _parse_redirects(
+        config: config_module.Config | config_module.ShardConfig, default: responses.RedirectOptions | None = None
+    ) -> snapshot.RedirectsTable:
+        """Collect redirect options of links, which differ from the default ones.
+
+        Paths are the same as in the table from :meth:`_parse_config`, so later
+        links override earlier ones in the same way.
 
+        Args:
+            config: Config or a shard to parse.
+            default: Default redirect options, by default from the config.
+        """
+        if default is None:
+            default = _default_redirect(t.cast(config_module.Config, config))
+        result: snapshot.RedirectsTable = {}
+
+        for name, simple_link in config.simple.items():
+            if not isinstance(simple_link, str):
+                options = _redirect_options(simple_link, default)
+                if options != default:
+                    result[f"/{name}"] = options
+
+        for project_name, project_links in config.projects.items():
+            result.pop(f"/{project_name}", None)
             for link_name, link_settings in project_links.items():
-                aliases: list[str] = [link_name]
-
-                # omegaconf raises an error on accessing undefined attribute, even if it's ok
-                # to be undefined. the code below, just tries to do try-except, so nothing
-                # will crash
-                for get_optional_field_value in [
-                    lambda: link_settings.aliases,
-                    lambda: link_settings.additional_aliases,
-                ]:
-                    try:
-                        optional_field_value = t.cast(t.Callable[[], list[str]], get_optional_field_value)()
-                    except omegaconf.errors.ConfigAttributeError:
-                        pass
+                options = _redirect_options(link_settings, default)
+                for alias in _aliases(link_name, link_settings):
+                    path = f"/{project_name}/{alias}"
+                    if options == default:
+                        result.pop(path, None)
                     else:
-                        for value in optional_field_value:
-                            aliases.append(value)
-
-                t.cast(dict[str, str], result[project_name]).update(
-                    dict.fromkeys(
-                        aliases,
-                        link_settings.to,
-                    )
-                )
+                        result[path] = options
 
         return result
+
+
+def _parse_links(config: config_module.Config | config_module.ShardConfig) -> dict[str, dict[str, str] | str]:
+    """See :meth:`ParseConfigToMachineData._parse_config`.
+
+    Strings are interned: every destination is stored once, no matter how many
+    links redirect to it, and link types (``github``, ``docs``...) are shared by
+    all projects. The snapshot keeps them shared, see :mod:`marshal`.
+    """
+    result: dict[str, dict[str, str] | str] = {}
+    destinations: dict[str, str] = {}
+    for name, simple_link in config.simple.items():
+        destination = simple_link if isinstance(simple_link, str) else simple_link.to
+        result[name] = destinations.setdefault(destination, destination)
+    for project_name, project_links in config.projects.items():
+        links: dict[str, str] = {}
+        for link_name, link_settings in project_links.items():
+            destination = destinations.setdefault(link_settings.to, link_settings.to)
+            links.update(dict.fromkeys(map(sys.intern, _aliases(link_name, link_settings)), destination))
+        result[project_name] = links
+
+    return result
+
+
+def _parse_shard(raw: bytes, default_redirect: responses.RedirectOptions) -> shards.Links:
+    """Parse links of a shard and their redirect options, runs in worker processes (see :mod:`short_it.shards`)."""
+    shard = config_module.ShardConfig.parse(raw)
+    return _parse_links(shard), ParseConfigToMachineData._parse_redirects(shard, default_redirect)
+
+
+def _group_redirects(redirects: snapshot.RedirectsTable) -> dict[str, snapshot.RedirectsTable]:
+    """Split redirect options by projects (and simple links)."""
+    result: dict[str, snapshot.RedirectsTable] = {}
+    for path, options in redirects.items():
+        result.setdefault(path[1:].split("/", 1)[0], {})[path] = options
+    return result
+
+
+def _extract(
+    table: shards.Links, names: t.Iterable[str], redirects_by_name: t.Mapping[str, snapshot.RedirectsTable]
+) -> shards.Links:
+    """Links with these names from the table, and their redirect options."""
+    links, redirects = {}, {}
+    for name in names:
+        links[name] = table[0][name]
+        redirects.update(redirects_by_name.get(name, {}))
+    return links, redirects
+
+
+def _validate_name(name: str) -> None:
+    """Raise :exc:`ValueError`, if the link can't be requested with this name."""
+    if not responses.is_routable(name) or name == responses.RESERVED_PREFIX:
+        raise ValueError(f"Link name {name!r} must be lowercase, non-empty, without slashes, and not {'-'!r}")
+
+
+def _is_kept(path: str, project_name: str, new_links: dict[str, str] | str | None) -> bool:
+    """Whether the path of the project still resolves to a link, after it is replaced with ``new_links``."""
+    if new_links is None:
+        return False
+    if isinstance(new_links, str):
+        return path == f"/{project_name}"
+    prefix = f"/{project_name}/"
+    return path.startswith(prefix) and path[len(prefix) :] in new_links
+
+
+def _aliases(link_name: str, link_settings: config_module.LinkSettings) -> list[str]:
+    """All names of the link."""
+    import omegaconf.errors  # links are parsed only when the config is compiled
+
+    aliases: list[str] = [link_name]
+
+    # omegaconf raises an error on accessing undefined attribute, even if it's ok
+    # to be undefined. the code below, just tries to do try-except, so nothing
+    # will crash
+    for get_optional_field_value in [
+        lambda: link_settings.aliases,
+        lambda: link_settings.additional_aliases,
+    ]:
+        try:
+            optional_field_value = t.cast(t.Callable[[], list[str]], get_optional_field_value)()
+        except omegaconf.errors.ConfigAttributeError:
+            pass
+        else:
+            for value in optional_field_value or []:  # `None` in plain dataclasses
+                aliases.append(value)
+    return aliases
+
+
+def _redirect_options(
+    link_settings: config_module.LinkSettings | config_module.SimpleLinkSettings, default: responses.RedirectOptions
+) -> responses.RedirectOptions:
+    """Redirect options of the link, unset ones are taken from the default."""
+    # may be missing, see `_aliases`
+    status: int | None = getattr(link_settings, "status", None)
+    max_age: int | None = getattr(link_settings, "max_age", None)
+    return default[0] if status is None else status, default[1] if max_age is None else max_age
+
+
+def _default_redirect(config: config_module.Config) -> responses.RedirectOptions:
+    """Redirect options for links, which don't override them."""
+    return config.redirect.status, config.redirect.max_age
+
+
+def _lookup(data: stores.LinkStore, project_name: str, link_type: str | None) -> str | None:
+    """Find the destination in the table, see :meth:`ParseConfigToMachineData.get_url`."""
+    project_links = data.get(project_name)
+    if project_links is None:
+        return None
+
+    if isinstance(project_links, str):
+        if link_type is None:
+            return project_links
+        else:
+            raise OneLinkAndLinkTypeSpecifiedError()
+    if link_type is None:
+        raise MultipleLinksNoLinkTypeError()
+
+    return project_links.get(link_type)
+
+
+def _lookup_response(
+    data: stores.LinkStore,
+    project_name: str,
+    link_type: str | None,
+    redirect_options: snapshot.RedirectsTable | None = None,
+    default_redirect: responses.RedirectOptions = responses.DEFAULT_REDIRECT,
+) -> responses.PrebuiltResponse:
+    """Same as :func:`_lookup`, but return the response."""
+    try:
+        result = _lookup(data, project_name, link_type)
+    except OneLinkAndLinkTypeSpecifiedError:
+        return ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE
+    except MultipleLinksNoLinkTypeError:
+        return MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE
+
+    if result is None:
+        return responses.NOT_FOUND
+
+    options = default_redirect
+    if redirect_options:
+        path = f"/{project_name}" if link_type is None else f"/{project_name}/{link_type}"
+        options = redirect_options.get(path, default_redirect)
+    return responses.cached_redirect(result, *options)
+
+
+def _not_found_response(
+    suggestion_index: suggestions.SuggestionIndex, project_name: str, link_type: str | None
+) -> responses.PrebuiltResponse:
+    """The 404 page, with suggestions for the requested link."""
+    return responses.not_found(suggestion_index.suggest(project_name, link_type))
+
+
+def _open_journal(config: config_module.Config, create: bool = False) -> journal.Journal | None:
+    """Open the journal of runtime changes, if it is enabled (and exists, unless ``create`` is set)."""
+    path = config_module.DATA_DIR / config.journal.path
+    if not config.journal.enabled or config.store.backend != "memory" or not (create or path.exists()):
+        return None
+    return journal.Journal(path, config.journal.compact_after)
+
+
+def _open_store(config: config_module.Config, config_hash: bytes | None) -> stores.LinkStore | None:
+    """Open the persistent store, if it is up-to-date with the config."""
+    match config.store.backend:
+        case "sqlite":
+            return stores.SQLiteLinkStore.open_if_fresh(_store_path(config), config_hash)
+        case "mmap":
+            return stores.MmapLinkStore.open_if_fresh(_store_path(config), config_hash)
+    return None
+
+
+def _store_path(config: config_module.Config) -> pathlib.Path:
+    """Path to the persistent store, relative to the data directory."""
+    if config.store.backend == "mmap":
+        return config_module.DATA_DIR / config.store.mmap_path
+    return config_module.DATA_DIR / config.store.sqlite_path
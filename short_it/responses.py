@@ -0,0 +1,325 @@
+"""Pre-built HTTP responses, so the hot path only does a lookup and a send.
+
+Every possible answer is known as soon as the config is parsed, so the status,
+raw header bytes and body for each alias are built once. They are byte-for-byte
+the same as Starlette's ``RedirectResponse``, ``PlainTextResponse`` and
+``HTMLResponse`` produce.
+"""
+import dataclasses
+import functools
+import html as html_module
+import typing as t
+import urllib.parse
+
+NOT_FOUND_HTML = (
+    """\
+<!DOCTYPE html>
+<html>
+   <head>
+      <meta_http-equiv = "refresh"_content="10; url=https://perchun.it" />
+   </head>
+   <body>
+      404:_Not_Found._Redirecting_to_<a_href="https://perchun.it">https://perchun.it</a>_in_10_seconds.
+   </body>
+</html>
+""".replace(
+        "\n", ""
+    )
+    .replace(" ", "")
+    .replace("_", " ")
+)
+
+# paths under `/-/` are for the service itself (e.g. `/-/stats`), and are never links
+RESERVED_PREFIX = "-"
+# same as in `starlette.responses.RedirectResponse`
+_LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+
+RedirectOptions: t.TypeAlias = tuple[int, int | None]
+#                                    ^^^  ^^^
+#                                 status  max age for `Cache-Control`, in seconds
+DEFAULT_REDIRECT: RedirectOptions = (307, None)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PrebuiltResponse:
+    """Everything needed to send a response with two ASGI messages.
+
+    ``route`` is the pattern of the templated link (see :mod:`short_it.routing`),
+    clicks are counted for it instead of the path.
+    """
+
+    status: int
+    headers: tuple[tuple[bytes, bytes], ...]
+    body: bytes
+    route: str | None = None
+
+    @property
+    def is_redirect(self) -> bool:
+        """Whether the response redirects to a link (and should be counted, see :mod:`short_it.stats`)."""
+        return 300 <= self.status < 400
+
+
+Router: t.TypeAlias = t.Callable[[str, bytes], PrebuiltResponse | None]
+#                                 ^^^  ^^^
+#              path, raw query string, see `short_it.routing.Router.response`
+
+
+def redirect(url: str, status: int = 307, max_age: int | None = None) -> PrebuiltResponse:
+    """Build a redirect response, ``307 Temporary Redirect`` by default.
+
+    Args:
+        url: Destination of the redirect.
+        status: Redirect status code.
+        max_age: If set, allow caching the redirect for this amount of seconds.
+    """
+    location = urllib.parse.quote(url, safe=_LOCATION_SAFE_CHARS).encode("latin-1")
+    headers: tuple[tuple[bytes, bytes], ...] = ((b"content-length", b"0"), (b"location", location))
+    if max_age is not None:
+        headers = ((b"cache-control", cache_control(max_age).encode()), *headers)
+    return PrebuiltResponse(status, headers, b"")
+
+
+def cache_control(max_age: int) -> str:
+    """Value of the ``Cache-Control`` header for cacheable redirects."""
+    return f"public, max-age={max_age}"
+
+
+# for stores, which are not in memory, see `LazyResponseTable`
+cached_redirect = functools.lru_cache(maxsize=2**16)(redirect)
+
+
+def plain_text(text: str, status: int = 200) -> PrebuiltResponse:
+    """Build a ``text/plain`` response."""
+    body = text.encode()
+    return PrebuiltResponse(
+        status, ((b"content-length", str(len(body)).encode()), (b"content-type", b"text/plain; charset=utf-8")), body
+    )
+
+
+def html(text: str, status: int = 200) -> PrebuiltResponse:
+    """Build a ``text/html`` response."""
+    body = text.encode()
+    return PrebuiltResponse(
+        status, ((b"content-length", str(len(body)).encode()), (b"content-type", b"text/html; charset=utf-8")), body
+    )
+
+
+NOT_FOUND = html(NOT_FOUND_HTML, status=404)
+
+
+def not_found_html(suggestions: t.Sequence[str]) -> str:
+    """The 404 page, with links to the suggested paths (see :mod:`short_it.suggestions`)."""
+    if not suggestions:
+        return NOT_FOUND_HTML
+
+    links = ", ".join(
+        f'<a href="{html_module.escape(urllib.parse.quote(path))}">{html_module.escape(path)}</a>'
+        for path in suggestions
+    )
+    return NOT_FOUND_HTML.replace("</body>", f"<p>Did you mean {links}?</p></body>")
+
+
+def not_found(suggestions: t.Sequence[str]) -> PrebuiltResponse:
+    """Build the 404 page response, the pre-built one if there are no suggestions."""
+    if not suggestions:
+        return NOT_FOUND
+    return html(not_found_html(suggestions), status=404)
+
+
+def not_found_without_suggestions(project_name: str, link_type: str | None) -> PrebuiltResponse:
+    """The pre-built 404 page, for any request."""
+    return NOT_FOUND
+
+
+class ResponseTable:
+    """Map of request paths to pre-built responses.
+
+    Keys are full paths (``/project`` and ``/project/link_type``), so a request
+    with a lowercase path is resolved with a single dict lookup, without splitting
+    or lowering anything.
+    """
+
+    def __init__(
+        self,
+        data: dict[str, dict[str, str] | str],
+        one_link_error: PrebuiltResponse,
+        multiple_links_error: PrebuiltResponse,
+        not_found: t.Callable[[str, str | None], PrebuiltResponse] = not_found_without_suggestions,
+        redirect_options: t.Mapping[str, RedirectOptions] | None = None,
+        default_redirect: RedirectOptions = DEFAULT_REDIRECT,
+        router: Router | None = None,
+    ) -> None:
+        """Build responses for every alias.
+
+        Args:
+            data: The links table, see :mod:`short_it.stores`.
+            one_link_error: Response for a link type of a simple link.
+            multiple_links_error: Response for a project without link type.
+            not_found: Builds the 404 page for lowercase ``project_name`` and ``link_type``.
+            redirect_options: Redirect options of paths, which differ from ``default_redirect``.
+            default_redirect: Redirect options of all other paths.
+            router: Builds redirects of templated links (see :mod:`short_it.routing`), which are
+                tried for every path, which doesn't match a link exactly.
+        """
+        self._one_link_error = one_link_error
+        self._router = router
+        self._multiple_links_error = multiple_links_error
+        self._not_found = not_found
+        self._by_path: dict[str, PrebuiltResponse] = {}
+        self._simple_links: set[str] = set()
+        if redirect_options is None:
+            redirect_options = {}
+
+        redirects: dict[tuple[str, RedirectOptions], PrebuiltResponse] = {}  # share one response between aliases
+        for project_name, project_links in data.items():
+            if not is_routable(project_name):
+                continue
+
+            if isinstance(project_links, str):
+                self._simple_links.add(project_name)
+                path = "/" + project_name
+                key = (project_links, redirect_options.get(path, default_redirect))
+                if key not in redirects:
+                    redirects[key] = redirect(project_links, *key[1])
+                self._by_path[path] = redirects[key]
+                continue
+
+            self._by_path["/" + project_name] = multiple_links_error
+            for link_type, destination in project_links.items():
+                if not is_routable(link_type):
+                    continue
+                path = "/" + project_name + "/" + link_type
+                key = (destination, redirect_options.get(path, default_redirect))
+                if key not in redirects:
+                    redirects[key] = redirect(destination, *key[1])
+                self._by_path[path] = redirects[key]
+
+    def __len__(self) -> int:
+        """Amount of pre-built paths."""
+        return len(self._by_path)
+
+    def replace(
+        self,
+        project_name: str,
+        old_links: str | t.Mapping[str, str] | None,
+        new_links: str | t.Mapping[str, str] | None,
+        redirect_options: t.Mapping[str, RedirectOptions],
+        default_redirect: RedirectOptions = DEFAULT_REDIRECT,
+    ) -> None:
+        """Rebuild responses of one project (or simple link), without touching the others.
+
+        New paths are published first, and stale ones are removed after that, every
+        path with a single (atomic) dict operation, so concurrent requests never
+        wait for this. Must not be called concurrently with itself.
+
+        Args:
+            project_name: Name of the project or simple link.
+            old_links: Links of the project, which responses are currently built for (:obj:`None` if new).
+            new_links: New links of the project (:obj:`None` to remove it).
+            redirect_options: Redirect options of paths, which differ from ``default_redirect``.
+            default_redirect: Redirect options of all other paths.
+        """
+        if not is_routable(project_name):
+            return
+
+        project_path = "/" + project_name
+        new_paths: dict[str, PrebuiltResponse] = {}
+        if isinstance(new_links, str):
+            new_paths[project_path] = cached_redirect(new_links, *redirect_options.get(project_path, default_redirect))
+        elif new_links is not None:
+            new_paths[project_path] = self._multiple_links_error
+            for link_type, destination in new_links.items():
+                if is_routable(link_type):
+                    path = project_path + "/" + link_type
+                    new_paths[path] = cached_redirect(destination, *redirect_options.get(path, default_redirect))
+
+        self._by_path.update(new_paths)
+        if isinstance(new_links, str):
+            self._simple_links.add(project_name)
+        else:
+            self._simple_links.discard(project_name)
+
+        old_paths = [project_path]
+        if old_links is not None and not isinstance(old_links, str):
+            old_paths += [project_path + "/" + link_type for link_type in old_links]
+        for path in old_paths:
+            if path not in new_paths:
+                self._by_path.pop(path, None)
+
+    def resolve(self, path: str, query_string: bytes = b"") -> PrebuiltResponse | None:
+        """Find the response for the request path.
+
+        Args:
+            path: The request path.
+            query_string: The raw query string, only templated links use it.
+
+        Returns:
+            :class:`PrebuiltResponse` (including 404 page), or :obj:`None` if the path
+            doesn't match ``/{project_name}`` or ``/{project_name}/{link_type}`` routes
+            (or a templated link).
+        """
+        response = self._by_path.get(path)
+        if response is not None:
+            return response
+
+        segments = path[1:].split("/")
+        if segments[0] == RESERVED_PREFIX:
+            return None
+        if len(segments) > 2 or "" in segments:
+            return self._router(path, query_string) if self._router is not None else None
+
+        response = self._by_path.get(path.lower())
+        if response is not None:
+            return response
+
+        if self._router is not None:
+            response = self._router(path, query_string)
+            if response is not None:
+                return response
+        if len(segments) == 2 and segments[0].lower() in self._simple_links:
+            return self._one_link_error
+        return self._not_found(segments[0].lower(), segments[1].lower() if len(segments) == 2 else None)
+
+
+class LazyResponseTable:
+    """Same as :class:`ResponseTable`, but responses are built on request.
+
+    Used for stores, which are too big to pre-build a response for every alias.
+    ``resolver`` returns the response for lowercase ``project_name`` and ``link_type``.
+    """
+
+    def __init__(
+        self,
+        resolver: t.Callable[[str, str | None], PrebuiltResponse],
+        not_found: t.Callable[[str, str | None], PrebuiltResponse] = not_found_without_suggestions,
+        router: Router | None = None,
+    ) -> None:
+        self._resolver = resolver
+        self._not_found = not_found
+        self._router = router
+
+    def resolve(self, path: str, query_string: bytes = b"") -> PrebuiltResponse | None:
+        """Find the response for the request path, see :meth:`ResponseTable.resolve`."""
+        segments = path[1:].lower().split("/")
+        if segments[0] == RESERVED_PREFIX:
+            return None
+        if len(segments) > 2 or "" in segments:
+            return self._router(path, query_string) if self._router is not None else None
+
+        project_name, link_type = segments[0], segments[1] if len(segments) == 2 else None
+        response = self._resolver(project_name, link_type)
+        # only the error for a simple link with link type, and the 404 page give way to templated links
+        if response is not NOT_FOUND and (response.is_redirect or link_type is None):
+            return response
+        if self._router is not None:
+            routed = self._router(path, query_string)
+            if routed is not None:
+                return routed
+        if response is NOT_FOUND:
+            return self._not_found(project_name, link_type)
+        return response
+
+
+def is_routable(name: str) -> bool:
+    """Whether the name can be matched by a request (paths are lowercased, and split by slashes)."""
+    return bool(name) and "/" not in name and name == name.lower()
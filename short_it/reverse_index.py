@@ -0,0 +1,172 @@
+"""Reverse index from destinations to links, which redirect to them.
+
+Answers "which links point at this URL?", e.g. to find and dedupe links, when a
+repository moves or a domain dies. Destinations are kept sorted, so links to all
+destinations with a prefix (like ``https://github.com/PerchunPak/``) are found
+with a binary search, not by scanning the whole table. Hosts are indexed
+separately, so a domain is found together with its subdomains.
+
+The index is built on the first query (most servers never need it), and is kept
+up to date with runtime changes after that.
+"""
+import bisect
+import itertools
+import threading
+import typing as t
+import urllib.parse
+
+import short_it.stores as stores
+
+
+class ReverseIndex:
+    """Reverse index over one link table, see the module docstring.
+
+    Results are dicts of destinations (sorted), and paths of links (with all
+    aliases), which redirect to them, like :meth:`~short_it.parse_config.ParseConfigToMachineData.destinations`.
+    """
+
+    def __init__(self, data: stores.LinkStore) -> None:
+        self._data = data
+        self._lock = threading.Lock()
+        self._paths: dict[str, list[str]] | None = None
+        self._sorted: list[str] = []  # destinations
+        self._hosts: dict[str, set[str]] = {}  # host -> destinations
+
+    def build(self) -> None:
+        """Build the index, if it is not built yet.
+
+        The table must not be changed meanwhile, so it is called with the write lock of the table.
+        """
+        with self._lock:
+            if self._paths is not None:
+                return
+
+            paths = group(self._data)
+            self._sorted = sorted(paths)
+            self._hosts = {}
+            for destination in self._sorted:
+                self._hosts.setdefault(_host(destination), set()).add(destination)
+            self._paths = paths
+
+    def replace(
+        self,
+        project_name: str,
+        old_links: t.Mapping[str, str] | str | None,
+        new_links: t.Mapping[str, str] | str | None,
+    ) -> None:
+        """Replace links of the project (or simple link), if the index is built already."""
+        with self._lock:
+            if self._paths is None:
+                return
+
+            for path, destination in _links(project_name, old_links):
+                self._remove(path, destination)
+            for path, destination in _links(project_name, new_links):
+                self._add(path, destination)
+
+    def query(
+        self,
+        to: str | None = None,
+        prefix: str | None = None,
+        host: str | None = None,
+        duplicates: bool = False,
+        limit: int | None = None,
+    ) -> dict[str, list[str]]:
+        """Find links by exactly one of the arguments.
+
+        Args:
+            to: Destination, which must match exactly.
+            prefix: Start of destinations, e.g. ``https://github.com/PerchunPak/``.
+            host: Host of destinations, subdomains are included (``example.com``
+                finds ``www.example.com`` too).
+            duplicates: Find destinations, which links of more than one project
+                (or simple link) redirect to.
+            limit: Return only this many destinations.
+
+        Raises:
+            ValueError: If not exactly one of ``to``, ``prefix``, ``host`` and ``duplicates`` is set.
+        """
+        if sum((to is not None, prefix is not None, host is not None, duplicates)) != 1:
+            raise ValueError("Set exactly one of 'to', 'prefix', 'host' and 'duplicates'")
+
+        self.build()
+        with self._lock:
+            assert self._paths is not None
+            destinations: t.Iterable[str]
+            if to is not None:
+                destinations = [to] if to in self._paths else []
+            elif prefix is not None:
+                start = bisect.bisect_left(self._sorted, prefix)
+                following = (self._sorted[index] for index in range(start, len(self._sorted)))  # without a copy
+                destinations = itertools.takewhile(lambda url: url.startswith(prefix), following)
+            elif host is not None:
+                host = host.lower().strip(".")
+                destinations = sorted(
+                    url
+                    for name, urls in self._hosts.items()
+                    if name == host or name.endswith("." + host)
+                    for url in urls
+                )
+            else:
+                destinations = (url for url in self._sorted if _projects_count(self._paths[url]) > 1)
+            return {url: list(self._paths[url]) for url in itertools.islice(destinations, limit)}
+
+    def _add(self, path: str, destination: str) -> None:
+        """Add the path, and its destination if it is new. Called with the lock."""
+        assert self._paths is not None
+        paths = self._paths.get(destination)
+        if paths is not None:
+            paths.append(path)
+            return
+
+        self._paths[destination] = [path]
+        bisect.insort(self._sorted, destination)
+        self._hosts.setdefault(_host(destination), set()).add(destination)
+
+    def _remove(self, path: str, destination: str) -> None:
+        """Remove the path, and its destination if no other path is left. Called with the lock."""
+        assert self._paths is not None
+        paths = self._paths[destination]
+        paths.remove(path)
+        if paths:
+            return
+
+        del self._paths[destination]
+        del self._sorted[bisect.bisect_left(self._sorted, destination)]
+        host = _host(destination)
+        self._hosts[host].discard(destination)
+        if not self._hosts[host]:
+            del self._hosts[host]
+
+
+def group(data: stores.LinkStore) -> dict[str, list[str]]:
+    """Every unique destination, and paths of links (with all aliases), which redirect to it."""
+    result: dict[str, list[str]] = {}
+    for project_name, project_links in data.items():
+        for path, destination in _links(project_name, project_links):
+            result.setdefault(destination, []).append(path)
+    return result
+
+
+def _links(project_name: str, project_links: t.Mapping[str, str] | str | None) -> t.Iterator[tuple[str, str]]:
+    """Paths of links of the project (or the simple link), and their destinations."""
+    if project_links is None:
+        return
+    if isinstance(project_links, str):
+        yield f"/{project_name}", project_links
+        return
+    for link_type, destination in project_links.items():
+        yield f"/{project_name}/{link_type}", destination
+
+
+def _host(url: str) -> str:
+    """Host of the destination in lowercase, empty if there is none."""
+    try:
+        return urllib.parse.urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+def _projects_count(paths: list[str]) -> int:
+    """Amount of different projects (and simple links) among paths."""
+    return len({path.split("/", 2)[1] for path in paths})
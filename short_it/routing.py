@@ -0,0 +1,229 @@
+"""Templated and prefix-forwarding links, matched with a segment trie.
+
+Templates are set in the ``routes`` section of the config::
+
+    /short-it/issue/{n}: https://github.com/PerchunPak/short-it/issues/{n}
+    /docs/*: https://short-it.readthedocs.io/en/latest/
+
+``{name}`` matches one whole segment, and is substituted into the destination.
+``*`` (only the last segment) matches the rest of the path, including nothing,
+which is appended to the destination together with the query string.
+
+All templates are compiled into one trie of segments when the config is parsed,
+so matching walks the path once, segment by segment, and its cost depends on the
+length of the path, not on the amount of templates. Literal segments win over
+``{name}``, and both win over ``*``, so the most specific template matches.
+Literal segments are matched in lowercase (like links), substituted values keep
+their case.
+"""
+import dataclasses
+import re
+import typing as t
+import urllib.parse
+
+import short_it.responses as responses
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_REST = "*"
+
+
+@dataclasses.dataclass(frozen=True)
+class Route:
+    """One compiled template.
+
+    ``parts`` are literal parts of the destination, interleaved with indexes of
+    values to substitute (in order of placeholders in the pattern).
+    """
+
+    pattern: str
+    destination: str
+    parts: tuple[str | int, ...]
+    forwards_rest: bool
+    redirect: responses.RedirectOptions
+
+
+@dataclasses.dataclass(frozen=True)
+class Match:
+    """Template, which matched the path, and the URL to redirect to."""
+
+    route: Route
+    url: str
+
+
+class _Node:
+    """Node of the trie, one segment of templates."""
+
+    __slots__ = ("literals", "placeholder", "route", "rest")
+
+    def __init__(self) -> None:
+        self.literals: dict[str, _Node] = {}
+        self.placeholder: _Node | None = None
+        self.route: Route | None = None  # template, which ends here
+        self.rest: Route | None = None  # template, which ends here with `*`
+
+
+class Router:
+    """All templates from the config, compiled into a trie."""
+
+    def __init__(
+        self,
+        routes: t.Mapping[str, str | t.Mapping[str, object]],
+        default_redirect: responses.RedirectOptions = responses.DEFAULT_REDIRECT,
+    ) -> None:
+        """Compile templates.
+
+        Args:
+            routes: Patterns, and either destinations, or mappings with ``to``,
+                ``status`` and ``max_age`` (see :class:`~short_it.config.SimpleLinkSettings`).
+            default_redirect: Redirect options of templates, which don't set them.
+
+        Raises:
+            ValueError: If a pattern or a destination is invalid, or two patterns match the same paths.
+        """
+        self._root = _Node()
+        self._size = 0
+        for pattern, settings in routes.items():
+            if isinstance(settings, str):
+                self._add(pattern, settings, default_redirect)
+                continue
+
+            status = t.cast(int | None, settings.get("status"))
+            max_age = t.cast(int | None, settings.get("max_age"))
+            self._add(
+                pattern,
+                t.cast(str, settings["to"]),
+                (
+                    default_redirect[0] if status is None else status,
+                    default_redirect[1] if max_age is None else max_age,
+                ),
+            )
+
+    def __len__(self) -> int:
+        """Amount of templates."""
+        return self._size
+
+    def match(self, path: str, query_string: bytes = b"") -> Match | None:
+        """Find the most specific template for the request path.
+
+        Args:
+            path: Request path (not in lowercase).
+            query_string: Raw query string, appended to destinations of templates with ``*``.
+        """
+        segments = path[1:].split("/")
+        if segments[0] == responses.RESERVED_PREFIX:
+            return None
+
+        values: list[str] = []
+        found = self._find(self._root, segments, 0, values)
+        if found is None:
+            return None
+
+        route, end = found
+        url = "".join(
+            part if isinstance(part, str) else urllib.parse.quote(values[part], safe="") for part in route.parts
+        )
+        if route.forwards_rest:
+            url = _forward(url, "/".join(segments[end:]), query_string)
+        return Match(route, url)
+
+    def response(self, path: str, query_string: bytes = b"") -> responses.PrebuiltResponse | None:
+        """Build the redirect for the request path, if some template matches it.
+
+        The response is built on every request, as it depends on the path. Clicks
+        are counted for the pattern (see :attr:`~short_it.responses.PrebuiltResponse.route`).
+        """
+        found = self.match(path, query_string)
+        if found is None:
+            return None
+        return dataclasses.replace(responses.redirect(found.url, *found.route.redirect), route=found.route.pattern)
+
+    def _find(self, node: _Node, segments: list[str], index: int, values: list[str]) -> tuple[Route, int] | None:
+        """Match segments from ``index``, trying literals, then placeholders, then ``*`` (with backtracking).
+
+        Recursion is at most as deep as the longest template, as only existing nodes are visited.
+
+        Returns:
+            The template, and the index of the first segment, matched by ``*``.
+        """
+        if index == len(segments):
+            if node.route is not None:
+                return node.route, index
+        else:
+            segment = segments[index]
+            child = node.literals.get(segment.lower())
+            if child is not None:
+                found = self._find(child, segments, index + 1, values)
+                if found is not None:
+                    return found
+            if node.placeholder is not None and segment:
+                values.append(segment)
+                found = self._find(node.placeholder, segments, index + 1, values)
+                if found is not None:
+                    return found
+                values.pop()
+
+        if node.rest is not None:
+            return node.rest, index
+        return None
+
+    def _add(self, pattern: str, destination: str, redirect: responses.RedirectOptions) -> None:
+        """Compile the template and add it to the trie."""
+        segments = pattern.removeprefix("/").split("/")
+        forwards_rest = segments[-1] == _REST
+        if forwards_rest:
+            segments.pop()
+        if (segments and segments[0] == responses.RESERVED_PREFIX) or (not segments and not forwards_rest):
+            raise ValueError(f"Invalid templated link {pattern!r}, it must not be empty or start with '-'")
+
+        node, names = self._root, []
+        for segment in segments:
+            placeholder = _PLACEHOLDER.fullmatch(segment)
+            if placeholder is not None:
+                if placeholder[1] in names:
+                    raise ValueError(f"Placeholder {placeholder[1]!r} is repeated in templated link {pattern!r}")
+                names.append(placeholder[1])
+                if node.placeholder is None:
+                    node.placeholder = _Node()
+                node = node.placeholder
+            elif responses.is_routable(segment) and "{" not in segment and segment != _REST:
+                node = node.literals.setdefault(segment, _Node())
+            else:
+                raise ValueError(
+                    f"Invalid segment {segment!r} in templated link {pattern!r}, it must be lowercase, "
+                    "or a whole '{name}' placeholder, and '*' can be only the last one"
+                )
+
+        route = Route(pattern, destination, _compile_destination(pattern, destination, names), forwards_rest, redirect)
+        existing = node.rest if forwards_rest else node.route
+        if existing is not None:
+            raise ValueError(f"Templated links {existing.pattern!r} and {pattern!r} match the same paths")
+        if forwards_rest:
+            node.rest = route
+        else:
+            node.route = route
+        self._size += 1
+
+
+def _compile_destination(pattern: str, destination: str, names: list[str]) -> tuple[str | int, ...]:
+    """Split the destination into literal parts and indexes of placeholders."""
+    parts: list[str | int] = []
+    position = 0
+    for placeholder in _PLACEHOLDER.finditer(destination):
+        if placeholder[1] not in names:
+            raise ValueError(f"Destination of templated link {pattern!r} has unknown placeholder {placeholder[0]!r}")
+        parts += [destination[position : placeholder.start()], names.index(placeholder[1])]
+        position = placeholder.end()
+    parts.append(destination[position:])
+    return tuple(part for part in parts if part != "")
+
+
+def _forward(url: str, rest: str, query_string: bytes) -> str:
+    """Append the rest of the path and the query string to the destination, before its own query and fragment."""
+    url, hash_sign, fragment = url.partition("#")
+    url, question_mark, query = url.partition("?")
+    if rest:
+        url = url.rstrip("/") + "/" + urllib.parse.quote(rest, safe="/")
+    if query_string:
+        query = query + "&" + query_string.decode("latin-1") if query else query_string.decode("latin-1")
+        question_mark = "?"
+    return url + question_mark + query + hash_sign + fragment
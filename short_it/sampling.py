@@ -0,0 +1,69 @@
+"""Sentry ``traces_sampler``, which keeps tracing overhead bounded under load.
+
+Every request (redirects too) asks the sampler whether to trace it, so the
+sampler itself is a dict lookup and a few additions. The budget is enforced per
+one second window: the sampler sums up rates of all requests in a window (which
+is the expected amount of traces), and scales rates in the next window so that
+the expected amount fits into ``max_traces_per_second``. Errors are not traces,
+they are always sent regardless of this sampler.
+"""
+import time
+import typing as t
+
+WINDOW = 1.0  # seconds
+
+
+class TracesSampler:
+    """Sample traces by route, within a budget of traces per second."""
+
+    def __init__(
+        self,
+        default_rate: float,
+        route_rates: t.Mapping[str, float] | None = None,
+        max_traces_per_second: float | None = None,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._default_rate = default_rate
+        self._route_rates = dict(route_rates or {})
+        self._budget = max_traces_per_second
+        self._clock = clock
+
+        self._window_start = clock()
+        self._demand = 0.0  # expected amount of traces in the current window, without scaling
+        self.scale = 1.0  # multiplier for rates in the current window
+
+    def __call__(self, sampling_context: dict[str, t.Any]) -> float:  # type: ignore[misc] # Sentry's type
+        """Return the sampling rate for the new transaction.
+
+        A decision of the parent (from an incoming trace header) is respected, so
+        traces are not broken in the middle.
+        """
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+
+        rate = self._route_rates.get(_path(sampling_context), self._default_rate)
+        if self._budget is None:
+            return rate
+
+        now = self._clock()
+        if now - self._window_start >= WINDOW:
+            self._rescale(now)
+        self._demand += rate
+        return rate * self.scale
+
+    def _rescale(self, now: float) -> None:
+        """Start the new window, with the scale that fits the last window into the budget."""
+        assert self._budget is not None
+        demand_per_second = self._demand / (now - self._window_start)
+        self.scale = 1.0 if demand_per_second <= self._budget else self._budget / demand_per_second
+        self._window_start = now
+        self._demand = 0.0
+
+
+def _path(sampling_context: dict[str, t.Any]) -> str:  # type: ignore[misc] # Sentry's type
+    """Request path, or the transaction name for anything but ASGI requests."""
+    asgi_scope = sampling_context.get("asgi_scope")
+    if asgi_scope is not None:
+        return str(asgi_scope.get("path", ""))
+    return str(sampling_context.get("transaction_context", {}).get("name", ""))
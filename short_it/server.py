@@ -0,0 +1,169 @@
+"""Run uvicorn, optionally in multiple pre-forked worker processes.
+
+uvicorn's own ``--workers`` spawns fresh interpreters, so every worker would
+import the app and parse ``config.yml`` again. Instead, the master process
+builds the lookup table once, moves it into the permanent generation with
+:func:`gc.freeze` (so the garbage collector never touches those objects and
+their pages stay shared copy-on-write), and only then forks the workers. All
+workers accept connections from one listening socket.
+
+Every worker has its own copy of the table, so the admin API (which changes
+only the table of the worker, that handled the request) needs one worker.
+
+Dead workers are restarted. If they keep dying right after the start (e.g. the
+port can't be used), restarts are delayed more and more, and the master gives
+up after a few of them, instead of forking forever.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+import types
+
+import fastapi
+import uvicorn
+
+import short_it.config as config_module
+import short_it.exc
+import short_it.parse_config as parse_config
+
+logger = logging.getLogger(__name__)
+
+_MIN_LIFETIME = 5.0  # seconds, a worker, which died sooner, crashed at startup
+_MAX_QUICK_DEATHS = 5  # in a row, then the master gives up
+_FIRST_BACKOFF = 0.1  # seconds before restarting the first quickly died worker, doubled every time
+
+
+class AdminWithWorkersError(short_it.exc.ShortItException):
+    """Raised when the admin API is enabled, but there is more than one worker."""
+
+    def __init__(self) -> None:
+        super().__init__("The admin API changes links only in one worker, set 'server.workers' to 1 to use it")
+
+
+def run(app: fastapi.FastAPI, host: str, port: int) -> None:
+    """Serve the app, with settings from the ``server`` config section.
+
+    Raises:
+        AdminWithWorkersError: If the admin API is enabled with more than one worker.
+        SystemExit: If workers keep crashing at startup.
+    """
+    config = config_module.Config()
+    server_config = config.server
+    uvicorn_config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        backlog=server_config.backlog,
+        timeout_keep_alive=server_config.keep_alive,
+        limit_concurrency=server_config.limit_concurrency,
+    )
+    workers = server_config.workers or os.cpu_count() or 1
+    if workers > 1 and config.admin.token is not None:
+        raise AdminWithWorkersError()
+    if workers == 1:
+        uvicorn.Server(uvicorn_config).run()
+        return
+
+    sock = bind(host, port, server_config.backlog)
+    # lifespan of every worker would build it anyway, but here it is done once and shared
+    parse_config.ParseConfigToMachineData().build_suggestions()
+    gc.freeze()
+
+    exit_code = Master(uvicorn_config, sock, workers).run()
+    if exit_code != 0:
+        raise SystemExit(exit_code)
+
+
+def bind(host: str, port: int, backlog: int) -> socket.socket:
+    """Create the listening socket, which is shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    """Fork workers, restart them if they die, and stop them on ``SIGINT`` / ``SIGTERM``."""
+
+    def __init__(self, uvicorn_config: uvicorn.Config, sock: socket.socket, workers: int) -> None:
+        self._uvicorn_config = uvicorn_config
+        self._sock = sock
+        self._workers = workers
+        self._pids: dict[int, float] = {}  # pid -> when it was forked
+        self._should_exit = False
+        self._quick_deaths = 0
+
+    def run(self) -> int:
+        """Run until a shutdown signal, then wait for workers to finish their requests.
+
+        Returns:
+            Exit code, ``1`` if workers kept crashing at startup.
+        """
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        logger.info("Starting %d workers", self._workers)
+
+        for _ in range(self._workers):
+            self._spawn()
+
+        exit_code = 0
+        while self._pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._pids.pop(pid, None)
+            if started is None or self._should_exit:
+                continue
+
+            self._quick_deaths = self._quick_deaths + 1 if time.monotonic() - started < _MIN_LIFETIME else 0
+            if self._quick_deaths >= _MAX_QUICK_DEATHS:
+                logger.error("Workers crashed at startup %d times in a row, stopping", self._quick_deaths)
+                exit_code = 1
+                self._handle_exit(signal.SIGTERM, None)
+                continue
+
+            delay = _FIRST_BACKOFF * 2 ** (self._quick_deaths - 1) if self._quick_deaths else 0
+            logger.warning(
+                "Worker %d exited with code %d, restarting it in %.1fs", pid, os.waitstatus_to_exitcode(status), delay
+            )
+            time.sleep(delay)
+            if not self._should_exit:
+                self._spawn()
+
+        self._sock.close()
+        return exit_code
+
+    def _spawn(self) -> None:
+        """Fork one worker."""
+        pid = os.fork()
+        if pid != 0:
+            self._pids[pid] = time.monotonic()
+            return
+
+        # worker process, uvicorn installs its own signal handlers
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            uvicorn.Server(self._uvicorn_config).run(sockets=[self._sock])
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _handle_exit(self, signum: int, _: types.FrameType | None) -> None:
+        """Forward the signal to workers, they shut down gracefully."""
+        self._should_exit = True
+        for pid in self._pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
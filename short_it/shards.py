@@ -0,0 +1,234 @@
+"""Links, split into YAML files (shards) in the ``config.d`` directory, e.g. one per project or team.
+
+Shards have only ``projects`` and ``simple`` sections, all settings stay in
+``config.yml``. Every name (of a project or a simple link) can be defined only in
+one file, otherwise all conflicts are reported at once, and the links are not
+loaded.
+
+Shards are loaded incrementally: ``mtime`` and size of every file are checked
+first, and it is hashed only if they differ (like in :mod:`short_it.watcher`),
+and parsed only if the hash differs. Changed shards are parsed in parallel, in
+worker processes, because YAML parsing holds the GIL. Only names of links are
+remembered for every shard, links themselves are stored in the merged table.
+"""
+import concurrent.futures
+import dataclasses
+import hashlib
+import multiprocessing
+import os
+import pathlib
+import typing as t
+
+import short_it.snapshot as snapshot
+
+SUFFIXES = frozenset({".yml", ".yaml"})
+CONFIG_NAME = "config.yml"
+PARALLEL_MIN_BYTES = 256 * 1024
+"""Shards are parsed in worker processes, only if they are at least that big in total, starting workers is slow."""
+
+Links: t.TypeAlias = tuple[snapshot.LinksTable, snapshot.RedirectsTable]
+Parser: t.TypeAlias = t.Callable[[bytes], Links]
+
+
+@dataclasses.dataclass(frozen=True)
+class Shard:
+    """One file of the config directory, as it was loaded the last time.
+
+    ``stat`` is ``mtime`` and size of the file, :obj:`None` if they are unknown
+    (the shard was loaded from the snapshot).
+    """
+
+    name: str
+    content_hash: bytes
+    links: tuple[str, ...]
+    stat: tuple[int, int] | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Changes:
+    """Result of :func:`load`.
+
+    ``shards`` are all files in the directory, ``parsed`` are links of new and
+    changed ones, and ``removed`` are names of files, which were deleted.
+    """
+
+    shards: dict[str, Shard]
+    parsed: dict[str, Links]
+    removed: list[str]
+
+    @property
+    def changed(self) -> set[str]:
+        """Names of new, changed and removed files."""
+        return set(self.parsed) | set(self.removed)
+
+
+def discover(directory: pathlib.Path) -> list[pathlib.Path]:
+    """All shards in the directory, sorted by name (empty list, if there is no directory)."""
+    try:
+        return sorted(path for path in directory.iterdir() if path.suffix in SUFFIXES and path.is_file())
+    except FileNotFoundError:
+        return []
+
+
+def stat_files(directory: pathlib.Path) -> tuple[tuple[str, int, int], ...]:
+    """Name, ``mtime`` and size of every shard, cheap to check for changes."""
+    result = []
+    for path in discover(directory):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # deleted in the meantime
+            continue
+        result.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(result)
+
+
+def hash_files(directory: pathlib.Path) -> dict[str, bytes]:
+    """Hash content of every shard."""
+    result = {}
+    for path in discover(directory):
+        content_hash = snapshot.hash_file(path)
+        if content_hash is not None:
+            result[path.name] = content_hash
+    return result
+
+
+def combined_hash(config_hash: bytes | None, shard_hashes: t.Mapping[str, bytes]) -> bytes | None:
+    """Hash of ``config.yml`` and all shards, it identifies the whole set of links.
+
+    Without shards, it is just the hash of ``config.yml``, so the snapshot and
+    stores, compiled before shards were added, are still fresh.
+    """
+    if config_hash is None or not shard_hashes:
+        return config_hash
+
+    hasher = hashlib.sha256(config_hash)
+    for name in sorted(shard_hashes):
+        hasher.update(name.encode() + b"\0" + shard_hashes[name])
+    return hasher.digest()
+
+
+def load(directory: pathlib.Path, previous: t.Mapping[str, Shard], parse: Parser, workers: int = 0) -> Changes:
+    """Load all shards in the directory, parsing only new and changed ones.
+
+    Args:
+        directory: The config directory.
+        previous: Shards from the last load, unchanged ones are not parsed again.
+        parse: Function to parse content of a shard. It must be picklable (e.g. defined
+            on the module level), to run in worker processes.
+        workers: Maximum amount of worker processes (``0`` is one per CPU core).
+
+    Raises:
+        ValueError: If a shard is invalid, the message has its path.
+    """
+    shards: dict[str, Shard] = {}
+    to_parse: list[tuple[pathlib.Path, bytes, Shard]] = []
+    for path in discover(directory):
+        try:
+            stat = path.stat()
+            cached = previous.get(path.name)
+            if cached is not None and cached.stat == (stat.st_mtime_ns, stat.st_size):
+                shards[path.name] = cached
+                continue
+
+            raw = path.read_bytes()
+        except FileNotFoundError:  # deleted in the meantime
+            continue
+
+        shard = Shard(path.name, snapshot.hash_bytes(raw), (), (stat.st_mtime_ns, stat.st_size))
+        if cached is not None and cached.content_hash == shard.content_hash:  # only touched
+            shards[path.name] = dataclasses.replace(cached, stat=shard.stat)
+        else:
+            to_parse.append((path, raw, shard))
+
+    parsed: dict[str, Links] = {}
+    for (path, _, shard), links in zip(
+        to_parse, _parse_all(parse, [(path, raw) for path, raw, _ in to_parse], workers)
+    ):
+        shards[path.name] = dataclasses.replace(shard, links=tuple(links[0]))
+        parsed[path.name] = links
+
+    return Changes(shards, parsed, [name for name in previous if name not in shards])
+
+
+def owners(shards: t.Iterable[Shard]) -> dict[str, str]:
+    """Name of the file, where every link is defined."""
+    return {link: shard.name for shard in shards for link in shard.links}
+
+
+def check_conflicts(
+    config_links: t.Container[str],
+    link_owners: t.Mapping[str, str],
+    changed: t.Collection[str],
+    parsed: t.Mapping[str, Links],
+) -> None:
+    """Check that every new link is defined only in one file.
+
+    Args:
+        config_links: Names of links in the table. Ones, which are not in ``link_owners``, are from ``config.yml``.
+        link_owners: File of every link from shards, see :func:`owners`.
+        changed: Names of files, which are replaced with ``parsed`` ones, or removed.
+        parsed: Links of new and changed files.
+
+    Raises:
+        ValueError: With all names, which are defined in more than one file, and these files.
+    """
+    sources: dict[str, list[str]] = {}
+    for file_name in sorted(parsed):
+        for name in parsed[file_name][0]:
+            if name not in sources:
+                owner = link_owners.get(name) if name in link_owners else CONFIG_NAME if name in config_links else None
+                sources[name] = [] if owner is None or owner in changed else [owner]
+            sources[name].append(file_name)
+
+    conflicts = {name: files for name, files in sources.items() if len(files) > 1}
+    if conflicts:
+        raise ValueError(
+            "Links are defined in more than one file:\n"
+            + "\n".join(f"  {name!r} in {', '.join(files)}" for name, files in sorted(conflicts.items()))
+        )
+
+
+def merge(config_links: Links, parsed: t.Iterable[Links]) -> Links:
+    """Merge links from ``config.yml`` and shards into one table, check conflicts with :func:`check_conflicts` first.
+
+    Returns:
+        New table and redirect options, or the ones from ``config.yml``, if there are no shards.
+    """
+    parsed = list(parsed)
+    if not parsed:
+        return config_links
+
+    links, redirects = dict(config_links[0]), dict(config_links[1])
+    for shard_links, shard_redirects in parsed:
+        links.update(shard_links)
+        redirects.update(shard_redirects)
+    return links, redirects
+
+
+def _parse_all(parse: Parser, files: list[tuple[pathlib.Path, bytes]], workers: int) -> list[Links]:
+    """Parse files, in worker processes if there are many of them."""
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1 or sum(len(raw) for _, raw in files) < PARALLEL_MIN_BYTES:
+        return [_parse_one(parse, path, raw) for path, raw in files]
+
+    # forked workers are cheap to start, but forking a process with threads is unsafe
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["short_it.parse_config"])
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        return list(
+            pool.map(
+                _parse_one,
+                [parse] * len(files),
+                [path for path, _ in files],
+                [raw for _, raw in files],
+                chunksize=max(1, len(files) // (workers * 4)),
+            )
+        )
+
+
+def _parse_one(parse: Parser, path: pathlib.Path, raw: bytes) -> Links:
+    """Parse one file, errors are converted to :exc:`ValueError` with the path (it is sent from a worker process)."""
+    try:
+        return parse(raw)
+    except Exception as error:
+        raise ValueError(f"Invalid shard {path}: {error}") from None
@@ -0,0 +1,136 @@
+"""Precompiled snapshot of the config, so we can skip OmegaConf on startup.
+
+Snapshot is a small header, followed by two :mod:`marshal` blobs: settings (all
+config sections except links), and the flattened ``project -> link_type -> destination``
+table together with redirect settings of links, which differ from the default.
+It is keyed by a hash of ``config.yml`` content, so any edit of the config
+invalidates it. If links are split into shards (see :mod:`short_it.shards`), the
+hash covers them too, and the snapshot remembers which links every shard has.
+"""
+import dataclasses
+import hashlib
+import marshal
+import os
+import pathlib
+import struct
+import typing as t
+
+import short_it.utils as utils
+
+MAGIC = b"short-it"
+FORMAT_VERSION = 3
+_HEADER = struct.Struct("<8sHH32sQ")
+#                        ^^^^^^^^^^
+#         magic, format version, marshal version, config hash, settings size
+
+LinksTable: t.TypeAlias = dict[str, dict[str, str] | str]
+RedirectsTable: t.TypeAlias = dict[str, tuple[int, int | None]]
+#                                  ^^^       ^^^  ^^^
+#                         path of the link, status, max age
+Settings: t.TypeAlias = dict[str, dict[str, object]]
+ShardsTable: t.TypeAlias = dict[str, tuple[bytes, tuple[str, ...]]]
+#                               ^^^         ^^^   ^^^
+#                         file name, content hash, names of its links
+
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    """Decoded snapshot."""
+
+    config_hash: bytes
+    settings: Settings
+    links: LinksTable
+    redirects: RedirectsTable = dataclasses.field(default_factory=dict)
+    shards: ShardsTable = dataclasses.field(default_factory=dict)
+
+
+def hash_bytes(raw: bytes) -> bytes:
+    """Hash content of the config."""
+    return hashlib.sha256(raw).digest()
+
+
+def hash_file(path: pathlib.Path) -> bytes | None:
+    """Hash content of the file, or return :obj:`None` if it doesn't exist."""
+    try:
+        return hash_bytes(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def save(path: pathlib.Path, snapshot: Snapshot) -> None:
+    """Write the snapshot to the disk.
+
+    File is replaced atomically, so concurrent readers never see half-written snapshot.
+    """
+    settings_blob = marshal.dumps(snapshot.settings)
+    links_blob = marshal.dumps((snapshot.links, snapshot.redirects, snapshot.shards))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, snapshot.config_hash, len(settings_blob))
+
+    with utils.replacing(path) as tmp_path, tmp_path.open("wb") as file:
+        file.write(header)
+        file.write(settings_blob)
+        file.write(links_blob)
+
+
+def load_settings(path: pathlib.Path, config_hash: bytes | None) -> Settings | None:
+    """Load only settings from the snapshot, without decoding the (possibly huge) links table.
+
+    Returns:
+        :obj:`None` if there is no snapshot, or it is outdated/corrupted.
+    """
+    raw = _read(path, config_hash)
+    if raw is None:
+        return None
+
+    settings_size = _HEADER.unpack_from(raw)[4]
+    try:
+        return t.cast(Settings, marshal.loads(raw[_HEADER.size : _HEADER.size + settings_size]))
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def load(path: pathlib.Path, config_hash: bytes | None) -> Snapshot | None:
+    """Load the whole snapshot.
+
+    Returns:
+        :obj:`None` if there is no snapshot, or it is outdated/corrupted.
+    """
+    raw = _read(path, config_hash)
+    if raw is None:
+        return None
+
+    settings_size = _HEADER.unpack_from(raw)[4]
+    view = memoryview(raw)
+    try:
+        settings = marshal.loads(view[_HEADER.size : _HEADER.size + settings_size])
+        links, redirects, shards = marshal.loads(view[_HEADER.size + settings_size :])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    return Snapshot(
+        config_hash=t.cast(bytes, config_hash), settings=settings, links=links, redirects=redirects, shards=shards
+    )
+
+
+def _read(path: pathlib.Path, config_hash: bytes | None) -> bytes | None:
+    """Read the snapshot, and validate its header."""
+    if config_hash is None:
+        return None
+
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+    if len(raw) < _HEADER.size:
+        return None
+    magic, format_version, marshal_version, snapshot_hash, _ = _HEADER.unpack_from(raw)
+    if (magic, format_version, marshal_version, snapshot_hash) != (
+        MAGIC,
+        FORMAT_VERSION,
+        marshal.version,
+        config_hash,
+    ):
+        return None
+
+    return raw
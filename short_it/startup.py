@@ -0,0 +1,30 @@
+"""Startup phases, timed for ``short-it --profile-startup``.
+
+Importing :mod:`short_it.app` has no side effects: config is loaded, the table
+is built and Sentry is started in explicit phases (see :func:`short_it.app.prepare`
+and :func:`short_it.app.lifespan`), which are timed with :func:`phase`.
+"""
+import contextlib
+import time
+import typing as t
+
+PHASES: list[tuple[str, float]] = []
+"""Name and duration (in seconds) of every finished phase, in order."""
+
+
+@contextlib.contextmanager
+def phase(name: str) -> t.Iterator[None]:
+    """Time the phase, and record it in :data:`PHASES`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASES.append((name, time.perf_counter() - start))
+
+
+def report() -> str:
+    """Render durations of all phases, and the total."""
+    width = max([len(name) for name, _ in PHASES] + [len("total")])
+    lines = [f"{name:<{width}} {seconds * 1000:>9.1f} ms" for name, seconds in PHASES]
+    lines.append(f"{'total':<{width}} {sum(seconds for _, seconds in PHASES) * 1000:>9.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,137 @@
+"""Click counters, which don't slow down redirects.
+
+A hit is a single :meth:`collections.deque.append` (atomic, so no locks are
+needed between the event loop and the threadpool). A background thread drains
+the queue every ``stats.flush_interval`` seconds, and adds counts to an SQLite
+database in one transaction. Every worker process adds its own counts to the same
+database, so they are merged there, and survive restarts.
+"""
+import collections
+import contextlib
+import logging
+import pathlib
+import sqlite3
+import threading
+import typing as t
+
+import short_it.config as config_module
+import short_it.utils as utils
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS clicks (path TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID"
+_UPSERT = "INSERT INTO clicks VALUES (?, ?) ON CONFLICT (path) DO UPDATE SET count = count + excluded.count"
+
+
+class ClickCounter(metaclass=utils.Singleton):
+    """Count hits of every alias in memory, and flush them to the database in batches."""
+
+    def __init__(self) -> None:
+        config = config_module.Config()
+        self._enabled = config.stats.enabled
+        self._path = stats_path(config)
+        self._interval = config.stats.flush_interval
+
+        self._pending: collections.deque[str] = collections.deque()
+        self._unsaved: collections.Counter[str] = collections.Counter()  # drained, but failed to write
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def hit(self, path: str) -> None:
+        """Count a redirect, called on the hot path.
+
+        Args:
+            path: Lowercase request path, like ``/project/link_type``.
+        """
+        if self._enabled:
+            self._pending.append(path)
+
+    def start(self) -> None:
+        """Start flushing in the background thread."""
+        if not self._enabled:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="short-it-click-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread, and flush what is left."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._try_flush()
+
+    def flush(self) -> int:
+        """Write counted hits to the database.
+
+        If the write fails, hits are kept in memory and written by the next flush.
+
+        Returns:
+            Amount of written hits.
+        """
+        with self._flush_lock:
+            counts = self._unsaved
+            self._unsaved = collections.Counter()
+            while True:
+                try:
+                    counts[self._pending.popleft()] += 1
+                except IndexError:
+                    break
+
+            if not counts:
+                return 0
+
+            try:
+                with _connect(self._path) as connection:
+                    connection.executemany(_UPSERT, counts.items())
+            except Exception:
+                self._unsaved = counts
+                raise
+            return sum(counts.values())
+
+    def _run(self) -> None:
+        """Main loop of the background thread."""
+        while not self._stop_event.wait(self._interval):
+            self._try_flush()
+
+    def _try_flush(self) -> None:
+        """Flush, and log errors instead of raising them."""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to write click counts to %s, will retry", self._path)
+
+
+def read_counts(path: pathlib.Path, limit: int | None = None) -> list[tuple[str, int]]:
+    """Read counts, flushed by all workers.
+
+    Returns:
+        Paths and their counts, the most clicked first.
+    """
+    if not path.exists():
+        return []
+
+    with _connect(path) as connection:
+        rows = connection.execute("SELECT path, count FROM clicks ORDER BY count DESC, path LIMIT ?", (limit or -1,))
+        return [(row[0], row[1]) for row in rows]
+
+
+def stats_path(config: config_module.Config) -> pathlib.Path:
+    """Path to the counts database, relative to the data directory."""
+    return config_module.DATA_DIR / config.stats.path
+
+
+@contextlib.contextmanager
+def _connect(path: pathlib.Path) -> t.Iterator[sqlite3.Connection]:
+    """Open the database in a transaction, it is shared by all workers (hence WAL, and waiting for locks)."""
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(_SCHEMA)
+            yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,479 @@
+"""Link stores, which hold the lookup table behind :meth:`~short_it.parse_config.ParseConfigToMachineData.get_url`.
+
+A store is any :class:`~collections.abc.Mapping` of project name to either a
+destination (simple link) or a mapping of link type to destination (project link).
+So a plain :class:`dict` (built from YAML, see ``memory`` backend) is a store,
+and :class:`SQLiteLinkStore` is the alternative for millions of links: it is a
+read-only, memory-mapped SQLite database, so the table lives in the page cache
+instead of Python objects, and startup doesn't need to parse anything.
+:class:`MmapLinkStore` is the same idea, but lookups skip SQL completely: it is
+a minimal perfect hash over a memory-mapped file, shared by all worker processes.
+"""
+import array
+import collections.abc
+import hashlib
+import mmap
+import os
+import pathlib
+import sqlite3
+import struct
+import sys
+import threading
+import typing as t
+import weakref
+
+import short_it.utils as utils
+
+LinkStore: t.TypeAlias = t.Mapping[str, str | t.Mapping[str, str]]
+
+SQLITE_MMAP_SIZE = 1 << 30  # 1 GiB of address space, pages are loaded lazily
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value BLOB) WITHOUT ROWID;
+CREATE TABLE destinations (id INTEGER PRIMARY KEY, url TEXT NOT NULL);
+CREATE TABLE projects (name TEXT PRIMARY KEY, destination_id INTEGER) WITHOUT ROWID;
+CREATE TABLE links (
+    project TEXT NOT NULL,
+    link_type TEXT NOT NULL,
+    destination_id INTEGER NOT NULL,
+    PRIMARY KEY (project, link_type)
+) WITHOUT ROWID;
+"""
+# `projects.destination_id` is set for simple links, and is NULL for project links
+
+
+def build_sqlite(path: pathlib.Path, data: LinkStore, config_hash: bytes | None) -> None:
+    """Write the table into a new SQLite database.
+
+    The database is built next to the target and then atomically renamed, so
+    running servers keep reading the old file until they reopen it.
+
+    Args:
+        path: Where to write the database.
+        data: The table to write.
+        config_hash: Hash of ``config.yml`` the table was built from, see :meth:`SQLiteLinkStore.config_hash`.
+    """
+    with utils.replacing(path) as tmp_path:
+        _write_sqlite(tmp_path, data, config_hash)
+
+
+def _write_sqlite(path: pathlib.Path, data: LinkStore, config_hash: bytes | None) -> None:
+    """Write the table into the empty database, see :func:`build_sqlite`."""
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(_SCHEMA)
+        connection.execute("INSERT INTO meta VALUES ('config_hash', ?)", (config_hash,))
+
+        destination_ids: dict[str, int] = {}
+
+        def destination_id(url: str) -> int:
+            if url not in destination_ids:
+                destination_ids[url] = len(destination_ids)
+                connection.execute("INSERT INTO destinations VALUES (?, ?)", (destination_ids[url], url))
+            return destination_ids[url]
+
+        for project_name, project_links in data.items():
+            if isinstance(project_links, str):
+                connection.execute("INSERT INTO projects VALUES (?, ?)", (project_name, destination_id(project_links)))
+                continue
+
+            connection.execute("INSERT INTO projects VALUES (?, NULL)", (project_name,))
+            connection.executemany(
+                "INSERT INTO links VALUES (?, ?, ?)",
+                [(project_name, link_type, destination_id(url)) for link_type, url in project_links.items()],
+            )
+
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class SQLiteLinkStore(collections.abc.Mapping[str, str | t.Mapping[str, str]]):
+    """Read-only link store, backed by an SQLite database from :func:`build_sqlite`.
+
+    Every thread gets its own connection, opened in immutable mode with ``mmap``
+    enabled, so lookups don't take any locks and read straight from the page cache.
+    Connections are never shared with forked processes (see :mod:`short_it.server`).
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._len: int | None = None
+        _open_stores[id(self)] = self
+
+    @classmethod
+    def open_if_fresh(cls, path: pathlib.Path, config_hash: bytes | None) -> t.Optional["SQLiteLinkStore"]:
+        """Open the database, if it was built from the config with this hash.
+
+        Returns:
+            :obj:`None` if there is no database, or it is outdated.
+        """
+        if not path.exists():
+            return None
+
+        store = cls(path)
+        if store.config_hash() != config_hash:
+            return None
+        return store
+
+    def config_hash(self) -> bytes | None:
+        """Hash of ``config.yml`` the database was built from."""
+        row = self._execute("SELECT value FROM meta WHERE key = 'config_hash'").fetchone()
+        return None if row is None else t.cast(bytes | None, row[0])
+
+    def __getitem__(self, project_name: str) -> str | t.Mapping[str, str]:
+        """Get the destination of simple link, or links of the project."""
+        row = self._execute(
+            "SELECT d.url FROM projects p LEFT JOIN destinations d ON d.id = p.destination_id WHERE p.name = ?",
+            (project_name,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(project_name)
+        if row[0] is not None:
+            return t.cast(str, row[0])
+        return SQLiteProjectLinks(self, project_name)
+
+    def __iter__(self) -> t.Iterator[str]:
+        """Iterate over names of all projects and simple links."""
+        for (name,) in self._execute("SELECT name FROM projects"):
+            yield name
+
+    def __len__(self) -> int:
+        """Amount of projects and simple links."""
+        if self._len is None:
+            self._len = t.cast(int, self._execute("SELECT count(*) FROM projects").fetchone()[0])
+        return self._len
+
+    def _execute(self, query: str, parameters: tuple[str, ...] = ()) -> sqlite3.Cursor:
+        """Execute the query with the connection of the current thread."""
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                f"{self._path.absolute().as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False
+            )
+            connection.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+            self._local.connection = connection
+        return connection.execute(query, parameters)
+
+
+_open_stores: "weakref.WeakValueDictionary[int, SQLiteLinkStore]" = (
+    weakref.WeakValueDictionary()
+)  # mappings are unhashable
+
+
+def _forget_connections() -> None:
+    """Forget connections in the forked process, SQLite connections must not be shared after fork."""
+    for store in _open_stores.values():
+        store._local = threading.local()
+
+
+os.register_at_fork(after_in_child=_forget_connections)
+
+
+class SQLiteProjectLinks(collections.abc.Mapping[str, str]):
+    """Links of one project in :class:`SQLiteLinkStore`, they are fetched lazily."""
+
+    def __init__(self, store: SQLiteLinkStore, project_name: str) -> None:
+        self._store = store
+        self._project_name = project_name
+
+    def __getitem__(self, link_type: str) -> str:
+        """Get destination of the link."""
+        row = self._store._execute(
+            "SELECT d.url FROM links l JOIN destinations d ON d.id = l.destination_id"
+            " WHERE l.project = ? AND l.link_type = ?",
+            (self._project_name, link_type),
+        ).fetchone()
+        if row is None:
+            raise KeyError(link_type)
+        return t.cast(str, row[0])
+
+    def __iter__(self) -> t.Iterator[str]:
+        """Iterate over all link types (including aliases) of the project."""
+        for (link_type,) in self._store._execute(
+            "SELECT link_type FROM links WHERE project = ?", (self._project_name,)
+        ):
+            yield link_type
+
+    def __len__(self) -> int:
+        """Amount of link types (including aliases) in the project."""
+        return t.cast(
+            int,
+            self._store._execute("SELECT count(*) FROM links WHERE project = ?", (self._project_name,)).fetchone()[0],
+        )
+
+
+# `mmap` backend
+#
+# File layout (integers are native-endian, sections are 8-byte aligned):
+#   header   see `_MMAP_HEADER`
+#   seeds    int32[buckets]   perfect hash displacement of every bucket, see `_slot`
+#   order    uint32[keys]     slot -> entry index
+#   entries  uint32[keys, 5]  (key offset, key length, kind, a, b), see `_KIND_*`
+#   blob     UTF-8 keys and (deduplicated) destinations
+_MMAP_MAGIC = b"shortidx"
+_MMAP_FORMAT_VERSION = 1
+_MMAP_HEADER = struct.Struct("<8sHc32sxIII")
+#                                   ^^^       ^^^
+#                        version, byteorder   keys, buckets, projects
+_KIND_SIMPLE = 0  # a, b = offset and length of the destination
+_KIND_PROJECT = 1  # a, b = first entry and amount of its links (they are stored right after it)
+_KIND_LINK = 2  # a, b = offset and length of the destination; key is `project\0link_type`
+_ENTRY_SIZE = 5
+_MASK_64 = (1 << 64) - 1
+
+
+def build_mmap(path: pathlib.Path, data: LinkStore, config_hash: bytes | None) -> None:
+    """Write the table into a new memory-mapped index, see :class:`MmapLinkStore`.
+
+    Like :func:`build_sqlite`, the index is written next to the target and then
+    atomically renamed.
+
+    Args:
+        path: Where to write the index.
+        data: The table to write.
+        config_hash: Hash of ``config.yml`` the table was built from, see :meth:`MmapLinkStore.config_hash`.
+    """
+    blob = bytearray()
+    destinations: dict[str, tuple[int, int]] = {}
+    keys: list[bytes] = []
+    entries = array.array("I")
+
+    def add_string(value: bytes) -> tuple[int, int]:
+        blob.extend(value)
+        return len(blob) - len(value), len(value)
+
+    def add_destination(url: str) -> tuple[int, int]:
+        if url not in destinations:
+            destinations[url] = add_string(url.encode())
+        return destinations[url]
+
+    def add_entry(key: bytes, kind: int, a: int, b: int) -> None:
+        keys.append(key)
+        entries.extend((*add_string(key), kind, a, b))
+
+    for project_name, project_links in data.items():
+        if isinstance(project_links, str):
+            add_entry(project_name.encode(), _KIND_SIMPLE, *add_destination(project_links))
+            continue
+
+        add_entry(project_name.encode(), _KIND_PROJECT, len(keys) + 1, len(project_links))
+        for link_type, url in project_links.items():
+            add_entry(project_name.encode() + b"\0" + link_type.encode(), _KIND_LINK, *add_destination(url))
+
+    seeds, order = _build_perfect_hash(keys)
+    header = _MMAP_HEADER.pack(
+        _MMAP_MAGIC,
+        _MMAP_FORMAT_VERSION,
+        sys.byteorder[0].encode(),
+        config_hash or b"",
+        len(keys),
+        len(seeds),
+        len(data),
+    )
+
+    with utils.replacing(path) as tmp_path, tmp_path.open("wb") as file:
+        for section in (header, seeds.tobytes(), order.tobytes(), entries.tobytes(), bytes(blob)):
+            file.write(section)
+            file.write(b"\0" * (-len(section) % 8))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _build_perfect_hash(keys: list[bytes]) -> tuple["array.array[int]", "array.array[int]"]:
+    """Build a minimal perfect hash with "hash and displace" algorithm.
+
+    Keys are split into buckets by their hash, and then (biggest buckets first)
+    for every bucket we look for a seed, which puts all its keys into free slots.
+    Buckets with a single key are put directly into any free slot, that is stored
+    as a negative seed.
+
+    Returns:
+        Seeds for every bucket, and entry index for every slot.
+    """
+    buckets_count = max(len(keys), 1)
+    hashes = [_hash(key) for key in keys]
+    buckets: list[list[int]] = [[] for _ in range(buckets_count)]
+    for index, key_hash in enumerate(hashes):
+        buckets[key_hash % buckets_count].append(index)
+
+    seeds = array.array("i", bytes(4 * buckets_count))
+    order = array.array("I", bytes(4 * len(keys)))
+    taken = bytearray(len(keys))
+
+    bucket_indexes = sorted(range(buckets_count), key=lambda i: len(buckets[i]), reverse=True)
+    free_slots = iter(range(len(keys)))
+    for bucket_index in bucket_indexes:
+        bucket = buckets[bucket_index]
+        if not bucket:
+            break
+
+        if len(bucket) == 1:
+            slot = next(slot for slot in free_slots if not taken[slot])
+            seeds[bucket_index] = -slot - 1
+            taken[slot] = 1
+            order[slot] = bucket[0]
+            continue
+
+        if len({hashes[index] for index in bucket}) != len(bucket):
+            raise ValueError("Hash collision, can't build a perfect hash")
+        seed = 1
+        while True:
+            slots = [_slot(hashes[index], seed, len(keys)) for index in bucket]
+            if len(set(slots)) == len(slots) and not any(taken[slot] for slot in slots):
+                break
+            seed += 1
+
+        seeds[bucket_index] = seed
+        for index, slot in zip(bucket, slots):
+            taken[slot] = 1
+            order[slot] = index
+
+    return seeds, order
+
+
+def _hash(key: bytes) -> int:
+    """Stable (unlike :func:`hash`) 64-bit hash of the key."""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _slot(key_hash: int, seed: int, slots_count: int) -> int:
+    """Slot of the key for this seed, hash is mixed with SplitMix64 finalizer."""
+    x = (key_hash + seed * 0x9E3779B97F4A7C15) & _MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return (x ^ (x >> 31)) % slots_count
+
+
+class MmapLinkStore(collections.abc.Mapping[str, str | t.Mapping[str, str]]):
+    """Read-only link store, backed by a memory-mapped index from :func:`build_mmap`.
+
+    Lookup is a minimal perfect hash over project names and ``project``, NUL, ``link_type``
+    keys, and everything is read straight from the mapping. So there are no
+    per-key Python objects, and all worker processes share the same pages of
+    the page cache, no matter how many links there are.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        with path.open("rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, version, byteorder, self._config_hash, keys_count, buckets_count, self._len = _MMAP_HEADER.unpack_from(
+            view
+        )
+        if magic != _MMAP_MAGIC or version != _MMAP_FORMAT_VERSION or byteorder != sys.byteorder[0].encode():
+            raise ValueError(f"{path} is not a compatible index")
+
+        offset = _align(_MMAP_HEADER.size)
+        self._seeds = view[offset : offset + 4 * buckets_count].cast("i")
+        offset = _align(offset + 4 * buckets_count)
+        self._order = view[offset : offset + 4 * keys_count].cast("I")
+        offset = _align(offset + 4 * keys_count)
+        self._entries = view[offset : offset + 4 * _ENTRY_SIZE * keys_count].cast("I")
+        self._blob = view[_align(offset + 4 * _ENTRY_SIZE * keys_count) :]
+        self._keys_count = keys_count
+        self._buckets_count = buckets_count
+
+    @classmethod
+    def open_if_fresh(cls, path: pathlib.Path, config_hash: bytes | None) -> t.Optional["MmapLinkStore"]:
+        """Open the index, if it was built from the config with this hash.
+
+        Returns:
+            :obj:`None` if there is no index, it is outdated, or written by another version.
+        """
+        try:
+            store = cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+        if store.config_hash() != config_hash:
+            return None
+        return store
+
+    def config_hash(self) -> bytes | None:
+        """Hash of ``config.yml`` the index was built from."""
+        return None if self._config_hash == bytes(32) else t.cast(bytes, self._config_hash)
+
+    def __getitem__(self, project_name: str) -> str | t.Mapping[str, str]:
+        """Get the destination of simple link, or links of the project."""
+        key = project_name.encode()
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(project_name)
+
+        kind, a, b = self._entries[entry + 2 : entry + 5]
+        if kind == _KIND_SIMPLE:
+            return str(self._blob[a : a + b], "utf-8")
+        if kind == _KIND_PROJECT:
+            return MmapProjectLinks(self, key, a, b)
+        raise KeyError(project_name)
+
+    def __iter__(self) -> t.Iterator[str]:
+        """Iterate over names of all projects and simple links."""
+        for entry in range(0, self._keys_count * _ENTRY_SIZE, _ENTRY_SIZE):
+            if self._entries[entry + 2] != _KIND_LINK:
+                yield self._key(entry)
+
+    def __len__(self) -> int:
+        """Amount of projects and simple links."""
+        return t.cast(int, self._len)
+
+    def _find(self, key: bytes) -> int | None:
+        """Find the entry by the key.
+
+        Returns:
+            Offset of the entry in the entries table, or :obj:`None` if there is no such key.
+        """
+        if not self._keys_count:
+            return None
+
+        key_hash = _hash(key)
+        seed = self._seeds[key_hash % self._buckets_count]
+        if seed == 0:
+            return None
+        slot = -seed - 1 if seed < 0 else _slot(key_hash, seed, self._keys_count)
+
+        entry = self._order[slot] * _ENTRY_SIZE
+        key_offset = self._entries[entry]
+        if self._blob[key_offset : key_offset + self._entries[entry + 1]] != key:
+            return None
+        return entry
+
+    def _key(self, entry: int, skip: int = 0) -> str:
+        """Decode the key of the entry, without first ``skip`` bytes."""
+        key_offset, key_length = self._entries[entry : entry + 2]
+        return str(self._blob[key_offset + skip : key_offset + key_length], "utf-8")
+
+
+class MmapProjectLinks(collections.abc.Mapping[str, str]):
+    """Links of one project in :class:`MmapLinkStore`."""
+
+    def __init__(self, store: MmapLinkStore, project_name: bytes, first_entry: int, links_count: int) -> None:
+        self._store = store
+        self._prefix = project_name + b"\0"
+        self._first_entry = first_entry
+        self._links_count = links_count
+
+    def __getitem__(self, link_type: str) -> str:
+        """Get destination of the link."""
+        entry = self._store._find(self._prefix + link_type.encode())
+        if entry is None:
+            raise KeyError(link_type)
+
+        a, b = self._store._entries[entry + 3 : entry + 5]
+        return str(self._store._blob[a : a + b], "utf-8")
+
+    def __iter__(self) -> t.Iterator[str]:
+        """Iterate over all link types (including aliases) of the project."""
+        for index in range(self._first_entry, self._first_entry + self._links_count):
+            yield self._store._key(index * _ENTRY_SIZE, skip=len(self._prefix))
+
+    def __len__(self) -> int:
+        """Amount of link types (including aliases) in the project."""
+        return self._links_count
+
+
+def _align(offset: int) -> int:
+    """Round the offset up to 8 bytes."""
+    return offset + (-offset % 8)
@@ -0,0 +1,175 @@
+"""Fuzzy "did you mean" suggestions for the 404 page.
+
+Comparing a mistyped name with every alias is too slow for big configs, so
+project names are put into a trigram index at parse time. On a miss, only names
+which share trigrams with the request are ranked by edit distance. Link types of
+one project are few, so they are compared directly.
+"""
+import array
+import collections
+import threading
+import typing as t
+
+import short_it.responses as responses
+import short_it.stores as stores
+
+# trigrams, which are in more names than this, don't narrow down the search and only slow it down
+MAX_POSTINGS = 1000
+CANDIDATES = 20
+
+
+class SuggestionIndex:
+    """Trigram index over project names (and simple links) of one link table.
+
+    The index is built explicitly with :meth:`build` (which is done at parse time
+    for tables in memory, and before forking workers). Otherwise, the first miss
+    starts building it in a background thread, as it walks the whole store and
+    would block the event loop, and nothing is suggested until it is ready.
+    """
+
+    def __init__(self, data: stores.LinkStore, limit: int = 3, max_distance: int = 2) -> None:
+        self._data = data
+        self._limit = limit
+        self._max_distance = max_distance
+        self._lock = threading.Lock()
+        self._names: list[str] | None = None
+        self._postings: dict[str, "array.array[int]"] = {}
+        self._builder: threading.Thread | None = None
+        self._builder_lock = threading.Lock()
+
+    def build(self) -> None:
+        """Build the trigram index, if it is not built yet."""
+        with self._lock:
+            if self._names is not None:
+                return
+
+            names = [name for name in self._data if responses.is_routable(name)]
+            postings: dict[str, list[int]] = collections.defaultdict(list)
+            for index, name in enumerate(names):
+                for trigram in _trigrams(name):
+                    postings[trigram].append(index)
+
+            self._postings = {trigram: array.array("I", indexes) for trigram, indexes in postings.items()}
+            self._names = names
+
+    def add(self, name: str) -> None:
+        """Add a new project name to the index, if it is built already.
+
+        Removed names don't have to be removed from the index, they are skipped,
+        because they are not in the table anymore.
+        """
+        with self._lock:
+            if self._names is None or not responses.is_routable(name):
+                return
+
+            index = len(self._names)
+            self._names.append(name)
+            for trigram in _trigrams(name):
+                self._postings.setdefault(trigram, array.array("I")).append(index)
+
+    def suggest(self, project_name: str, link_type: str | None) -> list[str]:
+        """Find paths, which resolve to a link and are the closest to the requested one.
+
+        Args:
+            project_name: Requested project name (or simple link), lowercase.
+            link_type: Requested link type, lowercase.
+
+        Returns:
+            Up to ``limit`` paths (like ``/project/link_type``), the closest first.
+        """
+        suggestions: list[tuple[int, str]] = []
+        #                       ^^^  ^^^
+        #                  distance  path
+
+        for distance, name in self._close_names(project_name):
+            project_links = self._data.get(name)
+            if project_links is None:
+                continue
+
+            if isinstance(project_links, str):
+                if link_type is None:
+                    suggestions.append((distance, f"/{name}"))
+                continue
+
+            if link_type is None:
+                # one alias for every destination of the project
+                first_aliases: dict[str, str] = {}
+                for alias, destination in project_links.items():
+                    if responses.is_routable(alias):
+                        first_aliases.setdefault(destination, alias)
+                suggestions.extend((distance, f"/{name}/{alias}") for alias in first_aliases.values())
+                continue
+
+            routable_aliases = (alias for alias in project_links if responses.is_routable(alias))
+            for link_distance, alias in _closest(link_type, routable_aliases, self._max_distance):
+                suggestions.append((distance + link_distance, f"/{name}/{alias}"))
+
+        suggestions.sort()
+        return list(dict.fromkeys(path for _, path in suggestions))[: self._limit]
+
+    def _close_names(self, project_name: str) -> list[tuple[int, str]]:
+        """Project names within ``max_distance`` from the requested one, the requested one itself included."""
+        if responses.is_routable(project_name) and project_name in self._data:
+            return [(0, project_name)]
+
+        names = self._names
+        if names is None:
+            self._build_in_background()
+            return []
+
+        counter: collections.Counter[int] = collections.Counter()
+        for trigram in _trigrams(project_name):
+            indexes = self._postings.get(trigram)
+            if indexes is not None and len(indexes) <= MAX_POSTINGS:
+                counter.update(indexes)
+
+        return _closest(
+            project_name, [names[index] for index, _ in counter.most_common(CANDIDATES)], self._max_distance
+        )
+
+    def _build_in_background(self) -> None:
+        """Start building the index in a background thread, if it is not started yet."""
+        with self._builder_lock:
+            if self._builder is None:
+                self._builder = threading.Thread(target=self.build, name="short-it-suggestions", daemon=True)
+                self._builder.start()
+
+
+def _trigrams(name: str) -> set[str]:
+    """Trigrams of the name, padded with spaces so the beginning and the end are weighted more."""
+    padded = f" {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _closest(query: str, candidates: t.Iterable[str], max_distance: int) -> list[tuple[int, str]]:
+    """Candidates within ``max_distance`` from the query, sorted by distance."""
+    result = []
+    for candidate in candidates:
+        if abs(len(candidate) - len(query)) > max_distance:
+            continue
+        distance = levenshtein(query, candidate, max_distance)
+        if distance <= max_distance:
+            result.append((distance, candidate))
+    return sorted(result)
+
+
+def levenshtein(a: str, b: str, max_distance: int | None = None) -> int:
+    """Edit distance between two strings, with insertions, deletions and substitutions.
+
+    Args:
+        a: First string.
+        b: Second string.
+        max_distance: Stop early, and return ``max_distance + 1``, as soon as the distance is known to be bigger.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
@@ -1,9 +1,11 @@
 """Module for some useful utils."""
+import contextlib
 import os
 import pathlib
+import tempfile
 import typing as t
 
-import sentry_sdk
+import short_it.sampling as sampling
 
 
 class Singleton(type):
@@ -26,6 +28,24 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+@contextlib.contextmanager
+def replacing(path: pathlib.Path) -> t.Iterator[pathlib.Path]:
+    """Path of a new empty file next to ``path``, which atomically replaces it, if the block succeeds.
+
+    Every call gets its own file, so workers, which rebuild the same file at the
+    same time, don't touch files of each other. It is removed on errors.
+    """
+    fd, tmp_name = tempfile.mkstemp(".tmp", path.name + ".", path.parent)
+    os.fchmod(fd, 0o644)
+    os.close(fd)
+    tmp_path = pathlib.Path(tmp_name)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
 def start_sentry() -> None:
     """Start Sentry listening."""
     # circular imports
@@ -36,14 +56,19 @@ def start_sentry() -> None:
     if not config.sentry.enabled:
         return
 
+    import sentry_sdk  # slow to import, and not needed without Sentry
+
     sentry_sdk.init(
         dsn=config.sentry.dsn,
-        traces_sample_rate=config.sentry.traces_sample_rate,
+        traces_sampler=sampling.TracesSampler(
+            config.sentry.traces_sample_rate,
+            config.sentry.route_sample_rates,
+            config.sentry.max_traces_per_second,
+        ),
+        profiles_sample_rate=config.sentry.profiles_sample_rate,
+        sample_rate=1.0,  # errors
         release=_get_commit(BASE_DIR / "commit.txt"),
         environment=os.environ.get("SENTRY_ENVIRONMENT", "development"),
-        _experiments={
-            "profiles_sample_rate": 1.0,
-        },
     )
 
 
@@ -0,0 +1,89 @@
+"""Watch ``config.yml`` (and shards in ``config.d``) for changes and hot-reload the lookup table."""
+import logging
+import pathlib
+import threading
+
+import short_it.parse_config as parse_config
+import short_it.shards as shards
+import short_it.snapshot as snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWatcher:
+    """Poll the config file and reload :class:`~short_it.parse_config.ParseConfigToMachineData` on change.
+
+    Polling is used instead of inotify & co, so it works everywhere (including
+    Docker volumes). Cheap ``stat`` call is done on every tick, and the file is
+    hashed only if its ``mtime`` or size changed. So ``touch config.yml`` doesn't
+    trigger a reload. Files in the shards directory are checked in the same way,
+    including new and deleted ones.
+    """
+
+    def __init__(self, config_path: pathlib.Path, interval: float, shards_dir: pathlib.Path | None = None) -> None:
+        self._config_path = config_path
+        self._shards_dir = shards_dir
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._last_stat = self._stat()
+        self._last_hash = self._hash()
+
+    def start(self) -> None:
+        """Start watching in the background thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="short-it-config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching and wait for the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self) -> bool:
+        """Check the file once, and reload the table if its content was changed.
+
+        Returns:
+            :obj:`True` if the new table was published, :obj:`False` otherwise.
+        """
+        stat = self._stat()
+        if stat is None or stat == self._last_stat:
+            return False
+        self._last_stat = stat
+
+        content_hash = self._hash()
+        if content_hash is None or content_hash == self._last_hash:
+            return False
+        # remember the hash even if reload fails, so we don't spam the same error every tick
+        self._last_hash = content_hash
+
+        try:
+            parse_config.ParseConfigToMachineData().reload()
+        except Exception:
+            logger.exception("Failed to reload %s, keeping the old links", self._config_path)
+            return False
+
+        logger.info("Reloaded links from %s", self._config_path)
+        return True
+
+    def _run(self) -> None:
+        """Main loop of the background thread."""
+        while not self._stop_event.wait(self._interval):
+            self.check()
+
+    def _stat(self) -> tuple[int, int, tuple[tuple[str, int, int], ...]] | None:
+        """Get ``mtime`` and size of the file (and all shards), or :obj:`None` if it doesn't exist (e.g. in the middle of save)."""
+        try:
+            stat = self._config_path.stat()
+        except FileNotFoundError:
+            return None
+        shard_stats = shards.stat_files(self._shards_dir) if self._shards_dir is not None else ()
+        return stat.st_mtime_ns, stat.st_size, shard_stats
+
+    def _hash(self) -> bytes | None:
+        """Hash content of the file (and all shards)."""
+        shard_hashes = shards.hash_files(self._shards_dir) if self._shards_dir is not None else {}
+        return shards.combined_hash(snapshot.hash_file(self._config_path), shard_hashes)
@@ -1,11 +1,21 @@
 """Tests for :mod:`short_it.app` module."""
+import json
+import pathlib
+import typing as t
+import unittest.mock
+
 import fastapi
+import fastapi.testclient
 import pytest
 from faker import Faker
 from pytest_mock import MockerFixture
 
 import short_it.app
+import short_it.config
 import short_it.exc
+import short_it.parse_config
+import short_it.reverse_index
+import short_it.utils
 
 
 class TestMainLogic:
@@ -17,6 +27,7 @@ class TestMainLogic:
         mocked = mocker.patch("short_it.app.parse_config.ParseConfigToMachineData").return_value
         mocked_redirect_response = mocker.patch("fastapi.responses.RedirectResponse")
         mocked.get_url.return_value = faker.uri()
+        mocked.get_redirect_options.return_value = (307, None)
         project_name, link_type = faker.word(), None if link_type_is_none else faker.word()
 
         assert (
@@ -24,13 +35,26 @@ class TestMainLogic:
         )
 
         mocked.get_url.assert_called_once_with(project_name, link_type)
-        mocked_redirect_response.assert_called_once_with(url=mocked.get_url.return_value)
+        mocked.get_redirect_options.assert_called_once_with(project_name, link_type)
+        mocked_redirect_response.assert_called_once_with(url=mocked.get_url.return_value, status_code=307, headers=None)
+
+    def test_cacheable(self, mocker: MockerFixture, faker: Faker) -> None:
+        """Test that the redirect has status and ``Cache-Control`` of the link."""
+        mocked = mocker.patch("short_it.app.parse_config.ParseConfigToMachineData").return_value
+        mocked.get_url.return_value = faker.uri()
+        mocked.get_redirect_options.return_value = (301, 3600)
+
+        response = short_it.app.find_and_redirect_to_the_link(faker.word(), faker.word())
+
+        assert response.status_code == 301
+        assert response.headers["cache-control"] == "public, max-age=3600"
 
     @pytest.mark.parametrize("link_type_is_none", [True, False])
     def test_not_found(self, mocker: MockerFixture, faker: Faker, link_type_is_none: bool) -> None:
         """Test for the case when something is not found."""
         mocked = mocker.patch("short_it.app.parse_config.ParseConfigToMachineData").return_value
         mocked.get_url.return_value = None
+        mocked.match_route.return_value = None
         project_name, link_type = faker.word(), None if link_type_is_none else faker.word()
 
         with pytest.raises(fastapi.HTTPException) as exception:
@@ -63,13 +87,240 @@ class TestRoutes:
     def test_project_route(self, mocker: MockerFixture, faker: Faker) -> None:
         """Test for the project link route."""
         mocked = mocker.patch("short_it.app.find_and_redirect_to_the_link")
-        project_name, link_type = faker.word(), faker.word()
-        assert short_it.app.route_project_link(project_name, link_type) == mocked.return_value
-        mocked.assert_called_once_with(project_name, link_type)
+        project_name, link_type, request = faker.word(), faker.word(), _request(b"a=1")
+        assert short_it.app.route_project_link(project_name, link_type, request) == mocked.return_value
+        mocked.assert_called_once_with(project_name, link_type, b"a=1")
 
     def test_simple_route(self, mocker: MockerFixture, faker: Faker) -> None:
         """Test for the simple link route."""
         mocked = mocker.patch("short_it.app.find_and_redirect_to_the_link")
         link_type = faker.word()
-        assert short_it.app.route_simple_link(link_type) == mocked.return_value
-        mocked.assert_called_once_with(link_type, None)
+        assert short_it.app.route_simple_link(link_type, _request()) == mocked.return_value
+        mocked.assert_called_once_with(link_type, None, b"")
+
+
+def _request(query_string: bytes = b"") -> fastapi.Request:
+    """Request with the query string."""
+    return fastapi.Request({"type": "http", "query_string": query_string, "headers": []})
+
+
+class TestTemplatedLinks:
+    """Tests for templated links, with and without the fast path."""
+
+    @pytest.fixture(params=[True, False], ids=["fast_path", "fastapi"])
+    def client(
+        self, request: pytest.FixtureRequest, mocker: MockerFixture, tmp_path: pathlib.Path
+    ) -> fastapi.testclient.TestClient:
+        """Client without lifespan, with a real table."""
+        mocker.patch("short_it.config.DATA_DIR", tmp_path)
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch("short_it.config.SHARDS_DIR", tmp_path / "config.d")
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+        short_it.config.CONFIG_PATH.write_text(
+            "simple:\n  site: https://perchun.it\n"
+            "routes:\n  /site/{page}: https://perchun.it/{page}\n  /wiki/*: https://docs.example.com/\n"
+            f"server:\n  fast_path: {str(request.param).lower()}\n"
+        )
+        mocker.patch.object(short_it.app.app, "middleware_stack", None)  # rebuild with the new config
+        return fastapi.testclient.TestClient(short_it.app.app)
+
+    @pytest.mark.parametrize(
+        ("path", "location"),
+        [
+            ("/site", "https://perchun.it"),
+            ("/site/About", "https://perchun.it/About"),
+            ("/wiki", "https://docs.example.com/"),
+            ("/wiki/a/b/?q=1", "https://docs.example.com/a/b/?q=1"),
+        ],
+    )
+    def test_redirect(self, client: fastapi.testclient.TestClient, path: str, location: str) -> None:
+        """Test that exact links and templated links are redirected the same way on both paths."""
+        response = client.get(path, follow_redirects=False)
+
+        assert (response.status_code, response.headers["location"]) == (307, location)
+
+    @pytest.mark.parametrize("path", ["/site", "/site/About", "/wiki/a/b/?q=1", "/site/a/b", "/missing"])
+    def test_head(self, client: fastapi.testclient.TestClient, path: str) -> None:
+        """Test that ``HEAD`` is answered like ``GET`` on both paths, e.g. for link checkers."""
+        get = client.get(path, follow_redirects=False)
+        head = client.head(path, follow_redirects=False)
+
+        assert (head.status_code, head.headers.get("location")) == (get.status_code, get.headers.get("location"))
+        assert head.content == b""
+
+    def test_not_found(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that paths, which no template matches, are still 404."""
+        assert client.get("/site/a/b", follow_redirects=False).status_code == 404
+        assert client.get("/-/wiki", follow_redirects=False).status_code == 404
+
+    def test_counted(self, mocker: MockerFixture, client: fastapi.testclient.TestClient) -> None:
+        """Test that clicks are counted for the pattern, not for every path."""
+        mocked_counter = mocker.patch("short_it.stats.ClickCounter").return_value
+
+        client.get("/site/about", follow_redirects=False)
+        client.get("/wiki/api", follow_redirects=False)
+
+        assert [call.args for call in mocked_counter.hit.call_args_list] == [("/site/{page}",), ("/wiki/*",)]
+
+
+class TestFindLinks:
+    """Tests for the endpoint, which finds links by their destinations."""
+
+    @pytest.fixture
+    def client(self, mocker: MockerFixture) -> fastapi.testclient.TestClient:
+        """Client without lifespan, with a table, where two links redirect to one destination."""
+        table = mocker.patch("short_it.app.parse_config.ParseConfigToMachineData").return_value
+        table.get_response.return_value = None  # service paths are not served by the fast path
+        table.find_links.side_effect = short_it.reverse_index.ReverseIndex(
+            {"site": "https://perchun.it", "me": {"site": "https://perchun.it"}}
+        ).query
+        return fastapi.testclient.TestClient(short_it.app.app)
+
+    def test_found(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that destinations are listed with paths of their links."""
+        expected = [{"to": "https://perchun.it", "paths": ["/site", "/me/site"]}]
+
+        assert client.get("/-/links", params={"to": "https://perchun.it"}).json() == expected
+        assert client.get("/-/links", params={"host": "perchun.it"}).json() == expected
+        assert client.get("/-/links", params={"duplicates": "true"}).json() == expected
+        assert client.get("/-/links", params={"prefix": "http://"}).json() == []
+
+    def test_invalid_query(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that exactly one kind of query must be set."""
+        response = client.get("/-/links", params={"to": "https://perchun.it", "prefix": "https://"})
+
+        assert response.status_code == 422
+        assert response.json() == {"detail": "Set exactly one of 'to', 'prefix', 'host' and 'duplicates'"}
+
+
+class TestResolve:
+    """Tests for the batch resolve endpoint."""
+
+    @pytest.fixture
+    def client(self, mocker: MockerFixture, faker: Faker) -> fastapi.testclient.TestClient:
+        """Client without lifespan, with a table, where only ``site`` exists."""
+        mocker.patch(
+            "short_it.app.parse_config.ParseConfigToMachineData"
+        ).return_value.resolve_many.side_effect = lambda slugs: (
+            short_it.parse_config.Resolution(slug, to="https://perchun.it")
+            if slug == "site"
+            else short_it.parse_config.Resolution(slug, error="not_found", detail="There is no such link")
+            for slug in slugs
+        )
+        mocker.patch("short_it.app._NDJSON_CHUNK", 2)
+        return fastapi.testclient.TestClient(short_it.app.app)
+
+    def test_json(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that all results are returned in one JSON document by default."""
+        response = client.post("/-/resolve", json=["site", "missing"])
+
+        assert response.json() == {
+            "results": [
+                {"slug": "site", "to": "https://perchun.it"},
+                {"slug": "missing", "error": "not_found", "detail": "There is no such link"},
+            ]
+        }
+
+    def test_ndjson(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that results are streamed one per line, if the client accepts NDJSON."""
+        slugs = ["site", "missing", "site", "other", "site"]
+
+        response = client.post("/-/resolve", json=slugs, headers={"Accept": "application/x-ndjson"})
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["slug"] for line in lines] == slugs
+        assert lines[3] == {"slug": "other", "error": "not_found", "detail": "There is no such link"}
+
+    def test_invalid_body(self, client: fastapi.testclient.TestClient) -> None:
+        """Test that the body must be a list of strings."""
+        assert client.post("/-/resolve", json={"slugs": ["site"]}).status_code == 422
+
+
+class TestAdmin:
+    """Tests for the admin API."""
+
+    @pytest.fixture
+    def table(self, mocker: MockerFixture) -> unittest.mock.MagicMock:
+        """Mocked table."""
+        return t.cast(
+            unittest.mock.MagicMock, mocker.patch("short_it.parse_config.ParseConfigToMachineData").return_value
+        )
+
+    @pytest.fixture
+    def client(self, mocker: MockerFixture, table: unittest.mock.MagicMock) -> fastapi.testclient.TestClient:
+        """Client without lifespan, with ``admin.token`` set to ``secret``."""
+        mocker.patch("short_it.app.config_module.Config").return_value.admin.token = "secret"
+        return fastapi.testclient.TestClient(short_it.app.app)
+
+    @pytest.mark.parametrize("authorization", [None, "Bearer wrong", "secret"])
+    def test_unauthorized(
+        self, client: fastapi.testclient.TestClient, table: unittest.mock.MagicMock, authorization: str | None
+    ) -> None:
+        """Test that requests without the token are rejected."""
+        headers = {} if authorization is None else {"Authorization": authorization}
+
+        response = client.delete("/-/admin/links/site", headers=headers)
+
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Bearer"
+        table.delete_link.assert_not_called()
+
+    def test_disabled(self, mocker: MockerFixture, client: fastapi.testclient.TestClient) -> None:
+        """Test that the admin API doesn't exist, if the token is not set."""
+        mocker.patch("short_it.app.config_module.Config").return_value.admin.token = None
+
+        assert client.delete("/-/admin/links/site", headers={"Authorization": "Bearer None"}).status_code == 404
+
+    def test_set_links(
+        self, faker: Faker, client: fastapi.testclient.TestClient, table: unittest.mock.MagicMock
+    ) -> None:
+        """Test that bodies are passed to the table."""
+        table.set_simple_link.return_value = ["/site"]
+        table.set_project_link.return_value = ["/project/docs"]
+        destination = faker.url()
+
+        response = client.put(
+            "/-/admin/links/site", json={"to": destination, "status": 301}, headers={"Authorization": "Bearer secret"}
+        )
+        assert response.json() == {"paths": ["/site"]}
+        table.set_simple_link.assert_called_once_with("site", destination, 301, None)
+
+        response = client.put(
+            "/-/admin/links/project/docs",
+            json={"to": destination, "additional_aliases": ["manual"]},
+            headers={"Authorization": "Bearer secret"},
+        )
+        assert response.json() == {"paths": ["/project/docs"]}
+        table.set_project_link.assert_called_once_with(
+            "project", "docs", short_it.config.LinkSettings(to=destination, additional_aliases=["manual"])
+        )
+
+    @pytest.mark.parametrize(
+        "exception, status_code",
+        [
+            (short_it.parse_config.LinkNotFoundError("not found"), 404),
+            (short_it.parse_config.LinkConflictError("conflict"), 409),
+            (short_it.parse_config.ReadOnlyStoreError(), 409),
+            (ValueError("invalid"), 422),
+        ],
+    )
+    def test_errors(
+        self,
+        client: fastapi.testclient.TestClient,
+        table: unittest.mock.MagicMock,
+        exception: short_it.exc.ShortItException | ValueError,
+        status_code: int,
+    ) -> None:
+        """Test that errors of the table are returned as JSON."""
+        table.delete_link.side_effect = exception
+
+        response = client.delete(
+            "/-/admin/links/project/gh?with_aliases=true", headers={"Authorization": "Bearer secret"}
+        )
+
+        assert response.status_code == status_code
+        message = str(exception) if isinstance(exception, ValueError) else exception.message
+        assert response.json() == {"detail": message}
+        table.delete_link.assert_called_once_with("project", "gh", True)
@@ -0,0 +1,105 @@
+"""Tests for benchmarks in ``benchmarks/`` directory."""
+import pathlib
+import typing as t
+
+import pytest
+
+import short_it.config
+import short_it.parse_config
+from benchmarks import load, memory, micro, synthetic
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def test_synthetic_config_is_resolvable(tmp_path: pathlib.Path, size: int) -> None:
+    """Test that every generated alias can be resolved, including builtin aliases."""
+    generated = synthetic.generate(size)
+    generated.write(tmp_path / "config.yml")
+    config = short_it.config.Config.load(tmp_path / "config.yml")
+
+    table = short_it.parse_config.ParseConfigToMachineData.__new__(short_it.parse_config.ParseConfigToMachineData)
+    table._data = table._parse_config(config)
+
+    assert generated.aliases_count >= size
+    for name in generated.simple_links:
+        assert table.get_url(name, None) is not None
+    for project_name, alias in generated.project_links:
+        assert table.get_url(project_name, alias) is not None
+    assert any(alias == "vcs" for _, alias in generated.project_links)  # builtin alias of `github`
+    assert short_it.parse_config._parse_links(generated.to_config()) == table._data
+
+
+def test_bench_size(tmp_path: pathlib.Path) -> None:
+    """Smoke test for running all benchmarks on a tiny config."""
+    results = micro.bench_size(10, tmp_path, repeat=1)
+    assert all(value >= 0 for value in results.values())
+    assert {"parse_s", "parse_peak_mib", "get_url_hit_ns", "get_url_miss_ns"} <= results.keys()
+
+
+def test_memory_report(tmp_path: pathlib.Path) -> None:
+    """Test that every representation is measured, and interning makes the table smaller."""
+    results = memory.run(1000, tmp_path)
+
+    assert results.keys() == {"aliases", "memory, unshared strings", "memory", "memory, responses", "sqlite", "mmap"}
+    assert 0 < results["memory"] < results["memory, unshared strings"]
+    assert memory.report(results).splitlines()[3].startswith("memory ")
+
+
+def test_interned(tmp_path: pathlib.Path) -> None:
+    """Test that link types and destinations are shared, and stay shared after loading the snapshot."""
+    config = short_it.config.Config.from_settings({})
+    config.simple = {"site": memory._copy("https://perchun.it")}
+    config.projects = {
+        name: {
+            "home": short_it.config.LinkSettings(to=memory._copy("https://perchun.it"), aliases=[memory._copy("me")])
+        }
+        for name in ("first", "second")
+    }
+
+    table = memory._restart(
+        short_it.parse_config._parse_links(config), short_it.config.Config.to_settings(config), tmp_path
+    )
+
+    first, second = (t.cast(dict[str, str], table[name]) for name in ("first", "second"))
+    assert list(first)[1] is list(second)[1] == "me"
+    assert first["me"] is second["home"] is table["site"]
+
+
+def test_compare() -> None:
+    """Test that only metrics, which grew more than threshold, are reported."""
+    baseline = {"10": {"aliases": 10, "parse_s": 1.0, "get_url_hit_ns": 100.0}}
+    current = {"10": {"aliases": 20, "parse_s": 1.05, "get_url_hit_ns": 150.0, "new_metric": 1.0}}
+
+    regressions = micro.compare(current, baseline, threshold=0.1)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("get_url_hit_ns (size 10)")
+
+
+class TestLoad:
+    """Tests for ``benchmarks/load.py``."""
+
+    def test_parse_mix(self) -> None:
+        """Test that routes are repeated according to their weights."""
+        assert load._parse_mix("simple=2,not_found") == ["simple", "simple", "not_found"]
+        with pytest.raises(ValueError):
+            load._parse_mix("unknown=1")
+
+    def test_percentile(self) -> None:
+        """Test for nearest-rank percentile."""
+        values = [float(i) for i in range(100)]
+        assert load._percentile(values, 0.5) == 50
+        assert load._percentile(values, 0.99) == 99
+        assert load._percentile([], 0.5) == 0
+
+    def test_make_paths(self) -> None:
+        """Test that paths are generated for every route."""
+        paths = load.make_paths(synthetic.generate(100))
+        assert set(paths) == set(load.ROUTES)
+        assert all(paths.values())
+
+    def test_run(self) -> None:
+        """Smoke test against a real server, with a tiny config."""
+        report = load.run(size=10, clients=2, duration=0.3)
+
+        assert report["total"]["requests"] > 0
+        assert report["total"]["unexpected_statuses"] == 0
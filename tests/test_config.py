@@ -1,10 +1,12 @@
 """Tests for :mod:`short_it.config` module."""
+import pathlib
 import typing as t
 
 import pytest
 from faker import Faker
 
 import short_it.config
+import short_it.snapshot
 
 
 class TestLinkSettings:
@@ -45,3 +47,38 @@ class TestLinkSettings:
         instance = short_it.config.LinkSettings(aliases=expected_value if aliases_are_set else None)
         instance.resolve_builtin_aliases(alias if alias != "random" else faker.word())
         assert instance.aliases == expected_value
+
+
+class TestConfig:
+    """Tests for :class:`short_it.config.Config` class."""
+
+    def test_load_with_hash(self, faker: Faker, tmp_path: pathlib.Path) -> None:
+        """Test that hash matches content of the saved file."""
+        config_path = tmp_path / "config.yml"
+        config_path.write_text(f"simple:\n  {faker.word()}: {faker.url()}\n")
+
+        config, config_hash = short_it.config.Config.load_with_hash(config_path, save=True)
+
+        assert config_hash == short_it.snapshot.hash_file(config_path)
+        assert "sentry:" in config_path.read_text()
+
+    def test_load_with_hash_no_file(self, tmp_path: pathlib.Path) -> None:
+        """Test that hash is ``None`` if there is no config file, and nothing was saved."""
+        config_path = tmp_path / "config.yml"
+
+        config, config_hash = short_it.config.Config.load_with_hash(config_path)
+
+        assert config_hash is None
+        assert config.simple == {}
+        assert not config_path.exists()
+
+    def test_settings_round_trip(self, faker: Faker) -> None:
+        """Test that settings are the same after dumping and restoring."""
+        config = short_it.config.Config.from_settings({"sentry": {"enabled": True, "dsn": faker.url()}})
+        settings = short_it.config.Config.to_settings(config)
+
+        assert "projects" not in settings and "simple" not in settings
+        assert short_it.config.Config.to_settings(short_it.config.Config.from_settings(settings)) == settings
+        assert isinstance(config.sentry, short_it.config.SentryConfigSection)
+        with pytest.raises(AttributeError):
+            config.projects
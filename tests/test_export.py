@@ -0,0 +1,120 @@
+"""Tests for :mod:`short_it.export` module."""
+import pathlib
+
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.cli
+import short_it.config
+import short_it.export
+import short_it.parse_config
+import short_it.responses
+import short_it.utils
+
+CONFIG = """\
+redirect:
+  max_age: 60
+simple:
+  site: https://perchun.it
+  stable:
+    to: https://example.com/stable
+    status: 301
+  dollar: https://example.com/$price
+  spaces: https://example.com/some path
+  Upper: https://example.com/upper
+  ..: https://example.com/dots
+projects:
+  short-it:
+    github:
+      to: https://github.com/PerchunPak/short-it
+      status: 308
+      max_age: 86400
+    readme:
+      to: https://github.com/PerchunPak/short-it#readme
+"""
+
+
+@pytest.fixture
+def table(mocker: MockerFixture, tmp_path: pathlib.Path) -> short_it.parse_config.ParseConfigToMachineData:
+    """Table from :data:`CONFIG`."""
+    mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+    mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+    mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+    short_it.config.CONFIG_PATH.write_text(CONFIG)
+    return short_it.parse_config.ParseConfigToMachineData()
+
+
+def test_same_as_server(table: short_it.parse_config.ParseConfigToMachineData) -> None:
+    """Test that every exported path gets the same response, as the server would send."""
+    exported = list(short_it.export.export(table))
+
+    paths = {entry if isinstance(entry, str) else entry.path for entry in exported}
+    assert "/short-it" in paths and "/short-it/gh" in paths and "/stable" in paths
+    assert not {"/..", "/upper", "/Upper"} & paths
+    for entry in exported:
+        if isinstance(entry, str):
+            assert table.get_response(entry) is short_it.parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE
+            continue
+
+        response = table.get_response(entry.path)
+        assert response is not None
+        headers = dict(response.headers)
+        assert response.status == entry.status
+        assert headers[b"location"] == entry.location.encode()
+        assert headers.get(b"cache-control") == (None if entry.cache_control is None else entry.cache_control.encode())
+
+
+def test_nginx(table: short_it.parse_config.ParseConfigToMachineData) -> None:
+    """Test nginx maps."""
+    rendered = short_it.export.nginx(table)
+
+    assert "    /short-it/gh 308;\n" in rendered
+    assert '    /short-it/gh "https://github.com/PerchunPak/short-it";\n' in rendered
+    assert '    /short-it/gh "public, max-age=86400";\n' in rendered
+    assert "    /site 307;\n" in rendered
+    assert "    /short-it 200;\n" in rendered
+    assert '    /spaces "https://example.com/some%20path";\n' in rendered
+    assert "/dollar" not in rendered
+    assert "/short-it/nonexistent" not in rendered
+    assert rendered.count("{") == rendered.count("}")
+    assert rendered.endswith("}\n")
+
+
+def test_caddy(table: short_it.parse_config.ParseConfigToMachineData) -> None:
+    """Test Caddyfile directives."""
+    rendered = short_it.export.caddy(table)
+
+    assert '    /stable 301 "https://example.com/stable" "public, max-age=60"\n' in rendered
+    assert '    /short-it 200 "" ""\n' in rendered
+    assert "redir @short_it_308 {short_it_location} 308\n" in rendered
+    assert rendered.count("{") == rendered.count("}")
+
+
+def test_static_site(table: short_it.parse_config.ParseConfigToMachineData, tmp_path: pathlib.Path) -> None:
+    """Test that every link is a page, and the 404 page is written."""
+    output = tmp_path / "site"
+
+    written = short_it.export.static_site(table, output)
+
+    assert written == len(list(short_it.export.export(table)))
+    assert 'content="0; url=https://example.com/$price"' in (output / "dollar" / "index.html").read_text()
+    assert "url=https://github.com/PerchunPak/short-it#readme" in (output / "short-it/readme/index.html").read_text()
+    assert (
+        output / "short-it" / "index.html"
+    ).read_text() == short_it.parse_config.MultipleLinksNoLinkTypeError().message
+    assert (output / "404.html").read_text() == short_it.responses.NOT_FOUND_HTML
+    assert not (tmp_path / "index.html").exists()
+
+
+def test_cli(
+    table: short_it.parse_config.ParseConfigToMachineData, tmp_path: pathlib.Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test ``short-it export`` command."""
+    short_it.cli.main(["export", "nginx"])
+    assert capsys.readouterr().out == short_it.export.nginx(table)
+
+    short_it.cli.main(["export", "caddy", "--output", str(tmp_path / "short-it.caddy")])
+    assert (tmp_path / "short-it.caddy").read_text() == short_it.export.caddy(table)
+
+    with pytest.raises(SystemExit):
+        short_it.cli.main(["export", "static"])
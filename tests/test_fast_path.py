@@ -0,0 +1,153 @@
+"""Tests for :mod:`short_it.fast_path` module."""
+import asyncio
+import dataclasses
+import unittest.mock
+
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.fast_path
+import short_it.responses
+
+
+@pytest.fixture
+def downstream() -> unittest.mock.AsyncMock:
+    """Wrapped app, which should be called only for requests we don't handle."""
+    return unittest.mock.AsyncMock()
+
+
+@pytest.fixture
+def middleware(downstream: unittest.mock.AsyncMock) -> short_it.fast_path.FastRedirectMiddleware:
+    """Create the middleware."""
+    return short_it.fast_path.FastRedirectMiddleware(downstream, enabled=True)
+
+
+def _request(
+    middleware: short_it.fast_path.FastRedirectMiddleware, path: str, method: str = "GET", **scope: str
+) -> list[short_it.fast_path.Message]:
+    """Send a request to the middleware and collect sent messages."""
+    messages: list[short_it.fast_path.Message] = []
+
+    async def send(message: short_it.fast_path.Message) -> None:
+        messages.append(message)
+
+    asyncio.run(middleware({"type": "http", "method": method, "path": path, **scope}, unittest.mock.AsyncMock(), send))
+    return messages
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_served(
+    mocker: MockerFixture,
+    faker: Faker,
+    middleware: short_it.fast_path.FastRedirectMiddleware,
+    downstream: unittest.mock.AsyncMock,
+    method: str,
+) -> None:
+    """Test that pre-built response is sent as is."""
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_response.return_value = short_it.responses.redirect(faker.url())
+    path = f"/{faker.word()}/{faker.word()}"
+
+    assert _request(middleware, path, method) == [
+        {
+            "type": "http.response.start",
+            "status": 307,
+            "headers": mocked.get_response.return_value.headers,
+        },
+        {"type": "http.response.body", "body": b""},
+    ]
+    mocked.get_response.assert_called_once_with(path, b"")
+    downstream.assert_not_called()
+
+
+def test_not_our_route(
+    mocker: MockerFixture,
+    faker: Faker,
+    middleware: short_it.fast_path.FastRedirectMiddleware,
+    downstream: unittest.mock.AsyncMock,
+) -> None:
+    """Test that request is passed to the wrapped app, if path doesn't match our routes."""
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_response.return_value = None
+
+    assert _request(middleware, f"/{faker.word()}/") == []
+    downstream.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    "method, scope",
+    [
+        ("POST", {}),
+        ("GET", {"root_path": "/prefix"}),
+        ("GET", {"type": "websocket"}),
+    ],
+)
+def test_passed_through(
+    mocker: MockerFixture,
+    faker: Faker,
+    middleware: short_it.fast_path.FastRedirectMiddleware,
+    downstream: unittest.mock.AsyncMock,
+    method: str,
+    scope: dict[str, str],
+) -> None:
+    """Test that requests, which are not handled by our routes, are passed to the wrapped app."""
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+
+    assert _request(middleware, f"/{faker.word()}", method, **scope) == []
+    downstream.assert_awaited_once()
+    mocked.get_response.assert_not_called()
+
+
+@pytest.mark.parametrize("is_redirect", [True, False])
+def test_counted(
+    mocker: MockerFixture, faker: Faker, middleware: short_it.fast_path.FastRedirectMiddleware, is_redirect: bool
+) -> None:
+    """Test that only redirects are counted, by lowercase path, and 404s are tracked as misses."""
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_response.return_value = (
+        short_it.responses.redirect(faker.url()) if is_redirect else short_it.responses.NOT_FOUND
+    )
+    mocked_counter = mocker.patch("short_it.fast_path.stats.ClickCounter").return_value
+    mocked_hot_links = mocker.patch("short_it.fast_path.hot_links.HotLinks").return_value
+
+    _request(middleware, "/Project/GH")
+
+    if is_redirect:
+        mocked_counter.hit.assert_called_once_with("/project/gh")
+        mocked_hot_links.hit.assert_called_once_with("/project/gh")
+        mocked_hot_links.miss.assert_not_called()
+    else:
+        mocked_counter.hit.assert_not_called()
+        mocked_hot_links.miss.assert_called_once_with("/project/gh")
+
+
+def test_counted_by_route(
+    mocker: MockerFixture, faker: Faker, middleware: short_it.fast_path.FastRedirectMiddleware
+) -> None:
+    """Test that redirects of templated links are counted for their pattern, and the query string is passed."""
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_response.return_value = dataclasses.replace(
+        short_it.responses.redirect(faker.url()), route="/project/issue/{n}"
+    )
+    mocked_counter = mocker.patch("short_it.fast_path.stats.ClickCounter").return_value
+    mocker.patch("short_it.fast_path.hot_links.HotLinks")
+
+    _request(middleware, "/project/issue/12", query_string=b"a=1")  # type: ignore[arg-type]
+
+    mocked.get_response.assert_called_once_with("/project/issue/12", b"a=1")
+    mocked_counter.hit.assert_called_once_with("/project/issue/{n}")
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_enabled_from_config(mocker: MockerFixture, downstream: unittest.mock.AsyncMock, enabled: bool) -> None:
+    """Test that the middleware reads ``server.fast_path``, and passes everything through if it is disabled."""
+    mocker.patch("short_it.fast_path.config_module.Config").return_value.server.fast_path = enabled
+    mocked = mocker.patch("short_it.fast_path.parse_config.ParseConfigToMachineData").return_value
+    middleware = short_it.fast_path.FastRedirectMiddleware(downstream)
+
+    _request(middleware, "/project/gh")
+
+    assert middleware.enabled is enabled
+    assert mocked.get_response.called is enabled
+    assert downstream.await_count == (0 if enabled else 1)
@@ -0,0 +1,115 @@
+"""Tests for :mod:`short_it.hot_links` module."""
+import random
+
+import fastapi.testclient
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.app
+import short_it.config
+import short_it.hot_links
+import short_it.responses
+import short_it.utils
+
+
+class TestSpaceSaving:
+    """Tests for :class:`short_it.hot_links.SpaceSaving`."""
+
+    def test_exact_under_capacity(self) -> None:
+        """Test that counts are exact, while there are fewer keys than capacity."""
+        sketch = short_it.hot_links.SpaceSaving(3)
+        for key in "abacab":
+            sketch.add(key)
+
+        assert sorted(sketch.items()) == [("a", 3, 0), ("b", 2, 0), ("c", 1, 0)]
+
+    def test_heavy_hitters_survive_junk(self) -> None:
+        """Test that frequent keys are found among a lot of unique ones, in fixed memory."""
+        rng = random.Random(0)
+        sketch = short_it.hot_links.SpaceSaving(20)  # keys, which are more frequent than 1/20 of stream, are kept
+        stream = [f"hot-{i}" for i in range(3) for _ in range(1000)] + [f"junk-{i}" for i in range(10_000)]
+        rng.shuffle(stream)
+        for key in stream:
+            sketch.add(key)
+
+        items = sketch.items()
+        assert len(items) == 20
+        assert len(sketch._heap) <= 4 * 20 + 1
+        top = sorted(items, key=lambda item: item[1], reverse=True)[:3]
+        assert {key for key, _, _ in top} == {"hot-0", "hot-1", "hot-2"}
+        for _, count, error in top:
+            assert count - error <= 1000 <= count
+
+
+@pytest.fixture
+def hot_links(mocker: MockerFixture) -> short_it.hot_links.HotLinks:
+    """Fresh tracker with 60 seconds window, split into 3 buckets."""
+    mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+    mocker.patch(
+        "short_it.hot_links.config_module.Config"
+    ).return_value.hot_links = short_it.config.HotLinksConfigSection(window=60, buckets=3, capacity=10)
+    return short_it.hot_links.HotLinks()
+
+
+def test_hits_and_misses_are_separate(hot_links: short_it.hot_links.HotLinks) -> None:
+    """Test that 404 paths don't mix with links."""
+    hot_links.hit("/a")
+    hot_links.hit("/a")
+    hot_links.miss("/wp-login.php")
+    hot_links.miss("/" + "x" * 1000)
+
+    top = hot_links.top()
+
+    assert top["hits"] == [{"path": "/a", "count": 2, "error": 0}]
+    assert {item["path"] for item in top["misses"]} == {"/" + "x" * 199, "/wp-login.php"}
+
+
+def test_sliding_window(hot_links: short_it.hot_links.HotLinks) -> None:
+    """Test that old buckets are dropped, and the rest are summed up."""
+    hot_links.hit("/old")
+    hot_links.update(now=0)
+    hot_links.hit("/new")
+    hot_links.hit("/old")
+    hot_links.update(now=30)
+
+    hot_links.update(now=59)
+    assert hot_links._buckets[0].start == 0
+    assert short_it.hot_links._merge([bucket.hits for bucket in hot_links._buckets], 10) == [
+        {"path": "/old", "count": 2, "error": 0},
+        {"path": "/new", "count": 1, "error": 0},
+    ]
+
+    hot_links.update(now=61)
+    assert short_it.hot_links._merge([bucket.hits for bucket in hot_links._buckets], 10) == [
+        {"path": "/new", "count": 1, "error": 0},
+        {"path": "/old", "count": 1, "error": 0},
+    ]
+
+
+def test_disabled(hot_links: short_it.hot_links.HotLinks) -> None:
+    """Test that nothing is tracked, if disabled."""
+    hot_links._enabled = False
+    hot_links.hit("/a")
+    hot_links.miss("/b")
+
+    assert hot_links.top() == {"hits": [], "misses": []}
+
+
+def test_endpoint(mocker: MockerFixture, hot_links: short_it.hot_links.HotLinks) -> None:
+    """Test that the top is served as JSON, and FastAPI 404s are tracked too."""
+    client = fastapi.testclient.TestClient(short_it.app.app)
+    mocked = mocker.patch("short_it.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_redirect_options.return_value = short_it.responses.DEFAULT_REDIRECT
+    mocked.get_response.return_value = None  # let FastAPI handle everything
+    mocked.match_route.return_value = None
+    mocked.suggest.return_value = []
+    hot_links.hit("/a")
+
+    assert client.get("/a/b/c/d").status_code == 404
+    response = client.get("/-/hot", params={"limit": 5})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "hits": [{"path": "/a", "count": 1, "error": 0}],
+        "misses": [{"path": "/a/b/c/d", "count": 1, "error": 0}],
+    }
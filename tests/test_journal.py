@@ -0,0 +1,216 @@
+"""Tests for :mod:`short_it.journal` module, including crash safety."""
+import os
+import pathlib
+import signal
+import subprocess
+import sys
+import threading
+import time
+import typing as t
+
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.journal
+import short_it.responses
+
+RECORDS = [
+    short_it.journal.Record("site", "https://perchun.it", {"/site": (301, None)}),
+    short_it.journal.Record("project", {"github": "https://github.com/project", "gh": "https://github.com/project"}),
+    short_it.journal.Record("site", None),
+    short_it.journal.Record("other", "https://example.com", {"/other": (308, 3600)}),
+]
+
+
+@pytest.fixture
+def path(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Path to the journal."""
+    return tmp_path / "links.journal"
+
+
+def _write(path: pathlib.Path, records: list[short_it.journal.Record]) -> None:
+    """Append records durably, and close the journal."""
+    journal = short_it.journal.Journal(path)
+    for record in records:
+        journal.sync(journal.append(record))
+    journal.close()
+
+
+def _replayed(path: pathlib.Path) -> dict[str, short_it.journal.Record]:
+    """The last record of every project, after the journal is reopened."""
+    journal = short_it.journal.Journal(path)
+    try:
+        return {record.name: record for record in journal.records()}
+    finally:
+        journal.close()
+
+
+def test_round_trip(path: pathlib.Path) -> None:
+    """Test that the last record of every project is replayed."""
+    _write(path, RECORDS)
+
+    assert _replayed(path) == {"project": RECORDS[1], "site": RECORDS[2], "other": RECORDS[3]}
+
+
+def test_apply() -> None:
+    """Test that records replace whole projects with their redirect options, and delete them."""
+    data: dict[str, str | t.Mapping[str, str]] = {"project": {"github": "old", "docs": "old"}, "site": "old"}
+    redirects: dict[str, short_it.responses.RedirectOptions] = {"/project/docs": (308, None), "/site": (302, None)}
+
+    short_it.journal.apply(RECORDS, data, redirects)
+
+    assert data == {"project": RECORDS[1].links, "other": "https://example.com"}
+    assert redirects == {"/other": (308, 3600)}
+
+
+def test_torn_record(path: pathlib.Path) -> None:
+    """Test that a record, torn by a crash at any byte, is cut off, and the journal is usable after that."""
+    _write(path, RECORDS[:3])
+    intact = path.read_bytes()
+    _write(path, RECORDS[3:])
+    full = path.read_bytes()
+
+    for end in range(len(intact), len(full)):
+        path.write_bytes(full[:end])
+
+        assert _replayed(path) == {"site": RECORDS[2], "project": RECORDS[1]}
+        assert path.read_bytes() == intact
+
+        _write(path, RECORDS[3:])
+        assert path.read_bytes() == full
+
+
+def test_corrupted_record(path: pathlib.Path) -> None:
+    """Test that everything after a corrupted record is discarded, framing can't be trusted after it."""
+    _write(path, RECORDS[:1])
+    offset = path.stat().st_size
+    _write(path, RECORDS[1:])
+    raw = bytearray(path.read_bytes())
+    raw[offset + 10] ^= 0xFF
+    path.write_bytes(raw)
+
+    assert _replayed(path) == {"site": RECORDS[0]}
+
+
+def test_not_a_journal(path: pathlib.Path) -> None:
+    """Test that other files are not overwritten."""
+    path.write_text("simple: {}\n")
+
+    with pytest.raises(ValueError, match="not a short-it journal"):
+        short_it.journal.Journal(path)
+    assert path.read_text() == "simple: {}\n"
+
+
+def test_group_commit(mocker: MockerFixture, path: pathlib.Path, faker: Faker) -> None:
+    """Test that concurrent writers share ``fsync`` calls, and all records are durable after ``sync``."""
+    journal = short_it.journal.Journal(path)
+    fsync = os.fsync
+
+    def slow_fsync(fd: int) -> None:
+        time.sleep(0.01)
+        fsync(fd)
+
+    mocked_fsync = mocker.patch("short_it.journal.os.fsync", side_effect=slow_fsync)
+
+    def write(index: int) -> None:
+        for _ in range(5):
+            journal.sync(journal.append(short_it.journal.Record(f"link{index}", faker.url())))
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+
+    assert mocked_fsync.call_count < 40
+    assert len(_replayed(path)) == 8
+
+
+def test_compaction(path: pathlib.Path, faker: Faker) -> None:
+    """Test that compaction keeps only the last records, in the background, without losing new ones."""
+    journal = short_it.journal.Journal(path, compact_after=1024)
+    for index in range(200):
+        journal.sync(journal.append(short_it.journal.Record(f"link{index % 5}", f"https://example.com/{index}")))
+    journal.close()
+
+    assert path.stat().st_size < 2048  # compacted at least once, appends during compaction are kept
+    assert not list(path.parent.glob("*.tmp"))
+    assert {name: record.links for name, record in _replayed(path).items()} == {
+        f"link{index % 5}": f"https://example.com/{index}" for index in range(195, 200)
+    }
+
+
+def test_crash_during_compaction(mocker: MockerFixture, path: pathlib.Path) -> None:
+    """Test that the journal is intact, if compaction fails before the new file replaces it."""
+    _write(path, RECORDS)
+    journal = short_it.journal.Journal(path)
+    mocker.patch("short_it.journal.os.replace", side_effect=OSError("crash"))
+
+    with pytest.raises(OSError):
+        journal.compact()
+    journal.sync(journal.append(short_it.journal.Record("new", "https://example.com")))
+    journal.close()
+    mocker.stopall()
+
+    assert list(path.parent.glob("*.tmp"))  # as if the process died
+    assert set(_replayed(path)) == {"site", "project", "other", "new"}
+    assert not list(path.parent.glob("*.tmp"))
+
+
+def test_several_writers(path: pathlib.Path) -> None:
+    """Test that records of every writer survive compaction by another one, which replaces the file."""
+    first = short_it.journal.Journal(path, compact_after=1024)
+    second = short_it.journal.Journal(path, compact_after=1024)  # separate files and locks, like another process
+
+    def write(journal: short_it.journal.Journal, prefix: str) -> None:
+        for index in range(300):
+            journal.sync(
+                journal.append(short_it.journal.Record(f"{prefix}{index % 5}", f"https://example.com/{index}"))
+            )
+
+    threads = [threading.Thread(target=write, args=args) for args in ((first, "first"), (second, "second"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {record.name for record in first.records()} == {
+        f"{prefix}{index}" for prefix in ("first", "second") for index in range(5)
+    }
+    first.close()
+    second.close()
+
+    assert path.stat().st_size < 4096  # compacted, and nobody appended into a replaced file
+    assert {name: record.links for name, record in _replayed(path).items()} == {
+        f"{prefix}{index % 5}": f"https://example.com/{index}"
+        for prefix in ("first", "second")
+        for index in range(295, 300)
+    }
+
+
+def test_killed_writer(path: pathlib.Path) -> None:
+    """Test that every acknowledged record survives ``SIGKILL`` of the writer."""
+    code = (
+        "import pathlib, short_it.journal as j\n"
+        f"journal = j.Journal(pathlib.Path({str(path)!r}), compact_after=4096)\n"
+        "for index in range(100000):\n"
+        "    journal.sync(journal.append(j.Record(f'link{index % 50}', f'https://example.com/{index}')))\n"
+        "    print(index, flush=True)\n"
+    )
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+    assert process.stdout is not None
+    acknowledged = -1
+    for line in process.stdout:
+        acknowledged = int(line)
+        if acknowledged >= 300:
+            break
+    process.send_signal(signal.SIGKILL)
+    process.wait()
+
+    replayed = _replayed(path)
+    for index in range(max(0, acknowledged - 49), acknowledged + 1):
+        links = replayed[f"link{index % 50}"].links
+        assert isinstance(links, str)
+        assert int(links.rsplit("/", 1)[1]) >= index
@@ -0,0 +1,242 @@
+"""Tests for :mod:`short_it.link_checker` module, against a local stub server."""
+import asyncio
+import http.server
+import json
+import pathlib
+import socket
+import sys
+import threading
+import time
+import typing as t
+
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.cli
+import short_it.link_checker
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Handler of the stub server, with keep-alive, see :meth:`respond` for paths."""
+
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def setup(self) -> None:
+        """Count connections."""
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_HEAD(self) -> None:  # noqa: N802 # name is defined by `http.server`
+        """Respond without body."""
+        self.respond(head=True)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Respond with body."""
+        self.respond(head=False)
+
+    def respond(self, head: bool) -> None:
+        """Respond depending on the path."""
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            hits = self.server.hits[self.path]
+        try:
+            status, headers = 200, {}
+            match self.path.split("?")[0]:
+                case "/dead":
+                    status = 404
+                case "/no-head" if head:
+                    status = 405
+                case "/redirect":
+                    status, headers = 301, {"Location": "/ok"}
+                case "/loop":
+                    status, headers = 302, {"Location": "/loop"}
+                case "/flaky" if hits == 1:
+                    status = 503
+                case "/slow":
+                    time.sleep(0.5)
+                case "/busy":
+                    time.sleep(0.02)
+                case "/latency":
+                    time.sleep(0.1)
+
+            body = b"" if head else b"body"
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def log_message(self, *_: object) -> None:
+        """Don't spam the output."""
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """Stub server, which counts connections and concurrent requests."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.connections = self.in_flight = self.max_in_flight = 0
+        self.hits: dict[str, int] = {}
+
+    def handle_error(self, request: socket.socket | tuple[bytes, socket.socket], client_address: object) -> None:
+        """Ignore connections, closed by the client."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+@pytest.fixture
+def server() -> t.Iterator[StubServer]:
+    """Running stub server."""
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def closed_port() -> int:
+    """Port, which nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return t.cast(int, sock.getsockname()[1])
+
+
+def _check(destinations: dict[str, list[str]], **options: float) -> dict[str, short_it.link_checker.CheckResult]:
+    """Check destinations without retry delays, and return results by URL."""
+    checker = short_it.link_checker.LinkChecker(**{"retry_delay": 0, **options})  # type: ignore[arg-type]
+    results = short_it.link_checker.check(destinations, checker)
+    assert [result.url for result in results] == list(destinations)
+    return {result.url: result for result in results}
+
+
+def test_statuses(server: StubServer, closed_port: int) -> None:
+    """Test that statuses are reported after redirects, and ``GET`` is used if ``HEAD`` is not allowed."""
+    results = _check(
+        {
+            f"{server.url}/ok": ["/site"],
+            f"{server.url}/dead": ["/project/gh", "/project/github"],
+            f"{server.url}/no-head": [],
+            f"{server.url}/redirect": [],
+            f"{server.url}/loop": [],
+            f"http://127.0.0.1:{closed_port}/": [],
+            "mailto:me@perchun.it": [],
+        },
+        retries=0,
+    )
+
+    assert {url.removeprefix(server.url): (result.status, result.alive) for url, result in results.items()} == {
+        "/ok": (200, True),
+        "/dead": (404, False),
+        "/no-head": (200, True),
+        "/redirect": (200, True),
+        "/loop": (None, False),
+        f"http://127.0.0.1:{closed_port}/": (None, False),
+        "mailto:me@perchun.it": (None, False),
+    }
+    assert results[f"{server.url}/dead"].paths == ("/project/gh", "/project/github")
+    assert results[f"{server.url}/loop"].error == "more than 5 redirects"
+    assert results[f"http://127.0.0.1:{closed_port}/"].error.startswith("ConnectionRefusedError")  # type: ignore[union-attr]
+    assert results["mailto:me@perchun.it"].error == "not an HTTP URL: 'mailto:me@perchun.it'"
+
+
+def test_pooling(server: StubServer) -> None:
+    """Test that connections are kept alive, and concurrent requests per host are capped."""
+    destinations: dict[str, list[str]] = {f"{server.url}/busy?{index}": [] for index in range(60)}
+
+    results = _check(destinations, per_host=3)
+
+    assert all(result.status == 200 for result in results.values())
+    assert server.connections <= 3
+    assert server.max_in_flight <= 3
+
+
+def test_retries(server: StubServer) -> None:
+    """Test that ``5xx`` responses and timeouts are retried."""
+    results = _check({f"{server.url}/flaky": [], f"{server.url}/slow": []}, timeout=0.1, retries=1)
+
+    assert (results[f"{server.url}/flaky"].status, results[f"{server.url}/flaky"].attempts) == (200, 2)
+    slow = results[f"{server.url}/slow"]
+    assert (slow.status, slow.error, slow.attempts) == (None, "timed out after 0.1s", 2)
+
+
+def test_queued_behind_busy_host(server: StubServer) -> None:
+    """Test that waiting for a free slot of the host doesn't count into the timeout."""
+    destinations: dict[str, list[str]] = {f"{server.url}/latency?{index}": [] for index in range(30)}
+
+    results = _check(destinations, per_host=2, timeout=0.5, retries=0)  # 30 * 0.1s / 2 = 1.5s in total
+
+    assert [result.url for result in results.values() if not result.alive] == []
+    assert server.max_in_flight <= 2
+
+
+def test_stale_connection(server: StubServer) -> None:
+    """Test that the request is resent on a new connection, if the server closed the idle one."""
+    checker = short_it.link_checker.LinkChecker(retries=0)
+
+    async def check_twice() -> list[short_it.link_checker.CheckResult]:
+        first = await checker.check(f"{server.url}/ok")
+        pool = next(iter(checker.pools.values()))
+        for _, writer in pool._idle:  # as if the server closed it
+            writer.transport.abort()
+        await asyncio.sleep(0.05)
+        second = await checker.check(f"{server.url}/ok")
+        await checker.close()
+        return [first, second]
+
+    results = asyncio.run(check_twice())
+
+    assert [(result.status, result.attempts) for result in results] == [(200, 1), (200, 1)]
+    assert next(iter(checker.pools.values())).opened == 2
+
+
+def test_many_urls(server: StubServer) -> None:
+    """Test that thousands of destinations are checked quickly."""
+    destinations: dict[str, list[str]] = {f"{server.url}/ok?{index}": [] for index in range(2000)}
+
+    start = time.perf_counter()
+    results = _check(destinations, per_host=8)
+
+    assert all(result.alive for result in results.values())
+    assert time.perf_counter() - start < 30
+    assert server.connections <= 8
+
+
+def test_cli(mocker: MockerFixture, tmp_path: pathlib.Path, server: StubServer) -> None:
+    """Test that dead links are printed, the report is written, and the exit code is set."""
+    mocker.patch("short_it.parse_config.ParseConfigToMachineData").return_value.destinations.return_value = {
+        f"{server.url}/ok": ["/site"],
+        f"{server.url}/dead": ["/project/gh"],
+    }
+    mocked_print = mocker.patch("builtins.print")
+    output = tmp_path / "report.json"
+
+    with pytest.raises(SystemExit) as exc_info:
+        short_it.cli.main(["check-links", "--output", str(output), "--retries", "0"])
+
+    assert exc_info.value.code == 1
+    printed = mocked_print.call_args.args[0]
+    assert f"{server.url}/dead (HTTP 404, 1 attempts)\n    /project/gh\n" in printed
+    assert printed.endswith("2 destinations checked, 1 alive, 1 dead")
+    report = json.loads(output.read_text())
+    assert [(entry["url"], entry["status"], entry["alive"]) for entry in report] == [
+        (f"{server.url}/ok", 200, True),
+        (f"{server.url}/dead", 404, False),
+    ]
@@ -0,0 +1,120 @@
+"""Tests for :mod:`short_it.metrics` module."""
+import threading
+
+import fastapi.testclient
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.app
+import short_it.metrics
+import short_it.parse_config
+import short_it.responses
+import short_it.snapshot
+
+
+@pytest.fixture(autouse=True)
+def fresh_histograms(mocker: MockerFixture) -> None:
+    """Don't count requests of other tests."""
+    mocker.patch.dict(
+        short_it.metrics.REQUEST_DURATION,
+        {outcome: short_it.metrics.Histogram() for outcome in short_it.metrics.OUTCOMES},
+    )
+
+
+class TestHistogram:
+    """Tests for :class:`short_it.metrics.Histogram`."""
+
+    def test_cumulative(self) -> None:
+        """Test that bucket counts are cumulative, and ``le`` is inclusive."""
+        histogram = short_it.metrics.Histogram((0.1, 1.0))
+        for seconds in [0.05, 0.1, 0.5, 2.0]:
+            histogram.observe(seconds)
+
+        cumulative, count, total = histogram.collect()
+
+        assert cumulative == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+        assert count == 4
+        assert total == pytest.approx(2.65)
+
+    def test_empty(self) -> None:
+        """Test that a histogram without observations has all buckets."""
+        assert short_it.metrics.Histogram((0.1,)).collect() == ([("0.1", 0), ("+Inf", 0)], 0, 0.0)
+
+    def test_threads(self) -> None:
+        """Test that observations from many threads are not lost."""
+        histogram = short_it.metrics.Histogram((0.1,))
+
+        def observe() -> None:
+            for _ in range(1000):
+                histogram.observe(0.01)
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert histogram.collect()[1] == 8000
+        assert len(histogram._shards) == 8
+
+
+@pytest.mark.parametrize(
+    "response,outcome",
+    [
+        (short_it.responses.redirect("https://example.com"), "redirect"),
+        (short_it.responses.NOT_FOUND, "not_found"),
+        (short_it.parse_config.ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE, "one_link_error"),
+        (short_it.parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE, "multiple_links_error"),
+    ],
+)
+def test_outcome_of(response: short_it.responses.PrebuiltResponse, outcome: str) -> None:
+    """Test that every pre-built response has the right outcome."""
+    assert short_it.metrics.outcome_of(response) == outcome
+
+
+def test_render(mocker: MockerFixture) -> None:
+    """Test that all metrics are rendered."""
+    table = mocker.patch("short_it.metrics.parse_config.ParseConfigToMachineData").return_value
+    table.__len__.return_value = 42
+    table.config_hash = bytes.fromhex("abcd")
+    table.source = "snapshot"
+    table.load_seconds = 0.5
+    short_it.metrics.observe("redirect", 0.00002)
+
+    rendered = short_it.metrics.render()
+
+    assert 'short_it_request_duration_seconds_bucket{outcome="redirect",le="1e-05"} 0' in rendered
+    assert 'short_it_request_duration_seconds_bucket{outcome="redirect",le="2.5e-05"} 1' in rendered
+    assert 'short_it_request_duration_seconds_bucket{outcome="redirect",le="+Inf"} 1' in rendered
+    assert 'short_it_request_duration_seconds_count{outcome="redirect"} 1' in rendered
+    assert 'short_it_request_duration_seconds_count{outcome="not_found"} 0' in rendered
+    assert "short_it_config_load_seconds 0.5\n" in rendered
+    assert "short_it_table_size 42\n" in rendered
+    assert (
+        f'short_it_snapshot_info{{format_version="{short_it.snapshot.FORMAT_VERSION}",config_hash="abcd",'
+        'source="snapshot"} 1\n'
+    ) in rendered
+
+
+def test_requests_are_observed(mocker: MockerFixture, faker: Faker) -> None:
+    """Test that handlers observe requests, and the endpoint serves them."""
+    mocked = mocker.patch("short_it.parse_config.ParseConfigToMachineData").return_value
+    mocked.get_redirect_options.return_value = short_it.responses.DEFAULT_REDIRECT
+    mocked.get_response.return_value = None
+    mocked.match_route.return_value = None
+    mocked.get_url.return_value = faker.url()
+    mocked.__len__.return_value = 1
+    mocked.config_hash = None
+    mocked.load_seconds = 0.0
+    client = fastapi.testclient.TestClient(short_it.app.app)
+
+    client.get("/project/gh", follow_redirects=False)
+    mocked.get_url.side_effect = short_it.parse_config.OneLinkAndLinkTypeSpecifiedError
+    client.get("/project/gh")
+    response = client.get("/-/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == short_it.metrics.CONTENT_TYPE
+    assert 'short_it_request_duration_seconds_count{outcome="redirect"} 1' in response.text
+    assert 'short_it_request_duration_seconds_count{outcome="one_link_error"} 1' in response.text
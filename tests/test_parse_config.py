@@ -1,4 +1,8 @@
 """Tests for the :mod:`short_it.parse_config` module."""
+import dataclasses
+import os
+import pathlib
+
 import omegaconf
 import pytest
 from faker import Faker
@@ -6,6 +10,9 @@ from pytest_mock import MockerFixture
 
 import short_it.config
 import short_it.parse_config
+import short_it.responses
+import short_it.snapshot
+import short_it.stores
 import short_it.utils
 
 
@@ -15,6 +22,8 @@ def instance(class_mocker: MockerFixture) -> short_it.parse_config.ParseConfigTo
     mocked_parse_config = class_mocker.patch(
         "short_it.parse_config.ParseConfigToMachineData._parse_config", return_value={}
     )
+    class_mocker.patch("short_it.parse_config.snapshot.load", return_value=None)
+    class_mocker.patch("short_it.parse_config.snapshot.save")
 
     if short_it.parse_config.ParseConfigToMachineData in short_it.utils.Singleton._instances:
         del short_it.utils.Singleton._instances[short_it.parse_config.ParseConfigToMachineData]
@@ -38,13 +47,13 @@ class TestGetUrl:
     def test_no_link_type(self, faker: Faker, instance: short_it.parse_config.ParseConfigToMachineData) -> None:
         """Test for situation, when link type is not found."""
         project_name = faker.word()
-        instance._data[project_name] = {}
+        instance._writable_data()[project_name] = {}
         assert instance.get_url(project_name, faker.word()) is None
 
     def test_simple_link(self, faker: Faker, instance: short_it.parse_config.ParseConfigToMachineData) -> None:
         """Test for simple link success handling."""
         project_name, expected_value = faker.word(), faker.url()
-        instance._data[project_name] = expected_value
+        instance._writable_data()[project_name] = expected_value
         assert instance.get_url(project_name, None) == expected_value
 
     def test_simple_link_and_link_type_specified(
@@ -52,7 +61,7 @@ class TestGetUrl:
     ) -> None:
         """Test for situation, when simple link and link type specified."""
         project_name = faker.word()
-        instance._data[project_name] = faker.url()
+        instance._writable_data()[project_name] = faker.url()
         with pytest.raises(short_it.parse_config.OneLinkAndLinkTypeSpecifiedError):
             instance.get_url(project_name, faker.word())
 
@@ -61,14 +70,14 @@ class TestGetUrl:
     ) -> None:
         """Test for situation, when no link type specified and project has multiple links."""
         project_name = faker.word()
-        instance._data[project_name] = {faker.word(): faker.url()}
+        instance._writable_data()[project_name] = {faker.word(): faker.url()}
         with pytest.raises(short_it.parse_config.MultipleLinksNoLinkTypeError):
             instance.get_url(project_name, None)
 
     def test_success(self, faker: Faker, instance: short_it.parse_config.ParseConfigToMachineData) -> None:
         """Test for situation, when everything is success."""
         project_name, link_type, expected_value = faker.word(), faker.word(), faker.url()
-        instance._data[project_name] = {link_type: expected_value}
+        instance._writable_data()[project_name] = {link_type: expected_value}
         assert instance.get_url(project_name, link_type) == expected_value
 
 
@@ -254,3 +263,554 @@ class TestParseConfig:
             },
             simple_key: simple_value,
         }
+
+
+class TestResolveMany:
+    """Tests for :meth:`short_it.parse_config.ParseConfigToMachineData.resolve_many` method."""
+
+    def test_resolve_many(self, faker: Faker, instance: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that every slug gets its destination or error, in the same order."""
+        site, github = faker.url(), faker.url()
+        instance._data = {"site": site, "project": {"github": github, "gh": github}}
+        slugs = ["site", "/Project/GH", "project", "site/gh", "missing", "project/docs", "a/b/c", "project/", ""]
+
+        resolutions = list(instance.resolve_many(iter(slugs)))
+
+        assert [resolution.slug for resolution in resolutions] == slugs
+        assert [resolution.to for resolution in resolutions[:2]] == [site, github]
+        assert [resolution.error for resolution in resolutions[2:]] == [
+            "multiple_links_no_link_type",
+            "one_link_and_link_type_specified",
+            "not_found",
+            "not_found",
+            "invalid_slug",
+            "invalid_slug",
+            "invalid_slug",
+        ]
+        assert resolutions[2].detail == short_it.parse_config.MultipleLinksNoLinkTypeError().message
+        assert resolutions[0].to_json() == {"slug": "site", "to": site}
+        assert resolutions[4].to_json() == {"slug": "missing", "error": "not_found", "detail": "There is no such link"}
+
+
+def test_destinations(faker: Faker, instance: short_it.parse_config.ParseConfigToMachineData) -> None:
+    """Test that every destination is listed once, with paths of all links to it."""
+    site, github = faker.url(), faker.url()
+    instance._data = {"site": site, "project": {"github": github, "gh": github, "site": site}}
+
+    assert instance.destinations() == {site: ["/site", "/project/site"], github: ["/project/github", "/project/gh"]}
+
+
+class TestReload:
+    """Tests for :meth:`short_it.parse_config.ParseConfigToMachineData.reload` method."""
+
+    def test_success(
+        self,
+        mocker: MockerFixture,
+        faker: Faker,
+        tmp_path: pathlib.Path,
+        instance: short_it.parse_config.ParseConfigToMachineData,
+    ) -> None:
+        """Test that the new table is published after reload."""
+        config_path = tmp_path / "config.yml"
+        mocker.patch("short_it.config.CONFIG_PATH", config_path)
+        mocker.patch.dict(short_it.utils.Singleton._instances)
+        simple_key, simple_value = faker.word(), faker.url()
+        config_path.write_text(f"simple:\n  {simple_key}: {simple_value}\n")
+
+        instance.reload()
+
+        assert instance.get_url(simple_key, None) == simple_value
+        assert short_it.config.Config().simple == {simple_key: simple_value}
+        assert config_path.read_text() == f"simple:\n  {simple_key}: {simple_value}\n"
+
+    def test_invalid_config(
+        self,
+        mocker: MockerFixture,
+        faker: Faker,
+        tmp_path: pathlib.Path,
+        instance: short_it.parse_config.ParseConfigToMachineData,
+    ) -> None:
+        """Test that the old table stays live if new config is invalid."""
+        config_path = tmp_path / "config.yml"
+        mocker.patch("short_it.config.CONFIG_PATH", config_path)
+        simple_key, simple_value = faker.word(), faker.url()
+        instance._writable_data()[simple_key] = simple_value
+        config_path.write_text("simple: [\n")
+
+        with pytest.raises(Exception):
+            instance.reload()
+
+        assert instance.get_url(simple_key, None) == simple_value
+
+
+class TestSnapshot:
+    """Tests for loading :class:`short_it.parse_config.ParseConfigToMachineData` from the snapshot."""
+
+    @pytest.fixture(autouse=True)
+    def paths(self, mocker: MockerFixture, tmp_path: pathlib.Path) -> None:
+        """Use temporary config and snapshot, and clean singletons."""
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+
+    def test_compiled_on_first_start(self, mocker: MockerFixture, faker: Faker) -> None:
+        """Test that snapshot is compiled if there is no one, and used on the next start."""
+        simple_key, simple_value = faker.word(), faker.url()
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  {simple_key}: {simple_value}\n")
+
+        assert short_it.parse_config.ParseConfigToMachineData().get_url(simple_key, None) == simple_value
+        assert short_it.config.SNAPSHOT_PATH.exists()
+
+        short_it.utils.Singleton._instances.clear()
+        mocked_load = mocker.patch("short_it.config.Config.load_with_hash")
+        instance = short_it.parse_config.ParseConfigToMachineData()
+
+        mocked_load.assert_not_called()
+        assert instance.get_url(simple_key, None) == simple_value
+        assert short_it.config.Config().sentry.enabled is False
+
+    def test_parsed_once(self, mocker: MockerFixture, faker: Faker) -> None:
+        """Test that the config, parsed on the first start, is not parsed and saved again for the table."""
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  {faker.word()}: {faker.url()}\n")
+        mocked_load = mocker.patch("short_it.config.Config.load_with_hash", wraps=short_it.config.Config.load_with_hash)
+
+        instance = short_it.parse_config.ParseConfigToMachineData()
+
+        mocked_load.assert_called_once()
+        assert instance._config is short_it.config.Config()
+        assert instance.config_hash == short_it.config.current_hash()
+
+    def test_outdated(self, faker: Faker) -> None:
+        """Test that snapshot is ignored, if config was changed."""
+        simple_key = faker.word()
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  {simple_key}: {faker.url()}\n")
+        short_it.parse_config.ParseConfigToMachineData()
+
+        short_it.utils.Singleton._instances.clear()
+        new_value = faker.url()
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  {simple_key}: {new_value}\n")
+
+        assert short_it.parse_config.ParseConfigToMachineData().get_url(simple_key, None) == new_value
+
+    @pytest.mark.parametrize(
+        "backend, store_class",
+        [("sqlite", short_it.stores.SQLiteLinkStore), ("mmap", short_it.stores.MmapLinkStore)],
+    )
+    def test_persistent_backend(
+        self, mocker: MockerFixture, faker: Faker, backend: str, store_class: type[short_it.stores.LinkStore]
+    ) -> None:
+        """Test that links are imported into the persistent store, and it is used on the next start."""
+        simple_key, simple_value, project_name, destination = faker.word(), faker.url(), faker.word(), faker.url()
+        short_it.config.CONFIG_PATH.write_text(
+            f"simple:\n  {simple_key}: {simple_value}\n"
+            f"projects:\n  {project_name}:\n    github:\n      to: {destination}\n"
+            f"store:\n  backend: {backend}\n  sqlite_path: links\n  mmap_path: links\n"
+        )
+        mocker.patch("short_it.config.DATA_DIR", short_it.config.CONFIG_PATH.parent)
+
+        instance = short_it.parse_config.ParseConfigToMachineData()
+        assert isinstance(instance._data, store_class)
+        assert instance.get_url(project_name, "gh") == destination
+        assert (short_it.config.CONFIG_PATH.parent / "links").exists()
+
+        short_it.utils.Singleton._instances.clear()
+        mocked_load = mocker.patch("short_it.config.Config.load_with_hash")
+        instance = short_it.parse_config.ParseConfigToMachineData()
+
+        mocked_load.assert_not_called()
+        assert isinstance(instance._data, store_class)
+        assert instance.get_url(simple_key, None) == simple_value
+        assert instance.get_response(f"/{project_name}/vcs") == short_it.responses.redirect(destination)
+        with pytest.raises(short_it.parse_config.MultipleLinksNoLinkTypeError):
+            instance.get_url(project_name, None)
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_suggestions(self, faker: Faker, enabled: bool) -> None:
+        """Test that suggestions can be disabled."""
+        short_it.config.CONFIG_PATH.write_text(
+            f"simple:\n  mistyped: {faker.url()}\nsuggestions:\n  enabled: {str(enabled).lower()}\n"
+        )
+
+        instance = short_it.parse_config.ParseConfigToMachineData()
+
+        assert instance.suggest("mistypde", None) == (["/mistyped"] if enabled else [])
+        assert (instance.get_response("/mistypde") is short_it.responses.NOT_FOUND) is not enabled
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite", "mmap"])
+    def test_redirect_options(self, mocker: MockerFixture, faker: Faker, backend: str) -> None:
+        """Test that status and max age of links are applied, and survive the snapshot."""
+        simple_value, destination = faker.url(), faker.url()
+        short_it.config.CONFIG_PATH.write_text(
+            "redirect:\n  max_age: 60\n"
+            f"simple:\n  plain: {faker.url()}\n  stable:\n    to: {simple_value}\n    status: 301\n    max_age: 86400\n"
+            f"projects:\n  project:\n    github:\n      to: {destination}\n      status: 308\n"
+            f"store:\n  backend: {backend}\n"
+        )
+        mocker.patch("short_it.config.DATA_DIR", short_it.config.CONFIG_PATH.parent)
+
+        for _ in range(2):  # compiled, then from the snapshot
+            short_it.utils.Singleton._instances.clear()
+            instance = short_it.parse_config.ParseConfigToMachineData()
+
+            assert instance.get_url("stable", None) == simple_value
+            assert instance.get_redirect_options("stable", None) == (301, 86400)
+            assert instance.get_redirect_options("plain", None) == (307, 60)
+            assert instance.get_redirect_options("project", "gh") == (308, 60)
+            assert instance.get_response("/stable") == short_it.responses.redirect(simple_value, 301, 86400)
+            assert instance.get_response("/project/vcs") == short_it.responses.redirect(destination, 308, 60)
+        assert instance.source == ("snapshot" if backend == "memory" else "store")
+
+    def test_invalid_redirect_status(self, faker: Faker) -> None:
+        """Test that only redirect statuses are accepted."""
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  link:\n    to: {faker.url()}\n    status: 200\n")
+
+        with pytest.raises(ValueError, match="Unsupported redirect status 200"):
+            short_it.parse_config.ParseConfigToMachineData()
+
+
+class TestRuntimeChanges:
+    """Tests for changing links of :class:`short_it.parse_config.ParseConfigToMachineData` at runtime."""
+
+    @pytest.fixture
+    def table(self, mocker: MockerFixture, tmp_path: pathlib.Path) -> short_it.parse_config.ParseConfigToMachineData:
+        """Table with a simple link ``site`` and a project ``project`` with ``github`` link."""
+        mocker.patch("short_it.config.DATA_DIR", tmp_path)
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+        short_it.config.CONFIG_PATH.write_text(
+            "simple:\n  site: https://perchun.it\n"
+            "projects:\n  project:\n    github:\n      to: https://github.com/project\n      status: 308\n"
+        )
+        return short_it.parse_config.ParseConfigToMachineData()
+
+    def test_set_simple_link(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that a new simple link is served, and the table is not rebuilt."""
+        data, destination = table._data, faker.url()
+
+        assert table.set_simple_link("new", destination, status=301) == ["/new"]
+
+        assert table._data is data
+        assert table.get_url("new", None) == destination
+        assert table.get_redirect_options("new", None) == (301, None)
+        assert table.get_response("/new") == short_it.responses.redirect(destination, 301)
+        assert table.get_response("/NEW") == short_it.responses.redirect(destination, 301)
+        assert table.get_response("/new/gh") is short_it.parse_config.ONE_LINK_AND_LINK_TYPE_SPECIFIED_RESPONSE
+        assert table.suggest("neww", None) == ["/new"]
+
+    def test_set_project_link(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that a link is added with builtin aliases, other links are kept, and the old project isn't changed."""
+        old_project, destination = table._data["project"], faker.url()
+
+        paths = table.set_project_link(
+            "project", "docs", short_it.config.LinkSettings(to=destination, additional_aliases=["manual"], max_age=60)
+        )
+
+        assert paths == ["/project/docs", "/project/wiki", "/project/documentation", "/project/manual"]
+        assert "docs" not in old_project
+        assert table.get_response("/project/manual") == short_it.responses.redirect(destination, 307, 60)
+        assert table.get_response("/project/gh") == short_it.responses.redirect("https://github.com/project", 308)
+        assert table.get_response("/project") is short_it.parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE
+
+    def test_replace_resets_options(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that replaced link gets default options, if they are not set."""
+        destination = faker.url()
+
+        table.set_project_link("project", "github", short_it.config.LinkSettings(to=destination, aliases=[]))
+
+        assert table.get_redirect_options("project", "github") == (307, None)
+        assert table.get_redirect_options("project", "gh") == (308, None)
+        assert table.get_response("/project/github") == short_it.responses.redirect(destination)
+
+    def test_conflicts(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that simple links and projects can't be changed as each other, and names are checked."""
+        with pytest.raises(short_it.parse_config.LinkConflictError):
+            table.set_simple_link("project", faker.url())
+        with pytest.raises(short_it.parse_config.LinkConflictError):
+            table.set_project_link("site", "github", short_it.config.LinkSettings(to=faker.url()))
+        with pytest.raises(ValueError):
+            table.set_simple_link("Upper", faker.url())
+        with pytest.raises(ValueError):
+            table.set_project_link("project", "link", short_it.config.LinkSettings(to=faker.url(), aliases=["a/b"]))
+        with pytest.raises(ValueError, match="Unsupported redirect status"):
+            table.set_simple_link("new", faker.url(), status=200)
+
+    def test_delete_link_type(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that one alias, or the link with all its aliases can be deleted."""
+        assert table.delete_link("project", "vcs") == ["/project/vcs"]
+        assert table.get_response("/project/vcs") is short_it.responses.NOT_FOUND
+        assert table.get_url("project", "git") == "https://github.com/project"
+
+        deleted = table.delete_link("project", "git", with_aliases=True)
+
+        assert deleted == [
+            "/project/github",
+            "/project/gh",
+            "/project/git",
+            "/project/src",
+            "/project/sources",
+            "/project/source",
+        ]
+        assert table.get_response("/project") is short_it.responses.NOT_FOUND
+        assert "project" not in table._data
+        assert not any(path.startswith("/project") for path in table._redirects)
+
+    def test_delete(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that simple links and whole projects are deleted, and missing ones raise."""
+        assert table.delete_link("site") == ["/site"]
+        assert table.get_response("/site") is short_it.responses.NOT_FOUND
+        assert len(table.delete_link("project")) == 8
+        assert table.suggest("projcet", "gh") == []
+
+        with pytest.raises(short_it.parse_config.LinkNotFoundError):
+            table.delete_link("site")
+        with pytest.raises(short_it.parse_config.LinkNotFoundError):
+            table.delete_link("project", "gh")
+
+    def test_find_links(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that links are found by destinations, and the reverse index follows runtime changes and reloads."""
+        assert table.find_links(to="https://github.com/project") == {
+            "https://github.com/project": [
+                f"/project/{alias}" for alias in ("github", "gh", "git", "src", "sources", "source", "vcs")
+            ]
+        }
+
+        destination = faker.url()
+        table.set_simple_link("new", destination)
+        table.delete_link("project", "git", with_aliases=True)
+
+        assert table.find_links(to=destination) == {destination: ["/new"]}
+        assert table.find_links(host="github.com") == {}
+        short_it.config.CONFIG_PATH.write_text("simple:\n  gh: https://github.com/other\n")
+        table.reload()
+        assert table.find_links(prefix="https://github.com/") == {"https://github.com/other": ["/gh"]}
+
+    def test_read_only_store(self, mocker: MockerFixture, faker: Faker, tmp_path: pathlib.Path) -> None:
+        """Test that links in persistent stores can't be changed at runtime."""
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch("short_it.config.DATA_DIR", tmp_path)
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+        short_it.config.CONFIG_PATH.write_text(f"simple:\n  site: {faker.url()}\nstore:\n  backend: sqlite\n")
+
+        with pytest.raises(short_it.parse_config.ReadOnlyStoreError):
+            short_it.parse_config.ParseConfigToMachineData().set_simple_link("new", faker.url())
+
+    def test_journal(
+        self, mocker: MockerFixture, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData
+    ) -> None:
+        """Test that runtime changes survive restarts and config reloads, and are not saved to the snapshot."""
+        destination = faker.url()
+        table.set_simple_link("new", destination, status=308)
+        table.delete_link("project", "vcs")
+
+        for restart in [True, False]:
+            if restart:
+                short_it.utils.Singleton._instances.clear()
+                mocked_load = mocker.patch(
+                    "short_it.config.Config.load_with_hash", wraps=short_it.config.Config.load_with_hash
+                )
+                table = short_it.parse_config.ParseConfigToMachineData()
+                mocked_load.assert_not_called()  # from the snapshot
+            else:
+                short_it.config.CONFIG_PATH.write_text("simple:\n  site: https://perchun.it/new\n")
+                table.reload()
+
+            assert table.get_response("/new") == short_it.responses.redirect(destination, 308)
+            assert table.get_url("project", "vcs") is None
+        assert table.get_url("project", "gh") == "https://github.com/project"  # the whole project is in the journal
+        assert table.get_url("site", None) == "https://perchun.it/new"
+        cached = short_it.snapshot.load(
+            short_it.config.SNAPSHOT_PATH, short_it.snapshot.hash_file(short_it.config.CONFIG_PATH)
+        )
+        assert cached is not None and "new" not in cached.links
+
+    def test_journal_disabled(self, faker: Faker, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that the journal is not created, if it is disabled."""
+        table._config.journal.enabled = False
+
+        table.set_simple_link("new", faker.url())
+
+        assert not (short_it.config.DATA_DIR / "links.journal").exists()
+
+
+class TestShards:
+    """Tests for links from shards (see :mod:`short_it.shards`) in :class:`short_it.parse_config.ParseConfigToMachineData`."""
+
+    @pytest.fixture
+    def table(self, mocker: MockerFixture, tmp_path: pathlib.Path) -> short_it.parse_config.ParseConfigToMachineData:
+        """Table with a simple link ``site`` in the config, and shards ``team.yml`` and ``other.yml``."""
+        mocker.patch("short_it.config.DATA_DIR", tmp_path)
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch("short_it.config.SHARDS_DIR", tmp_path / "config.d")
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+        short_it.config.CONFIG_PATH.write_text("simple:\n  site: https://perchun.it\n")
+        short_it.config.SHARDS_DIR.mkdir()
+        _write_shard(
+            "team.yml", "projects:\n  project:\n    github:\n      to: https://github.com/project\n      status: 308\n"
+        )
+        _write_shard("other.yaml", "simple:\n  other: https://example.com\n")
+        return short_it.parse_config.ParseConfigToMachineData()
+
+    def test_load(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that links from all shards are merged, and the snapshot is used on the next start."""
+        assert table.source == "config"
+        assert table.get_response("/project/gh") == short_it.responses.redirect("https://github.com/project", 308)
+        assert table.get_url("other", None) == "https://example.com"
+        assert table.get_url("site", None) == "https://perchun.it"
+
+        short_it.utils.Singleton._instances.clear()
+        table = short_it.parse_config.ParseConfigToMachineData()
+
+        assert table.source == "snapshot"
+        assert table.get_url("other", None) == "https://example.com"
+        assert (
+            table.config_hash
+            == short_it.config.current_hash()
+            != short_it.snapshot.hash_file(short_it.config.CONFIG_PATH)
+        )
+
+    @pytest.mark.parametrize("restart", [False, True])
+    def test_incremental_reload(
+        self, mocker: MockerFixture, table: short_it.parse_config.ParseConfigToMachineData, restart: bool
+    ) -> None:
+        """Test that only the changed shard is parsed, and merged into the live table, also after start from the snapshot."""
+        if restart:
+            short_it.utils.Singleton._instances.clear()
+            table = short_it.parse_config.ParseConfigToMachineData()
+        data, responses = table._data, table._responses
+        parse = mocker.patch("short_it.parse_config._parse_shard", wraps=short_it.parse_config._parse_shard)
+        mocked_load = mocker.patch("short_it.config.Config.load_with_hash")
+        _write_shard("team.yml", "projects:\n  project:\n    docs:\n      to: https://project.rtfd.io\n")
+
+        table.reload()
+
+        parse.assert_called_once()
+        mocked_load.assert_not_called()
+        assert table._data is data and table._responses is responses
+        assert table.get_url("project", "gh") is None
+        assert table.get_response("/project/wiki") == short_it.responses.redirect("https://project.rtfd.io", 307)
+        assert table.get_url("other", None) == "https://example.com"
+
+        short_it.utils.Singleton._instances.clear()
+        mocker.stop(mocked_load)
+        assert short_it.parse_config.ParseConfigToMachineData().get_url("project", "wiki") == "https://project.rtfd.io"
+
+    def test_removed_shard(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that links of a removed shard are removed."""
+        (short_it.config.SHARDS_DIR / "other.yaml").unlink()
+
+        table.reload()
+
+        assert table.get_response("/other") == short_it.responses.NOT_FOUND
+        assert table.get_url("project", "gh") == "https://github.com/project"
+
+    def test_conflicts(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that all conflicts are reported, and the old table stays live."""
+        _write_shard("new.yml", "simple:\n  site: https://example.com/site\n  other: https://example.com/other\n")
+
+        with pytest.raises(ValueError) as exc_info:
+            table.reload()
+
+        assert str(exc_info.value) == (
+            "Links are defined in more than one file:\n  'other' in other.yaml, new.yml\n  'site' in config.yml, new.yml"
+        )
+        assert table.get_url("site", None) == "https://perchun.it"
+        assert table.get_url("other", None) == "https://example.com"
+
+    def test_journal(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that links, changed at runtime, are not overridden by changed shards."""
+        table.set_simple_link("other", "https://example.com/runtime")
+        _write_shard("other.yaml", "simple:\n  other: https://example.com/shard\n  another: https://example.com\n")
+
+        table.reload()
+
+        assert table.get_url("other", None) == "https://example.com/runtime"
+        assert table.get_url("another", None) == "https://example.com"
+
+    def test_config_changed(self, mocker: MockerFixture, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that unchanged shards are not parsed again, if ``config.yml`` is changed."""
+        parse = mocker.patch("short_it.parse_config._parse_shard", wraps=short_it.parse_config._parse_shard)
+        short_it.config.CONFIG_PATH.write_text("simple:\n  site: https://perchun.it/new\n")
+
+        table.reload()
+
+        parse.assert_not_called()
+        assert table.get_url("site", None) == "https://perchun.it/new"
+        assert table.get_response("/project/gh") == short_it.responses.redirect("https://github.com/project", 308)
+
+    def test_invalid_shard(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that the invalid shard is reported with its path, and settings are not allowed in shards."""
+        _write_shard("team.yml", "sentry:\n  enabled: true\n")
+
+        with pytest.raises(ValueError, match="Invalid shard .*team.yml: Key 'sentry' not in 'ShardConfig'"):
+            table.reload()
+
+
+def _write_shard(name: str, content: str) -> None:
+    """Write the shard, with ``mtime`` in the future, so it differs even on file systems with low resolution."""
+    path = short_it.config.SHARDS_DIR / name
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(content)
+    os.utime(path, ns=(path.stat().st_atime_ns, max(mtime, path.stat().st_mtime_ns) + 1_000_000_000))
+
+
+class TestTemplatedLinks:
+    """Tests for templated links, see :mod:`short_it.routing`."""
+
+    CONFIG = (
+        "projects:\n  project:\n    github:\n      to: https://github.com/project\n"
+        "simple:\n  site: https://perchun.it\n"
+        "routes:\n"
+        "  /project/issue/{n}: https://github.com/project/issues/{n}\n"
+        "  /site/{page}: https://perchun.it/{page}\n"
+        "  /project/*:\n    to: https://project.rtfd.io\n    status: 308\n"
+    )
+
+    @pytest.fixture(params=["memory", "sqlite"])
+    def table(
+        self, request: pytest.FixtureRequest, mocker: MockerFixture, tmp_path: pathlib.Path
+    ) -> short_it.parse_config.ParseConfigToMachineData:
+        """Table with templated links, with the store in memory and in SQLite."""
+        mocker.patch("short_it.config.DATA_DIR", tmp_path)
+        mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+        mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+        mocker.patch("short_it.config.SHARDS_DIR", tmp_path / "config.d")
+        mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+        short_it.config.CONFIG_PATH.write_text(f"{self.CONFIG}store:\n  backend: {request.param}\n")
+        return short_it.parse_config.ParseConfigToMachineData()
+
+    def test_responses(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that exact links win, and templates are tried for all other paths."""
+        assert table.get_response("/project/github") == short_it.responses.redirect("https://github.com/project")
+        assert table.get_response("/project") is short_it.parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE
+        assert table.get_response("/Project/Issue/7") == dataclasses.replace(
+            short_it.responses.redirect("https://github.com/project/issues/7"), route="/project/issue/{n}"
+        )
+        assert table.get_response("/site/About") == dataclasses.replace(
+            short_it.responses.redirect("https://perchun.it/About"), route="/site/{page}"
+        )
+        assert table.get_response("/project/api/", b"q=1") == dataclasses.replace(
+            short_it.responses.redirect("https://project.rtfd.io/api/?q=1", 308), route="/project/*"
+        )
+        assert table.get_response("/site/a/b") is None
+        assert table.get_response("/unknown") == short_it.responses.NOT_FOUND
+
+    def test_snapshot(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that templates are loaded from the snapshot on the next start."""
+        short_it.utils.Singleton._instances.clear()
+        table = short_it.parse_config.ParseConfigToMachineData()
+
+        assert table.source in ("snapshot", "store")
+        match = table.match_route("/project/issue/7")
+        assert match is not None and match.url == "https://github.com/project/issues/7"
+
+    def test_invalid(self, table: short_it.parse_config.ParseConfigToMachineData) -> None:
+        """Test that the old table stays live, if a template is invalid."""
+        short_it.config.CONFIG_PATH.write_text("routes:\n  /project/{n}/{n}: https://example.com/{n}\n")
+
+        with pytest.raises(ValueError, match="Placeholder 'n' is repeated"):
+            table.reload()
+
+        assert table.match_route("/project/issue/7") is not None
@@ -0,0 +1,205 @@
+"""Tests for :mod:`short_it.responses` module."""
+import functools
+import types
+import unittest.mock
+
+import fastapi
+import fastapi.responses
+import pytest
+
+import short_it.app
+import short_it.config
+import short_it.exc
+import short_it.parse_config
+import short_it.responses
+import short_it.routing
+import short_it.suggestions
+
+DATA: dict[str, dict[str, str] | str] = {
+    "site": "https://perchun.it",
+    "short-it": {
+        **dict.fromkeys(["github", "gh", "src"], "https://github.com/PerchunPak/short-it"),
+        "readme": "https://github.com/PerchunPak/short-it#readme",
+        "spaces": "https://example.com/some path/ünicode?q=1&b=2",
+    },
+    "empty": {},
+    "UPPER": "https://example.com/upper",
+    "mixed": {"Case": "https://example.com/case"},
+}
+REDIRECTS: dict[str, tuple[int, int | None]] = {"/site": (301, 86400), "/short-it/gh": (308, None)}
+
+
+def _reference(
+    path: str,
+    suggestion_index: short_it.suggestions.SuggestionIndex | None = None,
+    redirects: dict[str, tuple[int, int | None]] | None = None,
+    default_redirect: tuple[int, int | None] = short_it.responses.DEFAULT_REDIRECT,
+) -> fastapi.responses.Response | None:
+    """What FastAPI handlers from :mod:`short_it.app` would return for this path."""
+    segments = path[1:].split("/")
+    if len(segments) > 2 or "" in segments or segments[0] == short_it.responses.RESERVED_PREFIX:
+        return None  # not our route, or one of service routes
+
+    instance = short_it.parse_config.ParseConfigToMachineData.__new__(short_it.parse_config.ParseConfigToMachineData)
+    instance._data = DATA
+    instance._suggestions = suggestion_index
+    instance._router = None
+    instance._redirects = redirects or {}
+    instance._config = types.SimpleNamespace(  # type: ignore[assignment] # only the used section
+        redirect=short_it.config.RedirectConfigSection(*default_redirect)
+    )
+    project_name, link_type = segments[0].lower(), segments[1].lower() if len(segments) == 2 else None
+    try:
+        result = instance.get_url(project_name, link_type)
+    except short_it.exc.ShortItException as exception:
+        return fastapi.responses.PlainTextResponse(exception.message)
+    if result is None:
+        request = fastapi.Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+        with unittest.mock.patch("short_it.app.parse_config.ParseConfigToMachineData", return_value=instance):
+            return short_it.app.handle_404(request)
+    status, max_age = instance.get_redirect_options(project_name, link_type)
+    return fastapi.responses.RedirectResponse(
+        result,
+        status_code=status,
+        headers=None if max_age is None else {"cache-control": short_it.responses.cache_control(max_age)},
+    )
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/site",
+        "/SITE",
+        "/site/gh",
+        "/short-it",
+        "/short-it/github",
+        "/Short-It/GH",
+        "/short-it/src",
+        "/short-it/readme",
+        "/short-it/spaces",
+        "/short-it/unknown",
+        "/empty",
+        "/empty/gh",
+        "/upper",
+        "/UPPER",
+        "/mixed/case",
+        "/mixed/Case",
+        "/unknown",
+        "/unknown/gh",
+        "/",
+        "/site/",
+        "//site",
+        "/short-it/github/more",
+        "/-/stats",
+    ],
+)
+@pytest.mark.parametrize("default_redirect", [short_it.responses.DEFAULT_REDIRECT, (302, 60)])
+@pytest.mark.parametrize("redirects", [{}, REDIRECTS])
+def test_same_as_handlers(
+    path: str, redirects: dict[str, tuple[int, int | None]], default_redirect: tuple[int, int | None]
+) -> None:
+    """Test that pre-built responses are byte-for-byte the same, as FastAPI handlers return."""
+    table = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA, None, redirects, default_redirect)
+    expected = _reference(path, None, redirects, default_redirect)
+
+    response = table.resolve(path)
+    if expected is None:
+        assert response is None
+        return
+
+    assert response is not None
+    assert (response.status, list(response.headers), response.body) == (
+        expected.status_code,
+        expected.raw_headers,
+        expected.body,
+    )
+
+
+@pytest.mark.parametrize(
+    "path", ["/sight", "/short-it/githb", "/Short-Itt/GH", "/shortit", "/unknown", "/short-it/unknown", "/upper/x"]
+)
+def test_suggestions_same_as_handlers(path: str) -> None:
+    """Test that 404 pages with suggestions are the same, as FastAPI handler returns."""
+    suggestion_index = short_it.suggestions.SuggestionIndex(DATA)
+    suggestion_index.build()
+    table = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA, suggestion_index)
+    expected = _reference(path, suggestion_index)
+    assert expected is not None
+
+    response = table.resolve(path)
+    assert response is not None
+    assert (response.status, list(response.headers), response.body) == (404, expected.raw_headers, expected.body)
+
+
+@pytest.mark.parametrize("redirects", [{}, REDIRECTS])
+@pytest.mark.parametrize(
+    "path", ["/site", "/Short-It/GH", "/short-it/github", "/short-it", "/site/gh", "/unknown", "/a/b/c", "/site/"]
+)
+def test_lazy_same_as_prebuilt(path: str, redirects: dict[str, tuple[int, int | None]]) -> None:
+    """Test that lazy table (for stores, which are not in memory) returns the same responses."""
+    prebuilt = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA, None, redirects, (302, 60))
+    lazy = short_it.responses.LazyResponseTable(
+        functools.partial(
+            short_it.parse_config._lookup_response, DATA, redirect_options=redirects, default_redirect=(302, 60)
+        )
+    )
+
+    assert lazy.resolve(path) == prebuilt.resolve(path)
+
+
+ROUTER = short_it.routing.Router(
+    {
+        "/site/{page}": "https://perchun.it/{page}",
+        "/short-it/*": "https://short-it.rtfd.io",
+        "/a/b/c": "https://abc.com",
+    }
+)
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/short-it/gh", "https://github.com/PerchunPak/short-it"),
+        ("/short-it", short_it.parse_config.MULTIPLE_LINKS_NO_LINK_TYPE_RESPONSE),
+        ("/Site/About", "https://perchun.it/About"),
+        ("/short-it/unknown", "https://short-it.rtfd.io/unknown"),
+        ("/short-it/", "https://short-it.rtfd.io"),
+        ("/A/B/C", "https://abc.com"),
+        ("/unknown", short_it.responses.NOT_FOUND),
+        ("/site/a/b", None),
+        ("/a/b", short_it.responses.NOT_FOUND),
+        ("/-/stats", None),
+    ],
+)
+def test_templated_links(path: str, expected: str | short_it.responses.PrebuiltResponse | None) -> None:
+    """Test that exact links and the error for a project win, and templates are tried for all other paths."""
+    prebuilt = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA, None, {}, router=ROUTER)
+    lazy = short_it.responses.LazyResponseTable(
+        functools.partial(short_it.parse_config._lookup_response, DATA), router=ROUTER.response
+    )
+
+    response = prebuilt.resolve(path)
+    assert lazy.resolve(path) == response
+    if isinstance(expected, str):
+        assert response is not None and (b"location", expected.encode()) in response.headers
+    else:
+        assert response == expected
+
+
+def test_aliases_share_response() -> None:
+    """Test that all aliases of one link point to the same response object."""
+    table = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA)
+    assert table.resolve("/short-it/github") is table.resolve("/short-it/gh") is table.resolve("/short-it/src")
+
+
+def test_cacheable_redirect() -> None:
+    """Test that options of the link override the default ones, only for this link."""
+    table = short_it.parse_config.ParseConfigToMachineData._build_responses(DATA, None, REDIRECTS)
+
+    site = table.resolve("/site")
+    assert site is not None
+    assert site.status == 301
+    assert (b"cache-control", b"public, max-age=86400") in site.headers
+    gh, github = table.resolve("/short-it/gh"), table.resolve("/short-it/github")
+    assert gh is not None and github is not None
+    assert (gh.status, github.status) == (308, 307)
@@ -0,0 +1,126 @@
+"""Tests for :mod:`short_it.reverse_index` module."""
+import json
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.cli
+import short_it.reverse_index
+
+REPO = "https://github.com/PerchunPak/short-it"
+
+
+@pytest.fixture
+def data() -> dict[str, dict[str, str] | str]:
+    """Table with a moved repository and a dead domain, linked from many places."""
+    return {
+        "site": "https://perchun.it",
+        "repo": REPO,
+        "short-it": {"github": REPO, "gh": REPO, "issues": f"{REPO}/issues", "docs": "https://docs.old.dev/short-it"},
+        "other": {"github": "https://github.com/PerchunPak/other", "blog": "https://blog.old.dev/post?id=1"},
+        "dead": "https://old.dev",
+        "mail": "mailto:me@perchun.it",
+    }
+
+
+@pytest.fixture
+def index(data: dict[str, dict[str, str] | str]) -> short_it.reverse_index.ReverseIndex:
+    """Reverse index over the table."""
+    return short_it.reverse_index.ReverseIndex(data)
+
+
+def test_exact(index: short_it.reverse_index.ReverseIndex) -> None:
+    """Test that all aliases of the destination are found, and only it."""
+    assert index.query(to=REPO) == {REPO: ["/repo", "/short-it/github", "/short-it/gh"]}
+    assert index.query(to=REPO + "/") == {}
+
+
+def test_prefix(index: short_it.reverse_index.ReverseIndex) -> None:
+    """Test that destinations with the prefix are found in sorted order."""
+    assert index.query(prefix="https://github.com/PerchunPak/") == {
+        "https://github.com/PerchunPak/other": ["/other/github"],
+        REPO: ["/repo", "/short-it/github", "/short-it/gh"],
+        f"{REPO}/issues": ["/short-it/issues"],
+    }
+    assert list(index.query(prefix="https://github.com/PerchunPak/", limit=2)) == [
+        "https://github.com/PerchunPak/other",
+        REPO,
+    ]
+    assert index.query(prefix="https://gitlab.com/") == {}
+
+
+def test_host(index: short_it.reverse_index.ReverseIndex) -> None:
+    """Test that the domain is found with its subdomains, but not other domains, which end the same."""
+    assert index.query(host="OLD.dev") == {
+        "https://blog.old.dev/post?id=1": ["/other/blog"],
+        "https://docs.old.dev/short-it": ["/short-it/docs"],
+        "https://old.dev": ["/dead"],
+    }
+    assert index.query(host="d.dev") == {}
+
+
+def test_duplicates(index: short_it.reverse_index.ReverseIndex) -> None:
+    """Test that only destinations, which links of different projects redirect to, are duplicates."""
+    assert index.query(duplicates=True) == {REPO: ["/repo", "/short-it/github", "/short-it/gh"]}
+
+
+def test_replace(data: dict[str, dict[str, str] | str], index: short_it.reverse_index.ReverseIndex) -> None:
+    """Test that changes of the table are applied to the built index, and removed destinations disappear."""
+    index.replace("ignored", None, "https://ignored.dev")  # not built yet, it is read from the table
+    index.build()
+    moved = "https://codeberg.org/PerchunPak/short-it"
+
+    index.replace("short-it", data["short-it"], {"github": moved, "gh": moved, "issues": f"{REPO}/issues"})
+    index.replace("dead", data["dead"], None)
+    index.replace("new", None, "https://new.old.dev")
+
+    assert index.query(to=REPO) == {REPO: ["/repo"]}
+    assert index.query(prefix="https://codeberg.org/") == {moved: ["/short-it/github", "/short-it/gh"]}
+    assert list(index.query(host="old.dev")) == ["https://blog.old.dev/post?id=1", "https://new.old.dev"]
+    assert index.query(duplicates=True) == {}
+
+
+@pytest.mark.parametrize("query", [{}, {"to": REPO, "prefix": "https://"}, {"host": "old.dev", "duplicates": True}])
+def test_invalid_query(index: short_it.reverse_index.ReverseIndex, query: dict[str, str | bool]) -> None:
+    """Test that exactly one kind of query must be set."""
+    with pytest.raises(ValueError, match="Set exactly one of"):
+        index.query(**query)  # type: ignore[arg-type]
+
+
+def test_many_aliases() -> None:
+    """Test that prefix queries don't scan the whole table, even if it is huge."""
+    urls = [f"https://github.com/user-{number % 1000}/project-{number}" for number in range(100_000)]
+    data: dict[str, dict[str, str] | str] = {
+        f"project-{number}": {"github": url, "gh": url} for number, url in enumerate(urls)
+    }
+    index = short_it.reverse_index.ReverseIndex(data)
+    index.build()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        found = index.query(prefix="https://github.com/user-7/")
+
+    assert len(found) == 100
+    assert time.perf_counter() - start < 1
+    assert found["https://github.com/user-7/project-7"] == ["/project-7/github", "/project-7/gh"]
+
+
+def test_cli(mocker: MockerFixture, data: dict[str, dict[str, str] | str]) -> None:
+    """Test that found links are printed, as text or JSON."""
+    table = mocker.patch("short_it.parse_config.ParseConfigToMachineData").return_value
+    table.find_links.side_effect = short_it.reverse_index.ReverseIndex(data).query
+    mocked_print = mocker.patch("builtins.print")
+
+    short_it.cli.main(["find-links", "--host", "old.dev", "--limit", "1"])
+    short_it.cli.main(["find-links", "--to", REPO, "--json"])
+
+    assert [call.args[0] for call in mocked_print.call_args_list[:2]] == [
+        "https://blog.old.dev/post?id=1",
+        "    /other/blog",
+    ]
+    assert json.loads(mocked_print.call_args.args[0]) == [
+        {"to": REPO, "paths": ["/repo", "/short-it/github", "/short-it/gh"]}
+    ]
+    with pytest.raises(SystemExit):
+        short_it.cli.main(["find-links", "--to", REPO, "--host", "old.dev"])
@@ -0,0 +1,123 @@
+"""Tests for :mod:`short_it.routing` module."""
+import dataclasses
+
+import pytest
+
+import short_it.responses
+import short_it.routing
+
+ROUTES: dict[str, str | dict[str, object]] = {
+    "/short-it/issue/{n}": "https://github.com/PerchunPak/short-it/issues/{n}",
+    "/short-it/issue/new": "https://github.com/PerchunPak/short-it/issues/new/choose",
+    "/gh/{repo}/*": "https://github.com/PerchunPak/{repo}",
+    "/gh/{owner}/{repo}/pulls": "https://github.com/{owner}/{repo}/pulls",
+    "docs/*": {"to": "https://docs.example.com/en/latest/?ref=short#top", "status": 308, "max_age": 60},
+    "/{anything}/old": "https://old.example.com/{anything}",
+}
+
+
+@pytest.fixture
+def router() -> short_it.routing.Router:
+    """Router with all kinds of templates."""
+    return short_it.routing.Router(ROUTES)
+
+
+@pytest.mark.parametrize(
+    ("path", "query_string", "pattern", "url"),
+    [
+        ("/short-it/issue/12", b"", "/short-it/issue/{n}", "https://github.com/PerchunPak/short-it/issues/12"),
+        ("/Short-It/ISSUE/AbC", b"x=1", "/short-it/issue/{n}", "https://github.com/PerchunPak/short-it/issues/AbC"),
+        ("/short-it/issue/new", b"", "/short-it/issue/new", "https://github.com/PerchunPak/short-it/issues/new/choose"),
+        (
+            "/short-it/issue/a b?#",
+            b"",
+            "/short-it/issue/{n}",
+            "https://github.com/PerchunPak/short-it/issues/a%20b%3F%23",
+        ),
+        ("/gh/repo", b"", "/gh/{repo}/*", "https://github.com/PerchunPak/repo"),
+        ("/gh/repo/", b"", "/gh/{repo}/*", "https://github.com/PerchunPak/repo"),
+        (
+            "/gh/repo/blob/main/a b.py",
+            b"plain=1",
+            "/gh/{repo}/*",
+            "https://github.com/PerchunPak/repo/blob/main/a%20b.py?plain=1",
+        ),
+        ("/gh/me/repo/pulls", b"", "/gh/{owner}/{repo}/pulls", "https://github.com/me/repo/pulls"),
+        ("/gh/me/repo/pulls/1", b"", "/gh/{repo}/*", "https://github.com/PerchunPak/me/repo/pulls/1"),
+        ("/docs", b"", "docs/*", "https://docs.example.com/en/latest/?ref=short#top"),
+        ("/docs/api/", b"q=1", "docs/*", "https://docs.example.com/en/latest/api/?ref=short&q=1#top"),
+        ("/short-it/old", b"", "/{anything}/old", "https://old.example.com/short-it"),
+    ],
+)
+def test_match(router: short_it.routing.Router, path: str, query_string: bytes, pattern: str, url: str) -> None:
+    """Test that the most specific template matches, and values are substituted."""
+    match = router.match(path, query_string)
+
+    assert match is not None
+    assert (match.route.pattern, match.url) == (pattern, url)
+
+
+@pytest.mark.parametrize("path", ["/short-it/issue", "/short-it/issue/", "/short-it/issue/1/2", "/gh", "/-/old", "/"])
+def test_no_match(router: short_it.routing.Router, path: str) -> None:
+    """Test that paths, which no template matches, and service paths are not matched."""
+    assert router.match(path) is None
+
+
+def test_response(router: short_it.routing.Router) -> None:
+    """Test that the redirect has options of the template, and is counted for its pattern."""
+    assert router.response("/docs/api") == dataclasses.replace(
+        short_it.responses.redirect("https://docs.example.com/en/latest/api?ref=short#top", 308, 60), route="docs/*"
+    )
+    assert router.response("/short-it/issue/1", b"") == dataclasses.replace(
+        short_it.responses.redirect("https://github.com/PerchunPak/short-it/issues/1"), route="/short-it/issue/{n}"
+    )
+    assert router.response("/nope") is None
+    assert len(router) == len(ROUTES)
+
+
+def test_default_redirect() -> None:
+    """Test that templates without options have the default ones."""
+    router = short_it.routing.Router({"/a/*": "https://example.com"}, (301, 10))
+    match = router.match("/a")
+
+    assert match is not None
+    assert match.route.redirect == (301, 10)
+
+
+@pytest.mark.parametrize(
+    ("routes", "error"),
+    [
+        ({"/-/stats/*": "https://example.com"}, "must not be empty or start with '-'"),
+        ({"/Upper": "https://example.com"}, "Invalid segment 'Upper'"),
+        ({"/a//b": "https://example.com"}, "Invalid segment ''"),
+        ({"/a/*/b": "https://example.com"}, "Invalid segment '*'"),
+        ({"/a/v{n}": "https://example.com/{n}"}, "Invalid segment 'v{n}'"),
+        ({"/a/{n}/{n}": "https://example.com/{n}"}, "Placeholder 'n' is repeated"),
+        ({"/a/{n}": "https://example.com/{m}"}, "unknown placeholder '{m}'"),
+        ({"/a/{n}": "https://example.com", "a/{m}": "https://example.org"}, "'/a/{n}' and 'a/{m}' match the same"),
+    ],
+)
+def test_invalid(routes: dict[str, str], error: str) -> None:
+    """Test that invalid templates are reported with the pattern."""
+    with pytest.raises(ValueError, match=error.replace("*", r"\*").replace("{", r"\{")):
+        short_it.routing.Router(routes)
+
+
+def test_cost_does_not_depend_on_amount() -> None:
+    """Test that matching visits only nodes on the path, no matter how many templates there are."""
+    router = short_it.routing.Router(
+        {f"/project-{index}/issue/{{n}}": f"https://example.com/{index}/{{n}}" for index in range(10_000)}
+    )
+    visited = 0
+    find = router._find
+
+    def counting_find(*args: object) -> object:
+        nonlocal visited
+        visited += 1
+        return find(*args)  # type: ignore[arg-type]
+
+    router._find = counting_find  # type: ignore[assignment,method-assign]
+    match = router.match("/project-9999/issue/1")
+
+    assert match is not None and match.url == "https://example.com/9999/1"
+    assert visited == 4
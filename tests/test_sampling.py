@@ -0,0 +1,97 @@
+"""Tests for :mod:`short_it.sampling` module."""
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.config
+import short_it.sampling
+import short_it.utils
+
+
+class Clock:
+    """Clock, which is moved manually."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Current time."""
+        return self.now
+
+
+def _context(path: str, parent_sampled: bool | None = None) -> dict[str, object]:
+    """Sampling context, like Sentry's ASGI middleware creates."""
+    return {
+        "transaction_context": {"name": path, "op": "http.server"},
+        "parent_sampled": parent_sampled,
+        "asgi_scope": {"type": "http", "path": path},
+    }
+
+
+def test_route_rates() -> None:
+    """Test that route rates override the default one."""
+    sampler = short_it.sampling.TracesSampler(0.5, {"/-/metrics": 0.0, "/-/stats": 1.0})
+
+    assert sampler(_context("/-/metrics")) == 0.0
+    assert sampler(_context("/-/stats")) == 1.0
+    assert sampler(_context("/project/gh")) == 0.5
+    assert sampler({"transaction_context": {"name": "/-/stats"}}) == 1.0
+
+
+@pytest.mark.parametrize("parent_sampled", [True, False])
+def test_parent_decision_is_respected(parent_sampled: bool) -> None:
+    """Test that traces, started by other services, are not broken."""
+    sampler = short_it.sampling.TracesSampler(0.5, {"/a": 0.0}, max_traces_per_second=1)
+
+    assert sampler(_context("/a", parent_sampled)) == float(parent_sampled)
+
+
+def test_budget() -> None:
+    """Test that rates are lowered under load, and restored when load is gone."""
+    clock = Clock()
+    sampler = short_it.sampling.TracesSampler(1.0, {"/-/stats": 0.5}, max_traces_per_second=10, clock=clock)
+
+    for _ in range(10):
+        assert sampler(_context("/project/gh")) == 1.0
+
+    # 1000 requests per second, expected 1000 traces per second
+    clock.now = 1.0
+    for _ in range(1000):
+        sampler(_context("/project/gh"))
+    clock.now = 2.0
+    assert sampler(_context("/project/gh")) == pytest.approx(0.01)
+    assert sampler(_context("/-/stats")) == pytest.approx(0.005)
+
+    clock.now = 3.0
+    sampler(_context("/project/gh"))
+    clock.now = 4.0
+    assert sampler(_context("/project/gh")) == 1.0
+
+
+def test_no_budget() -> None:
+    """Test that rates are not scaled, if the budget is disabled."""
+    clock = Clock()
+    sampler = short_it.sampling.TracesSampler(1.0, clock=clock)
+    for _ in range(1000):
+        sampler(_context("/project/gh"))
+    clock.now = 2.0
+
+    assert sampler(_context("/project/gh")) == 1.0
+
+
+def test_start_sentry(mocker: MockerFixture, faker: Faker) -> None:
+    """Test that Sentry is started with the sampler and the profiling rate from config."""
+    mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+    sentry = short_it.config.SentryConfigSection(
+        enabled=True, dsn=faker.url(), traces_sample_rate=0.3, profiles_sample_rate=0.1
+    )
+    mocker.patch("short_it.config.Config").return_value.sentry = sentry
+    init = mocker.patch("sentry_sdk.init")
+
+    short_it.utils.start_sentry()
+
+    kwargs = init.call_args.kwargs
+    assert kwargs["profiles_sample_rate"] == 0.1
+    assert "_experiments" not in kwargs
+    assert kwargs["traces_sampler"](_context("/project/gh")) == 0.3
+    assert kwargs["traces_sampler"](_context("/-/metrics")) == 0.0
@@ -0,0 +1,107 @@
+"""Tests for :mod:`short_it.server` module."""
+import socket
+
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.config
+import short_it.server
+from benchmarks import load
+
+
+@pytest.fixture
+def server_config(mocker: MockerFixture) -> short_it.config.ServerConfigSection:
+    """Mocked ``server`` config section."""
+    server_config = short_it.config.ServerConfigSection(backlog=16, keep_alive=3, limit_concurrency=100)
+    config = mocker.patch("short_it.server.config_module.Config").return_value
+    config.server = server_config
+    config.admin = short_it.config.AdminConfigSection()
+    return server_config
+
+
+def test_single_worker(mocker: MockerFixture, faker: Faker, server_config: short_it.config.ServerConfigSection) -> None:
+    """Test that a single worker is served directly by uvicorn, with settings from the config."""
+    mocked_server = mocker.patch("uvicorn.Server")
+    mocked_master = mocker.patch("short_it.server.Master")
+    port = faker.port_number()
+
+    short_it.server.run(mocker.Mock(), "127.0.0.1", port)
+
+    uvicorn_config = mocked_server.call_args.args[0]
+    assert (uvicorn_config.port, uvicorn_config.backlog) == (port, 16)
+    assert (uvicorn_config.timeout_keep_alive, uvicorn_config.limit_concurrency) == (3, 100)
+    mocked_server.return_value.run.assert_called_once_with()
+    mocked_master.assert_not_called()
+
+
+@pytest.mark.parametrize("workers, expected", [(4, 4), (0, 8)])
+def test_multiple_workers(
+    mocker: MockerFixture,
+    server_config: short_it.config.ServerConfigSection,
+    workers: int,
+    expected: int,
+) -> None:
+    """Test that the table is built and frozen before forking workers."""
+    server_config.workers = workers
+    mocker.patch("os.cpu_count", return_value=8)
+    manager = mocker.Mock()
+    mocker.patch("short_it.server.bind", manager.bind)
+    mocker.patch("short_it.server.parse_config.ParseConfigToMachineData", manager.preload)
+    mocker.patch("gc.freeze", manager.freeze)
+    mocker.patch("short_it.server.Master", manager.master)
+    manager.master.return_value.run.return_value = 0
+
+    short_it.server.run(mocker.Mock(), "127.0.0.1", 8000)
+
+    assert [call[0] for call in manager.mock_calls] == [
+        "bind",
+        "preload",
+        "preload().build_suggestions",
+        "freeze",
+        "master",
+        "master().run",
+    ]
+    assert manager.master.call_args.args[1:] == (manager.bind.return_value, expected)
+
+
+@pytest.mark.parametrize("workers", [2, 0])
+def test_admin_with_multiple_workers(
+    mocker: MockerFixture, faker: Faker, server_config: short_it.config.ServerConfigSection, workers: int
+) -> None:
+    """Test that the server refuses to start, if the admin API would change only one of the workers."""
+    server_config.workers = workers
+    mocker.patch("os.cpu_count", return_value=8)
+    short_it.config.Config().admin.token = faker.password()  # mocked
+    mocked_master = mocker.patch("short_it.server.Master")
+
+    with pytest.raises(short_it.server.AdminWithWorkersError):
+        short_it.server.run(mocker.Mock(), "127.0.0.1", 8000)
+    mocked_master.assert_not_called()
+
+
+def test_bind() -> None:
+    """Test that the shared socket is listening and can be inherited by workers."""
+    with short_it.server.bind("127.0.0.1", 0, 16) as sock:
+        assert sock.get_inheritable()
+        socket.create_connection(sock.getsockname(), timeout=1).close()
+
+
+def test_crashing_workers(mocker: MockerFixture) -> None:
+    """Test that workers, which crash at startup, are restarted with growing delays, and then the master gives up."""
+    mocker.patch("uvicorn.Server", side_effect=OSError("address already in use"))  # in forked workers
+    mocked_sleep = mocker.patch("short_it.server.time.sleep")
+
+    with short_it.server.bind("127.0.0.1", 0, 16) as sock:
+        exit_code = short_it.server.Master(mocker.Mock(), sock, 2).run()
+
+    assert exit_code == 1
+    assert [call.args[0] for call in mocked_sleep.call_args_list] == pytest.approx([0.1, 0.2, 0.4, 0.8])
+
+
+def test_real_workers() -> None:
+    """Smoke test against a real server with a few workers."""
+    report = load.run(size=10, clients=4, duration=0.3, workers=2)
+
+    assert report["total"]["requests"] > 0
+    assert report["total"]["unexpected_statuses"] == 0
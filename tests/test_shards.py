@@ -0,0 +1,173 @@
+"""Tests for :mod:`short_it.shards` module."""
+import functools
+import os
+import pathlib
+
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.parse_config
+import short_it.shards
+import short_it.snapshot
+
+PARSE = functools.partial(short_it.parse_config._parse_shard, default_redirect=(307, None))
+
+
+@pytest.fixture
+def directory(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Config directory with two shards, and a file which is not a shard."""
+    directory = tmp_path / "config.d"
+    directory.mkdir()
+    (directory / "team.yml").write_text("simple:\n  team: https://example.com/team\n")
+    (directory / "other.yaml").write_text("projects:\n  project:\n    github:\n      to: https://github.com/project\n")
+    (directory / "README.md").write_text("not a shard\n")
+    return directory
+
+
+def _bump_mtime(path: pathlib.Path) -> None:
+    """Make sure that ``mtime`` is different, even on file systems with low resolution."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_discover(directory: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    """Test that only YAML files are shards, and a missing directory has no shards."""
+    assert short_it.shards.discover(directory) == [directory / "other.yaml", directory / "team.yml"]
+    assert short_it.shards.discover(tmp_path / "missing") == []
+
+
+def test_combined_hash(faker: Faker) -> None:
+    """Test that the hash is the one of ``config.yml`` without shards, and depends on names and content of shards."""
+    config_hash, shard_hash = faker.binary(length=32), faker.binary(length=32)
+
+    assert short_it.shards.combined_hash(config_hash, {}) == config_hash
+    assert short_it.shards.combined_hash(None, {"team.yml": shard_hash}) is None
+    assert (
+        len(
+            {
+                short_it.shards.combined_hash(config_hash, {"team.yml": shard_hash}),
+                short_it.shards.combined_hash(config_hash, {"other.yml": shard_hash}),
+                short_it.shards.combined_hash(config_hash, {"team.yml": faker.binary(length=32)}),
+            }
+        )
+        == 3
+    )
+
+
+class TestLoad:
+    """Tests for :func:`short_it.shards.load` function."""
+
+    def test_first_load(self, directory: pathlib.Path) -> None:
+        """Test that all shards are parsed."""
+        changes = short_it.shards.load(directory, {}, PARSE, workers=1)
+
+        assert changes.parsed == {
+            "team.yml": ({"team": "https://example.com/team"}, {}),
+            "other.yaml": (
+                {
+                    "project": dict.fromkeys(
+                        ["github", "gh", "git", "src", "sources", "source", "vcs"], "https://github.com/project"
+                    )
+                },
+                {},
+            ),
+        }
+        assert {name: shard.links for name, shard in changes.shards.items()} == {
+            "other.yaml": ("project",),
+            "team.yml": ("team",),
+        }
+        assert changes.removed == []
+
+    def test_incremental(self, mocker: MockerFixture, directory: pathlib.Path) -> None:
+        """Test that only new and changed shards are parsed, and touched ones are only hashed."""
+        previous = short_it.shards.load(directory, {}, PARSE, workers=1).shards
+        parse = mocker.Mock(wraps=PARSE)
+        (directory / "team.yml").write_text("simple:\n  team: https://example.com/new\n")
+        _bump_mtime(directory / "team.yml")
+        _bump_mtime(directory / "other.yaml")
+        (directory / "new.yml").write_text("simple:\n  new: https://example.com/new\n")
+
+        changes = short_it.shards.load(directory, previous, parse, workers=1)
+
+        assert sorted(changes.parsed) == ["new.yml", "team.yml"]
+        assert parse.call_count == 2
+        assert changes.shards["other.yaml"].stat != previous["other.yaml"].stat
+        assert changes.changed == {"new.yml", "team.yml"}
+
+        (directory / "new.yml").unlink()
+        changes = short_it.shards.load(directory, changes.shards, parse, workers=1)
+
+        assert parse.call_count == 2
+        assert changes.parsed == {}
+        assert changes.removed == ["new.yml"]
+
+    def test_parallel(self, mocker: MockerFixture, directory: pathlib.Path) -> None:
+        """Test that shards, parsed in worker processes, are the same as parsed in this one."""
+        mocker.patch("short_it.shards.PARALLEL_MIN_BYTES", 0)
+        for index in range(8):
+            (directory / f"team{index}.yml").write_text(
+                f"simple:\n  link{index}:\n    to: https://example.com\n    status: 301\n"
+            )
+
+        parallel = short_it.shards.load(directory, {}, PARSE, workers=2)
+
+        assert parallel == short_it.shards.load(directory, {}, PARSE, workers=1)
+        assert parallel.parsed["team3.yml"] == ({"link3": "https://example.com"}, {"/link3": (301, None)})
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_invalid(self, mocker: MockerFixture, directory: pathlib.Path, workers: int) -> None:
+        """Test that the error has the path to the invalid shard, also from worker processes."""
+        mocker.patch("short_it.shards.PARALLEL_MIN_BYTES", 0)
+        (directory / "team.yml").write_text("simple:\n  team:\n    to: https://example.com\n    status: 200\n")
+
+        with pytest.raises(
+            ValueError, match=f"Invalid shard {directory / 'team.yml'}: Unsupported redirect status 200"
+        ):
+            short_it.shards.load(directory, {}, PARSE, workers=workers)
+
+
+class TestCheckConflicts:
+    """Tests for :func:`short_it.shards.check_conflicts` function."""
+
+    def test_no_conflicts(self) -> None:
+        """Test that a link can move between changed shards."""
+        short_it.shards.check_conflicts(
+            {"site", "project"},
+            {"project": "old.yml"},
+            {"old.yml"},
+            {"new.yml": ({"project": "https://example.com"}, {})},
+        )
+
+    def test_conflicts(self) -> None:
+        """Test that all conflicts, with ``config.yml``, unchanged and changed shards, are reported at once."""
+        with pytest.raises(ValueError) as exc_info:
+            short_it.shards.check_conflicts(
+                {"site", "project"},
+                {"project": "team.yml"},
+                set(),
+                {
+                    "a.yml": ({"site": "https://example.com", "new": "https://example.com"}, {}),
+                    "b.yml": ({"project": "https://example.com", "new": "https://example.com"}, {}),
+                },
+            )
+
+        assert str(exc_info.value) == (
+            "Links are defined in more than one file:\n"
+            "  'new' in a.yml, b.yml\n"
+            "  'project' in team.yml, b.yml\n"
+            "  'site' in config.yml, a.yml"
+        )
+
+
+def test_merge(faker: Faker) -> None:
+    """Test that links and redirect options of all shards are merged, and ``config.yml`` table is not changed."""
+    config_links: short_it.shards.Links = ({"site": faker.url()}, {"/site": (301, None)})
+    shard_links: short_it.shards.Links = ({"team": faker.url()}, {"/team": (308, 60)})
+
+    assert short_it.shards.merge(config_links, []) is config_links
+    assert short_it.shards.merge(config_links, [shard_links]) == (
+        {**config_links[0], **shard_links[0]},
+        {**config_links[1], **shard_links[1]},
+    )
+    assert config_links[0].keys() == {"site"}
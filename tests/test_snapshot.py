@@ -0,0 +1,74 @@
+"""Tests for :mod:`short_it.snapshot` module."""
+import pathlib
+
+import pytest
+from faker import Faker
+
+import short_it.snapshot
+
+
+@pytest.fixture
+def snapshot(faker: Faker) -> short_it.snapshot.Snapshot:
+    """Create a random snapshot."""
+    destination = faker.url()
+    return short_it.snapshot.Snapshot(
+        config_hash=short_it.snapshot.hash_bytes(faker.binary(length=64)),
+        settings={"sentry": {"enabled": faker.pybool(), "dsn": faker.url()}},
+        links={
+            faker.word(): faker.url(),
+            faker.word(): dict.fromkeys([faker.word() for _ in range(5)], destination),
+        },
+        redirects={f"/{faker.word()}": (301, faker.pyint()), f"/{faker.word()}/gh": (308, None)},
+        shards={f"{faker.word()}.yml": (short_it.snapshot.hash_bytes(faker.binary(length=64)), (faker.word(),))},
+    )
+
+
+def test_round_trip(tmp_path: pathlib.Path, snapshot: short_it.snapshot.Snapshot) -> None:
+    """Test that saved snapshot can be loaded back."""
+    path = tmp_path / "config.snapshot"
+    short_it.snapshot.save(path, snapshot)
+
+    assert short_it.snapshot.load(path, snapshot.config_hash) == snapshot
+    assert short_it.snapshot.load_settings(path, snapshot.config_hash) == snapshot.settings
+    assert not (tmp_path / "config.snapshot.tmp").exists()
+
+
+def test_hash_mismatch(faker: Faker, tmp_path: pathlib.Path, snapshot: short_it.snapshot.Snapshot) -> None:
+    """Test that outdated snapshot is ignored."""
+    path = tmp_path / "config.snapshot"
+    short_it.snapshot.save(path, snapshot)
+    other_hash = short_it.snapshot.hash_bytes(faker.binary(length=64))
+
+    assert short_it.snapshot.load(path, other_hash) is None
+    assert short_it.snapshot.load_settings(path, other_hash) is None
+
+
+@pytest.mark.parametrize("config_hash_is_none", [True, False])
+def test_no_snapshot(tmp_path: pathlib.Path, snapshot: short_it.snapshot.Snapshot, config_hash_is_none: bool) -> None:
+    """Test that missing snapshot (or missing config) is handled."""
+    path = tmp_path / "config.snapshot"
+    if config_hash_is_none:
+        short_it.snapshot.save(path, snapshot)
+
+    config_hash = None if config_hash_is_none else snapshot.config_hash
+    assert short_it.snapshot.load(path, config_hash) is None
+    assert short_it.snapshot.load_settings(path, config_hash) is None
+
+
+@pytest.mark.parametrize("cut", [4, 60, -5])
+def test_corrupted(tmp_path: pathlib.Path, snapshot: short_it.snapshot.Snapshot, cut: int) -> None:
+    """Test that truncated snapshot is ignored."""
+    path = tmp_path / "config.snapshot"
+    short_it.snapshot.save(path, snapshot)
+    path.write_bytes(path.read_bytes()[:cut])
+
+    assert short_it.snapshot.load(path, snapshot.config_hash) is None
+
+
+def test_hash_file(faker: Faker, tmp_path: pathlib.Path) -> None:
+    """Test for :func:`short_it.snapshot.hash_file` function."""
+    path, content = tmp_path / "config.yml", faker.binary(length=64)
+    assert short_it.snapshot.hash_file(path) is None
+
+    path.write_bytes(content)
+    assert short_it.snapshot.hash_file(path) == short_it.snapshot.hash_bytes(content)
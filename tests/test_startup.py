@@ -0,0 +1,55 @@
+"""Tests for :mod:`short_it.startup` module, and startup of the app in general."""
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.cli
+import short_it.startup
+import short_it.utils
+
+
+def test_phase(mocker: MockerFixture) -> None:
+    """Test that phases are recorded in order, even if they fail."""
+    mocker.patch("short_it.startup.PHASES", [])
+
+    with short_it.startup.phase("first"):
+        pass
+    with pytest.raises(RuntimeError), short_it.startup.phase("second"):
+        raise RuntimeError
+
+    assert [name for name, _ in short_it.startup.PHASES] == ["first", "second"]
+    report = short_it.startup.report().splitlines()
+    assert [line.split()[0] for line in report] == ["first", "second", "total"]
+
+
+def test_import_has_no_side_effects(tmp_path: pathlib.Path) -> None:
+    """Test that importing the app doesn't load the config, and doesn't import OmegaConf or Sentry."""
+    code = (
+        "import sys, short_it.app; print(sorted({m.split('.')[0] for m in sys.modules} & {'omegaconf', 'sentry_sdk'}))"
+    )
+    env = {**os.environ, "SHORT_IT_DATA_DIR": str(tmp_path / "data")}
+
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+    assert not (tmp_path / "data").exists()
+
+
+def test_profile_startup(mocker: MockerFixture, tmp_path: pathlib.Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that ``short-it --profile-startup`` reports every phase, and doesn't start the server."""
+    mocker.patch("short_it.startup.PHASES", [])
+    mocker.patch("short_it.config.CONFIG_PATH", tmp_path / "config.yml")
+    mocker.patch("short_it.config.SNAPSHOT_PATH", tmp_path / "config.snapshot")
+    mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+    mocked_run = mocker.patch("short_it.server.run")
+
+    short_it.cli.main(["--profile-startup"])
+
+    phases = [line.split()[0] for line in capsys.readouterr().out.splitlines()]
+    assert phases == ["import", "config", "table", "sentry", "total"]
+    assert (tmp_path / "config.snapshot").exists()
+    mocked_run.assert_not_called()
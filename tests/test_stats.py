@@ -0,0 +1,124 @@
+"""Tests for :mod:`short_it.stats` module."""
+import json
+import pathlib
+import sqlite3
+import time
+
+import fastapi.testclient
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.app
+import short_it.cli
+import short_it.config
+import short_it.stats
+import short_it.utils
+
+
+@pytest.fixture
+def stats_path(mocker: MockerFixture, tmp_path: pathlib.Path) -> pathlib.Path:
+    """Use temporary database and fresh counters."""
+    mocker.patch.dict(short_it.utils.Singleton._instances, clear=True)
+    mocker.patch("short_it.stats.stats_path", return_value=tmp_path / "stats.sqlite3")
+    mocker.patch("short_it.stats.config_module.Config").return_value.stats = short_it.config.StatsConfigSection(
+        flush_interval=0.01
+    )
+    return tmp_path / "stats.sqlite3"
+
+
+def test_flush(stats_path: pathlib.Path) -> None:
+    """Test that hits are counted per path, and added to the stored counts."""
+    counter = short_it.stats.ClickCounter()
+    for path in ["/a", "/b/gh", "/a"]:
+        counter.hit(path)
+
+    assert counter.flush() == 3
+    assert counter.flush() == 0
+    counter.hit("/a")
+    counter.flush()
+
+    assert short_it.stats.read_counts(stats_path) == [("/a", 3), ("/b/gh", 1)]
+    assert short_it.stats.read_counts(stats_path, limit=1) == [("/a", 3)]
+
+
+def test_merged_across_workers(stats_path: pathlib.Path) -> None:
+    """Test that counts of different processes (and restarts) are summed up."""
+    first = short_it.stats.ClickCounter()
+    second = short_it.stats.ClickCounter.__new__(short_it.stats.ClickCounter)
+    second.__init__()  # type: ignore[misc] # another "worker", bypassing the singleton
+    first.hit("/a")
+    second.hit("/a")
+    second.hit("/b")
+
+    first.flush()
+    second.flush()
+
+    assert short_it.stats.read_counts(stats_path) == [("/a", 2), ("/b", 1)]
+
+
+def test_disabled(mocker: MockerFixture, stats_path: pathlib.Path) -> None:
+    """Test that nothing is counted or written, if stats are disabled."""
+    short_it.config.Config().stats.enabled = False
+    counter = short_it.stats.ClickCounter()
+    counter.start()
+    counter.hit("/a")
+    counter.stop()
+
+    assert not stats_path.exists()
+    assert short_it.stats.read_counts(stats_path) == []
+
+
+def test_failed_flush_is_retried(mocker: MockerFixture, stats_path: pathlib.Path) -> None:
+    """Test that hits are not lost, if the database is not writable."""
+    counter = short_it.stats.ClickCounter()
+    counter.hit("/a")
+    mocker.patch("sqlite3.connect", side_effect=sqlite3.OperationalError("database is locked"))
+
+    with pytest.raises(sqlite3.OperationalError):
+        counter.flush()
+    mocker.stopall()
+    counter.hit("/a")
+
+    assert counter.flush() == 2
+    assert short_it.stats.read_counts(stats_path) == [("/a", 2)]
+
+
+def test_background_thread(stats_path: pathlib.Path) -> None:
+    """Test that hits are flushed in the background, and on stop."""
+    counter = short_it.stats.ClickCounter()
+    counter.start()
+    counter.hit("/a")
+
+    deadline = time.monotonic() + 5
+    while not short_it.stats.read_counts(stats_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    counter.hit("/a")
+    counter.stop()
+
+    assert short_it.stats.read_counts(stats_path) == [("/a", 2)]
+
+
+def test_endpoint(mocker: MockerFixture, stats_path: pathlib.Path) -> None:
+    """Test that counts are served as JSON."""
+    mocker.patch(
+        "short_it.fast_path.parse_config.ParseConfigToMachineData"
+    ).return_value.get_response.return_value = None
+    counter = short_it.stats.ClickCounter()
+    counter.hit("/a")
+    counter.flush()
+
+    response = fastapi.testclient.TestClient(short_it.app.app).get("/-/stats")
+
+    assert response.status_code == 200
+    assert response.json() == [{"path": "/a", "count": 1}]
+
+
+def test_cli(stats_path: pathlib.Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test ``short-it stats`` command."""
+    counter = short_it.stats.ClickCounter()
+    counter.hit("/a")
+    counter.flush()
+
+    short_it.cli.main(["stats", "--json"])
+
+    assert json.loads(capsys.readouterr().out) == [{"path": "/a", "count": 1}]
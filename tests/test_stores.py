@@ -0,0 +1,178 @@
+"""Tests for :mod:`short_it.stores` module."""
+import pathlib
+import threading
+import typing as t
+
+import pytest
+from faker import Faker
+
+import short_it.snapshot
+import short_it.stores
+
+
+@pytest.fixture
+def data(faker: Faker) -> dict[str, dict[str, str] | str]:
+    """Random table with simple links, and projects with aliases."""
+    destination = faker.url()
+    return {
+        "simple": faker.url(),
+        "project": {**dict.fromkeys(["github", "gh", "src"], destination), "docs": faker.url()},
+        "empty": {},
+    }
+
+
+BACKENDS: dict[
+    str,
+    tuple[
+        t.Callable[[pathlib.Path, short_it.stores.LinkStore, bytes | None], None],
+        type[short_it.stores.SQLiteLinkStore] | type[short_it.stores.MmapLinkStore],
+    ],
+] = {
+    "sqlite": (short_it.stores.build_sqlite, short_it.stores.SQLiteLinkStore),
+    "mmap": (short_it.stores.build_mmap, short_it.stores.MmapLinkStore),
+}
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request: pytest.FixtureRequest) -> str:
+    """Name of the store backend."""
+    return t.cast(str, request.param)
+
+
+@pytest.fixture
+def store(
+    tmp_path: pathlib.Path, data: dict[str, dict[str, str] | str], backend: str
+) -> short_it.stores.SQLiteLinkStore | short_it.stores.MmapLinkStore:
+    """Build the store from the table."""
+    build, store_class = BACKENDS[backend]
+    build(tmp_path / "links", data, b"h" * 32)
+    return store_class(tmp_path / "links")
+
+
+@pytest.fixture
+def sqlite_store(tmp_path: pathlib.Path, data: dict[str, dict[str, str] | str]) -> short_it.stores.SQLiteLinkStore:
+    """Build SQLite store from the table."""
+    short_it.stores.build_sqlite(tmp_path / "links.sqlite3", data, b"h" * 32)
+    return short_it.stores.SQLiteLinkStore(tmp_path / "links.sqlite3")
+
+
+def test_same_as_dict(store: short_it.stores.LinkStore, data: dict[str, dict[str, str] | str]) -> None:
+    """Test that SQLite store contains exactly the same table."""
+    assert len(store) == len(data)
+    assert {
+        project_name: project_links if isinstance(project_links, str) else dict(project_links)
+        for project_name, project_links in store.items()
+    } == data
+
+
+def test_missing(faker: Faker, store: short_it.stores.LinkStore) -> None:
+    """Test that missing projects and links are handled as in :class:`dict`."""
+    assert store.get(faker.word()) is None
+    project_links = store["project"]
+    assert not isinstance(project_links, str)
+    assert project_links.get(faker.word()) is None
+    assert project_links.get("gh") == project_links["github"]
+
+
+@pytest.mark.parametrize(
+    "config_hash, expected",
+    [(b"h" * 32, True), (b"o" * 32, False), (None, False)],
+)
+def test_open_if_fresh(
+    tmp_path: pathlib.Path, backend: str, store: short_it.stores.LinkStore, config_hash: bytes | None, expected: bool
+) -> None:
+    """Test that outdated store is not opened."""
+    store_class = BACKENDS[backend][1]
+    assert (store_class.open_if_fresh(tmp_path / "links", config_hash) is not None) is expected
+    assert store_class.open_if_fresh(tmp_path / "missing", b"h" * 32) is None
+
+
+def test_rebuild_while_open(
+    faker: Faker,
+    tmp_path: pathlib.Path,
+    backend: str,
+    store: short_it.stores.LinkStore,
+    data: dict[str, dict[str, str] | str],
+) -> None:
+    """Test that opened store keeps reading the old table, after the file was rebuilt."""
+    build, store_class = BACKENDS[backend]
+    assert store["simple"] == data["simple"]
+    build(tmp_path / "links", {"simple": faker.url()}, b"n" * 32)
+
+    assert store["simple"] == data["simple"]
+    assert store_class(tmp_path / "links")["simple"] != data["simple"]
+
+
+def test_threads(store: short_it.stores.LinkStore, data: dict[str, dict[str, str] | str]) -> None:
+    """Test that store can be used from multiple threads (e.g. FastAPI threadpool)."""
+    results: list[object] = []
+    threads = [threading.Thread(target=lambda: results.append(store["simple"])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [data["simple"]] * 8
+
+
+def test_concurrent_builds(
+    tmp_path: pathlib.Path, backend: str, store: short_it.stores.LinkStore, data: dict[str, dict[str, str] | str]
+) -> None:
+    """Test that builds at the same time (e.g. reloads in every worker) don't break each other."""
+    build, store_class = BACKENDS[backend]
+    errors: list[BaseException] = []
+
+    def rebuild() -> None:
+        try:
+            build(tmp_path / "links", data, b"h" * 32)
+        except BaseException as exception:  # pragma: no cover
+            errors.append(exception)
+
+    threads = [threading.Thread(target=rebuild) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store_class(tmp_path / "links")["simple"] == data["simple"]
+    assert [path.name for path in tmp_path.iterdir()] == ["links"]
+
+
+def test_sqlite_connections_are_not_shared_after_fork(sqlite_store: short_it.stores.SQLiteLinkStore) -> None:
+    """Test that forked process opens its own connection."""
+    sqlite_store["simple"]
+    connection = sqlite_store._local.connection
+
+    short_it.stores._forget_connections()
+    sqlite_store["simple"]
+
+    assert sqlite_store._local.connection is not connection
+
+
+class TestMmap:
+    """Tests for :class:`short_it.stores.MmapLinkStore`, which are specific to the perfect hash."""
+
+    @pytest.mark.parametrize("size", [0, 1, 2, 5000])
+    def test_every_key_is_found(self, tmp_path: pathlib.Path, size: int) -> None:
+        """Test that the perfect hash finds every key, and nothing else."""
+        data: dict[str, dict[str, str] | str] = {f"simple-{i}": f"https://example.com/{i}" for i in range(size)}
+        data["проєкт"] = {f"тип-{i}": f"https://example.com/p/{i % 7}" for i in range(size)}
+        short_it.stores.build_mmap(tmp_path / "links.index", data, None)
+
+        store = short_it.stores.MmapLinkStore(tmp_path / "links.index")
+
+        assert store.config_hash() is None
+        assert len(store) == len(data)
+        for name in list(data)[:-1]:
+            assert store[name] == data[name]
+        assert dict(t.cast(t.Mapping[str, str], store["проєкт"])) == data["проєкт"]
+        assert store.get(f"simple-{size}") is None
+        assert store.get("проєкт\0тип-0") is None  # link keys are not projects
+
+    def test_invalid_file(self, tmp_path: pathlib.Path) -> None:
+        """Test that file of another format (or version) is not opened."""
+        (tmp_path / "links.index").write_bytes(b"not an index" * 10)
+        assert short_it.stores.MmapLinkStore.open_if_fresh(tmp_path / "links.index", None) is None
+        (tmp_path / "links.index").write_bytes(b"")
+        assert short_it.stores.MmapLinkStore.open_if_fresh(tmp_path / "links.index", None) is None
@@ -0,0 +1,106 @@
+"""Tests for :mod:`short_it.suggestions` module."""
+import pathlib
+import threading
+
+import pytest
+from pytest_mock import MockerFixture
+
+import short_it.responses
+import short_it.stores
+import short_it.suggestions
+
+DATA: dict[str, dict[str, str] | str] = {
+    "site": "https://perchun.it",
+    "sites": "https://example.com/sites",
+    "short-it": {
+        **dict.fromkeys(["github", "gh", "src"], "https://github.com/PerchunPak/short-it"),
+        "readme": "https://github.com/PerchunPak/short-it#readme",
+    },
+    "UPPER": "https://example.com/upper",
+}
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [("", "", 0), ("abc", "abc", 0), ("abc", "", 3), ("kitten", "sitting", 3), ("gh", "hg", 2), ("src", "sr", 1)],
+)
+def test_levenshtein(a: str, b: str, expected: int) -> None:
+    """Test edit distance, in both directions."""
+    assert short_it.suggestions.levenshtein(a, b) == short_it.suggestions.levenshtein(b, a) == expected
+
+
+@pytest.mark.parametrize(
+    "project_name, link_type, expected",
+    [
+        ("sitee", None, ["/site", "/sites"]),
+        ("short-it", "githb", ["/short-it/github"]),
+        ("shortit", "githb", ["/short-it/github"]),
+        ("short-itt", None, ["/short-it/github", "/short-it/readme"]),
+        ("sitee", "gh", []),  # simple links don't have link types
+        ("completely-different", None, []),
+        ("upper", None, []),  # not routable
+    ],
+)
+def test_suggest(project_name: str, link_type: str | None, expected: list[str]) -> None:
+    """Test that only close links, which can be resolved, are suggested."""
+    suggestion_index = short_it.suggestions.SuggestionIndex(DATA)
+    suggestion_index.build()
+    assert suggestion_index.suggest(project_name, link_type) == expected
+
+
+def test_limit() -> None:
+    """Test that the closest suggestions are returned first."""
+    suggestion_index = short_it.suggestions.SuggestionIndex(DATA, limit=1, max_distance=3)
+    suggestion_index.build()
+    assert suggestion_index.suggest("sit", None) == ["/site"]
+
+
+def test_big_table() -> None:
+    """Test that suggestions are found among a lot of similar names, where some trigrams are too common."""
+    data: dict[str, dict[str, str] | str] = {
+        f"project-{i}": {"github": f"https://github.com/{i}"} for i in range(2 * short_it.suggestions.MAX_POSTINGS)
+    }
+    suggestion_index = short_it.suggestions.SuggestionIndex(data)
+    suggestion_index.build()
+
+    assert suggestion_index.suggest("project-12345", "gihub")[0] == "/project-1234/github"
+    assert suggestion_index.suggest("projetc-777", "github")[0] == "/project-777/github"
+
+
+def test_not_found_page() -> None:
+    """Test that suggestions are escaped, and the page without them is the pre-built one."""
+    assert short_it.responses.not_found([]) is short_it.responses.NOT_FOUND
+
+    page = short_it.responses.not_found_html(['/a"b/ü'])
+    assert '<a href="/a%22b/%C3%BC">/a&quot;b/ü</a>' in page
+
+
+def test_persistent_store(mocker: MockerFixture, tmp_path: pathlib.Path) -> None:
+    """Test that the index for stores, which are not dicts, is built in the background after the first miss."""
+    short_it.stores.build_mmap(tmp_path / "links.index", DATA, None)
+    suggestion_index = short_it.suggestions.SuggestionIndex(short_it.stores.MmapLinkStore(tmp_path / "links.index"))
+    build = suggestion_index.build
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_build() -> None:
+        started.set()
+        finish.wait(5)
+        build()
+
+    mocker.patch.object(suggestion_index, "build", side_effect=slow_build)
+
+    assert suggestion_index.suggest("short-itt", None) == []  # the plain 404, not waiting for the index
+    assert started.wait(5)
+    assert suggestion_index.suggest("short-itt", None) == []
+    finish.set()
+    assert suggestion_index._builder is not None
+    suggestion_index._builder.join(5)
+
+    assert suggestion_index.suggest("short-itt", None) == ["/short-it/github", "/short-it/readme"]
+    assert suggestion_index.suggest("short-it", "sr") == ["/short-it/src", "/short-it/gh"]
+
+
+def test_levenshtein_max_distance() -> None:
+    """Test that computation stops as soon as the distance is too big."""
+    assert short_it.suggestions.levenshtein("abcdef", "uvwxyz", max_distance=2) == 3
+    assert short_it.suggestions.levenshtein("kitten", "sitting", max_distance=3) == 3
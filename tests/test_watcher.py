@@ -0,0 +1,118 @@
+"""Tests for :mod:`short_it.watcher` module."""
+import logging
+import os
+import pathlib
+import threading
+
+import pytest
+from faker import Faker
+from pytest_mock import MockerFixture
+
+import short_it.watcher
+
+
+@pytest.fixture
+def config_path(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Create a fake config file."""
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("simple: {}\n")
+    return config_path
+
+
+def _bump_mtime(path: pathlib.Path) -> None:
+    """Make sure that ``mtime`` is different, even on file systems with low resolution."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestCheck:
+    """Tests for :meth:`short_it.watcher.ConfigWatcher.check` method."""
+
+    def test_unchanged(self, mocker: MockerFixture, config_path: pathlib.Path) -> None:
+        """Test that nothing happens if file was not changed."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1)
+
+        assert watcher.check() is False
+        mocked.reload.assert_not_called()
+
+    def test_touched(self, mocker: MockerFixture, config_path: pathlib.Path) -> None:
+        """Test that nothing happens if only ``mtime`` was changed."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1)
+        _bump_mtime(config_path)
+
+        assert watcher.check() is False
+        mocked.reload.assert_not_called()
+
+    def test_changed(self, mocker: MockerFixture, faker: Faker, config_path: pathlib.Path) -> None:
+        """Test that table is reloaded, if content was changed."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1)
+        config_path.write_text(f"simple:\n  {faker.word()}: {faker.url()}\n")
+        _bump_mtime(config_path)
+
+        assert watcher.check() is True
+        mocked.reload.assert_called_once_with()
+        assert watcher.check() is False
+
+    def test_deleted(self, mocker: MockerFixture, config_path: pathlib.Path) -> None:
+        """Test that nothing happens if file was deleted (e.g. in the middle of save)."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1)
+        config_path.unlink()
+
+        assert watcher.check() is False
+        mocked.reload.assert_not_called()
+
+    def test_shards(self, mocker: MockerFixture, faker: Faker, config_path: pathlib.Path) -> None:
+        """Test that table is reloaded, if a shard is added, changed or removed, but not if it is touched."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        shards_dir = config_path.parent / "config.d"
+        shards_dir.mkdir()
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1, shards_dir)
+        shard_path = shards_dir / "team.yml"
+
+        shard_path.write_text(f"simple:\n  {faker.word()}: {faker.url()}\n")
+        assert watcher.check() is True
+        _bump_mtime(shard_path)
+        assert watcher.check() is False
+        shard_path.write_text(f"simple:\n  {faker.word()}: {faker.url()}\n")
+        _bump_mtime(shard_path)
+        assert watcher.check() is True
+        shard_path.unlink()
+        assert watcher.check() is True
+
+        assert mocked.reload.call_count == 3
+
+    def test_reload_error(
+        self, mocker: MockerFixture, faker: Faker, config_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test that errors during reload are logged, and not retried until the next change."""
+        mocked = mocker.patch("short_it.watcher.parse_config.ParseConfigToMachineData").return_value
+        mocked.reload.side_effect = ValueError(faker.sentence())
+        watcher = short_it.watcher.ConfigWatcher(config_path, 1)
+        config_path.write_text("simple: [\n")
+        _bump_mtime(config_path)
+
+        with caplog.at_level(logging.ERROR):
+            assert watcher.check() is False
+        assert "keeping the old links" in caplog.text
+
+        _bump_mtime(config_path)
+        assert watcher.check() is False
+        mocked.reload.assert_called_once_with()
+
+
+def test_start_and_stop(mocker: MockerFixture, config_path: pathlib.Path) -> None:
+    """Test that background thread is started and stopped."""
+    checked = threading.Event()
+    mocker.patch("short_it.watcher.ConfigWatcher.check", side_effect=checked.set)
+    watcher = short_it.watcher.ConfigWatcher(config_path, 0.001)
+
+    watcher.start()
+    assert watcher._thread is not None and watcher._thread.is_alive()
+    assert checked.wait(5)
+    watcher.stop()
+
+    assert watcher._thread is None